@@ -4,15 +4,28 @@ import time
 import random
 import uuid
 import math
+import shutil
+import argparse
+import tempfile
+import multiprocessing as mp
+import numpy as np
+from io import BytesIO
 from datetime import datetime
-from PIL import Image, ImageChops, ImageDraw, ImageFont  # 新增 ImageDraw, ImageFont
+from PIL import Image, ImageDraw, ImageFont  # 新增 ImageDraw, ImageFont
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.options import Options
+from interaction_engine.capture import capture_frame
+from interaction_engine.config import (
+    QUALITY_PYRAMID_LEVEL, CASCADE_ROI_MARGIN, REGION_MAX_COMPONENTS, REGION_MAX_OUTSIDE_FRACTION, DEDUP_MODE,
+)
+from interaction_engine.dedup import PHashIndex
+from interaction_engine.quality import cascade_score
+from interaction_engine.regions import extract_regions, outside_fraction, union_bbox
+from interaction_engine.readiness import install_readiness_tracker, wait_for_page_quiescence
+from interaction_engine.writer import FrameWriter
 
 # ================= 配置区域 =================
 
@@ -29,6 +42,9 @@ META_DIR = os.path.join(OUTPUT_DIR, "raw_metadata")  # 原始元数据
 # 模拟的视口大小 (PC端)
 VIEWPORT_SIZE = (1920, 1080)
 
+# 生产模式下 RMS 低于该值的样本视为注入无效（肉眼看不出差异）
+MIN_DIFF_RMS = 2.0
+
 # 目标网站列表 (替换为结构标准、易于注入的网站)
 TARGET_URLS = [
     "https://www.w3.org/",                   # HTML标准结构
@@ -38,13 +54,150 @@ TARGET_URLS = [
     "https://en.wikipedia.org/wiki/Software_testing", # Wiki结构
     "https://www.eclipse.org/"               # 传统门户
 ]
+
+# 每个网站生成的样本对数量
+SAMPLES_PER_URL = 3
+
+# 多进程模式：每个 worker 独立 Chrome（独立 user-data-dir 与调试端口）
+DEBUG_PORT_BASE = 9400
+
+# 页面就绪等待上限（毫秒）：与原先固定的 3s + 1s + 1s 预算一致；超时即按现状继续
+# （轮播 / 广告 / 长轮询页面永远不会完全静默）
+PAGE_READY_MAX_MS = 3000
+LAZY_LOAD_MAX_MS = 1000
 # ===========================================
 
+# 注入撤销日志：记录 inject_bug 对 DOM 的每一处修改（属性/内联样式、value、子节点、新增节点），
+# 用于页面内精确回滚，替代每个样本后的 driver.refresh()。
+UNDO_JOURNAL_JS = r"""
+(function() {
+    if (window.__ICE_UNDO__) return;
+    const IGNORE_IDS = new Set(['__debug_overlay__']);
+    const J = window.__ICE_UNDO__ = { records: [], baseline: null };
+
+    J.snap = function(el, withChildren, withKids) {
+        if (!el || J.records.some(r => r.el === el && r.kind === 'snap' && (r.children || !withChildren))) {
+            if (withKids) Array.from(el.children || []).forEach(k => J.snap(k, false, false));
+            return;
+        }
+        J.records.push({
+            kind: 'snap',
+            el: el,
+            attrs: Array.from(el.attributes || []).map(a => [a.name, a.value]),
+            hasValue: 'value' in el,
+            value: ('value' in el) ? el.value : null,
+            children: withChildren ? Array.from(el.childNodes) : null,
+        });
+        if (withKids) Array.from(el.children || []).forEach(k => J.snap(k, false, false));
+    };
+
+    J.added = function(node) { J.records.push({ kind: 'added', el: node }); };
+
+    J.hash = function() {
+        // FNV-1a over element tags/attributes/values and text nodes (skips debug overlay)
+        let h = 0x811c9dc5;
+        const mix = (str) => {
+            for (let i = 0; i < str.length; i++) { h ^= str.charCodeAt(i); h = Math.imul(h, 0x01000193); }
+        };
+        if (!document.body) return 0;
+        const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_ELEMENT | NodeFilter.SHOW_TEXT, {
+            acceptNode: n => (n.nodeType === 1 && IGNORE_IDS.has(n.id)) ? NodeFilter.FILTER_REJECT : NodeFilter.FILTER_ACCEPT
+        });
+        let n;
+        while ((n = walker.nextNode())) {
+            if (n.nodeType === 3) { mix(n.data); continue; }
+            mix('<' + n.tagName);
+            for (const a of n.attributes) mix(a.name + '=' + a.value);
+            if (n.tagName === 'INPUT' || n.tagName === 'TEXTAREA') mix('v=' + n.value);
+        }
+        return h >>> 0;
+    };
+
+    J.begin = function() { J.records = []; J.baseline = J.hash(); return J.baseline; };
+
+    J.rollback = function() {
+        // 没有记录（或本 document 上从未 begin，例如刷新后重新安装）时无需回滚
+        if (J.baseline === null || J.records.length === 0) { J.records = []; return true; }
+        for (let i = J.records.length - 1; i >= 0; i--) {
+            const r = J.records[i];
+            try {
+                if (r.kind === 'added') { r.el.remove(); continue; }
+                for (const a of Array.from(r.el.attributes)) r.el.removeAttribute(a.name);
+                for (const [name, value] of r.attrs) r.el.setAttribute(name, value);
+                if (r.children) r.el.replaceChildren(...r.children);
+                if (r.hasValue) r.el.value = r.value;
+            } catch (e) {}
+        }
+        J.records = [];
+        return J.baseline !== null && J.hash() === J.baseline;
+    };
+})();
+"""
+
+# 候选元素选择器（每组独立做蓄水池采样，避免只取头部元素）
+CANDIDATE_SELECTORS = ["button", "a", "input", "img", "h1, h2, h3", "p", "div[class], div[id]"]
+CANDIDATES_PER_SELECTOR = 30
+# 易引起重排或广告区域（轮播/广告位不稳定）
+NOISY_KEYWORDS = ['carousel', 'slider', 'slick', 'swiper', 'marquee', 'ad', 'ads', 'advert', 'sponsor', 'banner', 'promo']
+
+# arguments = [selectors, k, noisy_keywords, viewport_width]
+CANDIDATE_SCAN_JS = r"""
+const [selectors, k, noisy, vw] = arguments;
+function accept(el) {
+    if (el.getClientRects().length === 0) return null;
+    const cs = getComputedStyle(el);
+    if (cs.display === 'none' || cs.visibility === 'hidden' || parseFloat(cs.opacity) === 0) return null;
+    const r = el.getBoundingClientRect();
+    // 1. 尺寸过滤
+    if (r.width < 20 || r.height < 20) return null;
+    if (r.width > 1200 || r.height > 900) return null;
+    // 2. 坐标过滤 (排除负坐标)
+    if (r.x < 0 || r.y < 0) return null;
+    // 3. 视口过滤：水平方向至少一半在视口内（垂直方向注入前会滚动到元素）
+    if ((Math.min(r.x + r.width, vw) - r.x) / r.width <= 0.5) return null;
+    // 4. 过滤易引起重排或广告区域
+    const idCls = ((el.id || '') + ' ' + (el.getAttribute('class') || '')).toLowerCase();
+    if (noisy.some(kw => idCls.includes(kw))) return null;
+    // 5. 幽灵元素过滤 (透明、无边框且无内容的 div/span/section)
+    const tag = el.tagName.toLowerCase();
+    if ((tag === 'div' || tag === 'span' || tag === 'section') && !(el.innerText || '').trim().length) {
+        const bd = cs.borderWidth;
+        if (cs.backgroundColor === 'rgba(0, 0, 0, 0)' && (!bd || bd === '0px')) return null;
+    }
+    return { x: r.x, y: r.y, width: r.width, height: r.height };
+}
+const out = [];
+for (const sel of selectors) {
+    // 蓄水池采样：在有效元素流上等概率保留 k 个
+    const reservoir = [];
+    let n = 0;
+    for (const el of document.querySelectorAll(sel)) {
+        let rect = null;
+        try { rect = accept(el); } catch (e) {}
+        if (!rect) continue;
+        n++;
+        if (reservoir.length < k) reservoir.push({ element: el, rect: rect });
+        else {
+            const j = Math.floor(Math.random() * n);
+            if (j < k) reservoir[j] = { element: el, rect: rect };
+        }
+    }
+    out.push(...reservoir);
+}
+return out;
+"""
+
 class AutoInjector:
-    def __init__(self):
+    def __init__(self, user_data_dir=None, debugging_port=None, driver_path=None):
+        self.user_data_dir = user_data_dir
+        self.debugging_port = debugging_port
+        self.driver_path = driver_path
         self._setup_driver()
         self._ensure_dirs()
         self.lock_viewport = True  # 锁定视口滚动位置，保证成对截图一致
+        self.last_settle_ms = 0    # 最近一次页面就绪等待的实测耗时
+        self.frame_writer = FrameWriter()  # PNG 编码 / 落盘在后台线程进行
+        self.dedup_index = PHashIndex() if DEDUP_MODE != "off" else None
 
     def _normalize_bbox(self, bbox):
         """将像素坐标归一化到 [0,1] 便于跨分辨率训练"""
@@ -157,16 +310,17 @@ class AutoInjector:
         """[改进 3] 在截图上绘制动作标记（红点/箭头）用于交互类 Bug
         
         Args:
-            image_path: 原始截图路径
+            image_path: 原始截图路径，或内存中的 PIL 图像（原地绘制）
             bbox: 元素坐标 {"x", "y", "width", "height"}
             action_type: "click" | "hover" | "type"
             output_path: 输出路径（默认覆盖原图）
         
         Returns:
-            标记后的图片路径
+            标记后的图片路径（传入 PIL 图像时返回该图像）
         """
         try:
-            img = Image.open(image_path)
+            in_memory = isinstance(image_path, Image.Image)
+            img = image_path if in_memory else Image.open(image_path)
             draw = ImageDraw.Draw(img)
             
             # 计算元素中心点
@@ -211,6 +365,8 @@ class AutoInjector:
                     fill=(0, 0, 255)
                 )
             
+            if in_memory:
+                return img
             # 保存
             if not output_path:
                 output_path = image_path
@@ -228,38 +384,44 @@ class AutoInjector:
         chrome_options.add_argument(f"--window-size={VIEWPORT_SIZE[0]},{VIEWPORT_SIZE[1]}")
         chrome_options.add_argument("--disable-blink-features=AutomationControlled")
         chrome_options.add_argument("--ignore-certificate-errors")
+        if self.user_data_dir:
+            chrome_options.add_argument(f"--user-data-dir={self.user_data_dir}")
+        if self.debugging_port:
+            chrome_options.add_argument(f"--remote-debugging-port={self.debugging_port}")
         # 策略: eager (DOM加载完即开始，不等待所有图片)
         chrome_options.page_load_strategy = 'eager'
         
-        service = Service(ChromeDriverManager().install())
+        service = Service(self.driver_path or ChromeDriverManager().install())
         self.driver = webdriver.Chrome(service=service, options=chrome_options)
         self.driver.set_page_load_timeout(30)
+        # 就绪检测的请求计数器在 document 开始时安装，加载期间发出的请求也能计入
+        install_readiness_tracker(self.driver)
 
     def _ensure_dirs(self):
         for d in [IMG_DIR, LBL_DIR, META_DIR]:
             os.makedirs(d, exist_ok=True)
 
     def wait_for_page_ready(self):
-        """智能等待，确保页面完全渲染"""
-        try:
-            # 等待 DOM 完成
-            WebDriverWait(self.driver, 15).until(
-                lambda d: d.execute_script("return document.readyState") == "complete"
-            )
-        except:
-            print("[!] 页面状态等待超时，尝试继续...")
-        
-        # 额外等待，让 CSS/字体/图片渲染
-        time.sleep(3)
+        """智能等待，确保页面完全渲染
+
+        在页面内等待真实静默（无进行中请求、DOM 无变更、字体与图片就绪），
+        替代固定 sleep；实测耗时记录在 self.last_settle_ms。
+        """
+        # 等待 DOM 完成 + CSS/字体/图片渲染
+        settle = wait_for_page_quiescence(self.driver, max_wait_ms=PAGE_READY_MAX_MS)
+        if settle.get("timed_out"):
+            print(f"[*] 页面未完全静默 ({settle.get('reason')}, 进行中请求 {settle.get('inflight')})，按现状继续")
+        settle_ms = settle.get("settle_ms", 0)
         
         # 滚动到底部再回顶部，触发懒加载
         try:
             self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(1)
+            settle_ms += wait_for_page_quiescence(self.driver, max_wait_ms=LAZY_LOAD_MAX_MS).get("settle_ms", 0)
             self.driver.execute_script("window.scrollTo(0, 0);")
-            time.sleep(1)
+            settle_ms += wait_for_page_quiescence(self.driver, max_wait_ms=LAZY_LOAD_MAX_MS).get("settle_ms", 0)
         except:
             pass 
+        self.last_settle_ms = settle_ms
 
     def load_page(self, url):
         print(f"[*] 正在加载: {url}")
@@ -272,57 +434,23 @@ class AutoInjector:
         self.wait_for_page_ready()
 
     def get_candidate_elements(self):
-        """寻找可注入元素，增加幽灵元素过滤"""
-        candidates = []
+        """寻找可注入元素，增加幽灵元素过滤
+
+        单次 execute_script 在页面内完成全部过滤（尺寸、坐标、噪声关键词、幽灵元素、视口）
+        与蓄水池采样（每组最多 30 个），只把有效候选及其 rect 传回 Python。
+
+        Returns:
+            [{"element": WebElement, "rect": {"x", "y", "width", "height"}}, ...]
+        """
         try:
-            selectors = [
-                ("//button", By.XPATH), ("//a", By.XPATH), ("//input", By.XPATH),
-                ("//img", By.XPATH), ("//h1|//h2|//h3", By.XPATH), ("//p", By.XPATH),
-                ("//div[@class or @id]", By.XPATH)
-            ]
-            noisy_keywords = ['carousel', 'slider', 'slick', 'swiper', 'marquee', 'ad', 'ads', 'advert', 'sponsor', 'banner', 'promo']
-            
-            for selector, by in selectors:
-                elements = self.driver.find_elements(by, selector)
-                # 随机采样，避免只取头部元素
-                sample_elements = random.sample(elements, min(len(elements), 30))
-                
-                for elem in sample_elements:
-                    try:
-                        if not elem.is_displayed(): continue
-                        
-                        rect = self.driver.execute_script("return arguments[0].getBoundingClientRect();", elem)
-                        
-                        # 1. 尺寸过滤
-                        if rect['width'] < 20 or rect['height'] < 20: continue
-                        if rect['width'] > 1200 or rect['height'] > 900: continue
-                        
-                        # 2. 坐标过滤 (排除负坐标)
-                        if rect['x'] < 0 or rect['y'] < 0: continue
-
-                        # 3. 过滤易引起重排或广告区域（轮播/广告位不稳定）
-                        try:
-                            id_cls = (elem.get_attribute('id') or '').lower() + ' ' + (elem.get_attribute('class') or '').lower()
-                            if any(k in id_cls for k in noisy_keywords):
-                                continue
-                        except:
-                            pass
-
-                        # 4. [新增] 幽灵元素过滤 (针对透明且无内容的 div/span)
-                        tag = elem.tag_name.lower()
-                        if tag in ['div', 'span', 'section']:
-                            has_text = self.driver.execute_script("return arguments[0].innerText.trim().length > 0", elem)
-                            if not has_text:
-                                bg = elem.value_of_css_property('background-color')
-                                bd = elem.value_of_css_property('border-width')
-                                # 如果背景透明且无边框，视为幽灵元素，跳过
-                                if bg == 'rgba(0, 0, 0, 0)' and (not bd or bd == '0px'):
-                                    continue
-
-                        candidates.append(elem)
-                    except:
-                        continue
-            return candidates
+            candidates = self.driver.execute_script(
+                CANDIDATE_SCAN_JS,
+                CANDIDATE_SELECTORS,
+                CANDIDATES_PER_SELECTOR,
+                NOISY_KEYWORDS,
+                VIEWPORT_SIZE[0],
+            )
+            return candidates or []
         except Exception as e:
             print(f"[!] 元素查找异常: {e}")
             return []
@@ -403,6 +531,18 @@ class AutoInjector:
         except:
             pass
 
+    def _begin_undo(self):
+        """开始记录一次注入的撤销日志（同时记录注入前的 DOM 哈希）"""
+        try:
+            self.driver.execute_script(UNDO_JOURNAL_JS + "return window.__ICE_UNDO__.begin();")
+        except:
+            pass
+
+    def _exec_tracked(self, script, element, children=False, kids=False):
+        """执行注入脚本，执行前在撤销日志中快照目标元素"""
+        prelude = UNDO_JOURNAL_JS + f"window.__ICE_UNDO__.snap(arguments[0], {str(children).lower()}, {str(kids).lower()});\n"
+        return self.driver.execute_script(prelude + script, element)
+
     def inject_bug(self, element, bug_type):
         """执行故障注入"""
         bug_info = {}
@@ -436,7 +576,7 @@ class AutoInjector:
                 arguments[0].style.zIndex = '99999';
                 {visual_aid}
                 """
-                self.driver.execute_script(script, element)
+                self._exec_tracked(script, element)
                 current_bbox['x'] += offset_x
                 current_bbox['y'] += offset_y
 
@@ -449,12 +589,13 @@ class AutoInjector:
                     const p = document.createElement('div');
                     p.style.cssText = 'width:'+arguments[0].offsetWidth+'px;height:'+arguments[0].offsetHeight+"px;background:rgba(255,0,0,0.06);border:none;outline:none;";
                     arguments[0].parentNode.insertBefore(p, arguments[0]);
+                    window.__ICE_UNDO__.added(p);
                     """
                 script = f"""
                 {placeholder_script}
                 arguments[0].style.visibility = 'hidden';
                 """
-                self.driver.execute_script(script, element)
+                self._exec_tracked(script, element)
 
             elif bug_type == "Text_Overflow":
                 long_text = "ERROR_OVERFLOW_" * 30
@@ -481,7 +622,7 @@ class AutoInjector:
                     {visual_aid}
                 }})(arguments[0]);
                 """
-                self.driver.execute_script(script, element)
+                self._exec_tracked(script, element, children=True)
                 # 重新获取尺寸
                 rect = self.driver.execute_script("return arguments[0].getBoundingClientRect();", element)
                 current_bbox = {"x": rect['x'], "y": rect['y'], "width": rect['width'], "height": rect['height']}
@@ -501,7 +642,7 @@ class AutoInjector:
                 arguments[0].style.border = '{border_style}';
                 arguments[0].style.objectFit = 'contain';
                 """
-                self.driver.execute_script(script, element)
+                self._exec_tracked(script, element)
 
             elif bug_type == "Layout_Alignment":
                 # 通过不当的偏移或内边距制造对齐问题
@@ -519,7 +660,7 @@ class AutoInjector:
                 el.style.transition = 'none';
                 {visual_aid}
                 """
-                self.driver.execute_script(script, element)
+                self._exec_tracked(script, element)
                 # 对齐偏移不会显著改变自身 bbox，这里保留原 bbox
 
             elif bug_type == "Layout_Spacing":
@@ -546,7 +687,7 @@ class AutoInjector:
                     {visual_aid}
                 }})(arguments[0]);
                 """
-                self.driver.execute_script(script, element)
+                self._exec_tracked(script, element, kids=True)
 
             elif bug_type == "Data_Format_Error":
                 # 将 number 输入框填入非数字字符
@@ -565,7 +706,7 @@ class AutoInjector:
                 el.setAttribute('data-injected','true');
                 {visual_aid}
                 """
-                self.driver.execute_script(script, target_elem)
+                self._exec_tracked(script, target_elem)
                 rect = self.driver.execute_script("return arguments[0].getBoundingClientRect();", target_elem)
                 current_bbox = {"x": rect['x'], "y": rect['y'], "width": rect['width'], "height": rect['height']}
 
@@ -588,7 +729,7 @@ class AutoInjector:
                     {visual_aid}
                 }})(arguments[0]);
                 """
-                self.driver.execute_script(script, element)
+                self._exec_tracked(script, element)
 
             elif bug_type == "Style_Size_Inconsistent":
                 # 让元素尺寸与同级元素不一致
@@ -604,7 +745,7 @@ class AutoInjector:
                 el.style.boxSizing = 'border-box';
                 {visual_aid}
                 """
-                self.driver.execute_script(script, element)
+                self._exec_tracked(script, element)
                 rect = self.driver.execute_script("return arguments[0].getBoundingClientRect();", element)
                 current_bbox = {"x": rect['x'], "y": rect['y'], "width": rect['width'], "height": rect['height']}
 
@@ -614,20 +755,25 @@ class AutoInjector:
         except Exception:
             return False, None
 
-    def _calculate_image_diff(self, img_path1, img_path2):
-        """计算图片差异 (RMS)"""
+    @staticmethod
+    def _as_rgb_array(img):
+        if isinstance(img, np.ndarray):
+            return img
+        return np.asarray((img if isinstance(img, Image.Image) else Image.open(img)).convert('RGB'))
+
+    def _calculate_image_diff(self, img_path1, img_path2, roi=None, rms_threshold=None):
+        """计算图片差异指标 (RMS + SSIM + 直方图 + 边缘)，参数可以是路径、内存中的 PIL 图像或 RGB 数组
+
+        返回 cascade_score 的指标字典，'rms' 与旧版直方图算法数值一致（阈值 2.0 不变）。
+        给出 roi（注入元素 bbox）与 rms_threshold 时，变化只落在 ROI 内且低于阈值的样本
+        在 ROI 级即被判定，不做全帧评分。
+        """
         try:
-            img1 = Image.open(img_path1).convert('RGB')
-            img2 = Image.open(img_path2).convert('RGB')
-            if img1.size != img2.size: return 100.0
-            diff = ImageChops.difference(img1, img2)
-            h = diff.histogram()
-            sq = (value * ((idx % 256) ** 2) for idx, value in enumerate(h))
-            sum_of_squares = sum(sq)
-            rms = math.sqrt(sum_of_squares / float(img1.size[0] * img1.size[1]))
-            return rms
-        except:
-            return 0.0
+            img1, img2 = self._as_rgb_array(img_path1), self._as_rgb_array(img_path2)
+            return cascade_score(img1, img2, roi=roi, rms_threshold=rms_threshold, level=QUALITY_PYRAMID_LEVEL)
+        except Exception as e:
+            print(f"[!] 质量评分失败: {e}")
+            return {"rms": 0.0}
 
     def _is_in_viewport(self, bbox):
         vp_w, vp_h = VIEWPORT_SIZE
@@ -648,6 +794,8 @@ class AutoInjector:
         prefix = "vis" if bug_category == "visual" else "int"
         pair_id = f"{prefix}_{str(uuid.uuid4().hex[:8])}"
         max_retries = 3
+        # 最近一次页面还原的结果："untouched"（尚未注入）/ None（已注入、未还原）/ "rollback" / "refresh"
+        last_restore = "untouched"
         
         # 每次生成前先清理环境
         self.remove_popups_and_fixed_elements()
@@ -659,7 +807,7 @@ class AutoInjector:
                 candidates = self.get_candidate_elements()
                 if not candidates: break
                 
-                target = random.choice(candidates)
+                target = random.choice(candidates)["element"]
                 
                 # [改进 1] 提取语义信息（零成本标注的核心）
                 semantic_info = self._extract_semantic_info(target)
@@ -673,9 +821,9 @@ class AutoInjector:
                 # 记录滚动位置用于锁定
                 scroll_y = self.get_scroll_y()
 
-                # [视觉类 Bug] 保存 normal 截图
+                # [视觉类 Bug] normal 截图（PNG 字节先留在内存，样本通过校验后交给后台写入）
                 normal_path = os.path.join(IMG_DIR, f"{pair_id}_normal.png")
-                self.driver.save_screenshot(normal_path)
+                normal_png = capture_frame(self.driver)
                 
                 # --- Bug 注入 ---
                 bug_type = random.choice([
@@ -683,10 +831,12 @@ class AutoInjector:
                     "Layout_Alignment", "Layout_Spacing", "Data_Format_Error",
                     "Style_Color_Contrast", "Style_Size_Inconsistent"
                 ])
+                self._begin_undo()
+                last_restore = None
                 success, info = self.inject_bug(target, bug_type)
                 
                 if not success: 
-                    self._reset_page()
+                    last_restore = self._restore_page()
                     continue
 
                 # 等待注入渲染 + 强制浏览器重排
@@ -713,12 +863,12 @@ class AutoInjector:
                 except:
                     pass
                 
-                # [视觉类 Bug] 保存 buggy 截图
+                # [视觉类 Bug] buggy 截图
                 buggy_path = os.path.join(IMG_DIR, f"{pair_id}_buggy.png")
-                self.driver.save_screenshot(buggy_path)
+                buggy_img = Image.open(BytesIO(capture_frame(self.driver, optimize_for_speed=True)))
                 # [改进 2] 生成带动作标记的截图（红点），让 VLM 明确交互位置
                 try:
-                    self._draw_action_marker(buggy_path, overlay_bbox, action_type="click", output_path=buggy_path)
+                    self._draw_action_marker(buggy_img, overlay_bbox, action_type="click")
                 except Exception as e:
                     print(f"[!] 标记动作失败: {e}")
                 # 截图后立即移除覆盖层
@@ -730,21 +880,53 @@ class AutoInjector:
                 # --- 校验逻辑 ---
                 # 即使在 DEBUG_MODE 下也计算 diff，以监控注入是否生效
                 valid_sample = True
-                diff_score = 0.0
-
-                diff_score = self._calculate_image_diff(normal_path, buggy_path)
+                # 级联：逐字节相同 → ROI（注入前后 bbox 之外无变化时只算 ROI）→ 全帧评分
+                normal_arr = self._as_rgb_array(Image.open(BytesIO(normal_png)))
+                buggy_arr = self._as_rgb_array(buggy_img)
+                quality = self._calculate_image_diff(
+                    normal_arr, buggy_arr,
+                    roi=[normal_bbox, overlay_bbox, info.get('bbox')],
+                    rms_threshold=None if DEBUG_MODE else MIN_DIFF_RMS,
+                )
+                diff_score = quality["rms"]
                 # 在 DEBUG_MODE 下总是保存（用于肉眼检查），否则按 diff 阈值过滤
                 if not DEBUG_MODE:
-                    # 阈值设定：如果差异太小，说明注入无效
-                    if diff_score < 2.0:
+                    # 阈值设定：如果差异太小，说明注入无效（尚未写盘，直接丢弃）
+                    if diff_score < MIN_DIFF_RMS:
                         print(f"[-] {pair_id} 差异过小 (RMS={diff_score:.2f})，丢弃")
-                        try:
-                            os.remove(normal_path)
-                            os.remove(buggy_path)
-                        except: pass
+                        valid_sample = False
+
+                change_region = None
+                if valid_sample:
+                    # 像素实际变化的位置（掩码 / 连通域 / 紧致 bbox）；变化主要落在标注框之外的样本丢弃
+                    regions = extract_regions(normal_arr, buggy_arr)
+                    label_region = union_bbox([normal_bbox, info['bbox']])
+                    outside = (outside_fraction(regions["mask"], label_region, margin=CASCADE_ROI_MARGIN)
+                               if regions["mask"] is not None else 0.0)
+                    change_region = {
+                        "bbox": regions["bbox"],
+                        "bbox_norm": self._normalize_bbox(regions["bbox"]) if regions["bbox"] else None,
+                        "components": regions["components"][:REGION_MAX_COMPONENTS],
+                        "changed_pixels": regions["changed_pixels"],
+                        "outside_label_fraction": round(outside, 4),
+                        "mask_rle": regions["mask_rle"],
+                    }
+                    if not DEBUG_MODE and outside > REGION_MAX_OUTSIDE_FRACTION:
+                        print(f"[-] {pair_id} 变化区域与标注框不符 ({outside:.0%} 在框外)，丢弃")
+                        valid_sample = False
+
+                near_duplicate = None
+                if valid_sample and self.dedup_index is not None:
+                    near_duplicate = self.dedup_index.check_and_add(
+                        "visual", pair_id, normal_arr, buggy_arr, skip=DEDUP_MODE == "skip")
+                    if near_duplicate and DEDUP_MODE == "skip":
+                        print(f"[-] {pair_id} 与 {near_duplicate['id']} 近重复 (距离 {near_duplicate['distance']})，丢弃")
                         valid_sample = False
                 
                 if valid_sample:
+                    # 编码与落盘交给后台线程，驱动线程继续采集下一个样本
+                    self.frame_writer.submit(normal_path, normal_png)
+                    self.frame_writer.submit(buggy_path, buggy_img)
                     bbox_after = info['bbox']
                     label_data = {
                         "id": pair_id,
@@ -766,6 +948,10 @@ class AutoInjector:
                         
                         # 验证指标
                         "diff_score": diff_score,
+                        "quality": quality,
+                        "change_region": change_region,
+                        "near_duplicate_of": near_duplicate,
+                        "page_settle_ms": self.last_settle_ms,
                         "image_size": VIEWPORT_SIZE,
                         "timestamp": str(datetime.now()),
                     }
@@ -776,14 +962,31 @@ class AutoInjector:
                     print(f"[+] 成功: {pair_id} | {info['type']} | Diff: {diff_score:.2f}")
                     break # 成功退出循环
                 else:
-                    self._reset_page()
+                    last_restore = self._restore_page()
 
             except Exception as e:
                 print(f"[!] 尝试 {attempt} 异常: {str(e)[:50]}")
-                self._reset_page()
+                last_restore = self._restore_page()
+
+        # 最后一次注入尚未还原时（成功保存样本后 break）还原页面，保持环境（同一次页面加载可连续生成多对样本）；
+        # 循环内已回滚 / 刷新过、或根本没有注入时跳过，避免重复刷新
+        if last_restore is None:
+            self._restore_page()
 
-        # 无论成功与否，最后刷新页面保持环境
+    def _restore_page(self):
+        """页面内回滚本次注入；回滚后 DOM 哈希与注入前不一致（或回滚失败）时才刷新页面
+
+        Returns:
+            "rollback"（页面内回滚成功）或 "refresh"（已刷新页面）
+        """
+        try:
+            if self.driver.execute_script(UNDO_JOURNAL_JS + "return window.__ICE_UNDO__.rollback();"):
+                return "rollback"
+        except:
+            pass
+        print("[*] 页面内回滚未通过 DOM 校验，刷新页面")
         self._reset_page()
+        return "refresh"
 
     def _reset_page(self):
         try:
@@ -814,18 +1017,100 @@ class AutoInjector:
         try: self.driver.execute_script(script)
         except: pass
 
-    def run(self):
+    def run_unit(self, url, samples):
+        """加载一次页面并生成 samples 对样本"""
+        try:
+            self.load_page(url)
+            for _ in range(samples):
+                self.save_dataset_pair(url)
+        except Exception as e:
+            print(f"[!] 网站 {url} 失败: {e}")
+
+    def run(self, urls=None, samples_per_url=SAMPLES_PER_URL):
         print(f"=== 开始运行 | DEBUG_MODE: {DEBUG_MODE} ===")
-        for url in TARGET_URLS:
-            try:
-                self.load_page(url)
-                for _ in range(3): # 每个网站生成数量
-                    self.save_dataset_pair(url)
-            except Exception as e:
-                print(f"[!] 网站 {url} 失败: {e}")
+        for url in (urls or TARGET_URLS):
+            self.run_unit(url, samples_per_url)
         self.driver.quit()
+        self.frame_writer.close()
         print("=== 完成 ===")
 
+
+def split_work(urls, samples_per_url, workers):
+    """把 (url, 样本数) 拆分为工作单元
+
+    URL 数量少于 worker 数时，把单个 URL 的样本数拆给多个 worker（各自加载一次页面），
+    保证所有 worker 都有活干。
+    """
+    parts = max(1, min(samples_per_url, math.ceil(workers / max(1, len(urls)))))
+    units = []
+    for url in urls:
+        base, extra = divmod(samples_per_url, parts)
+        for i in range(parts):
+            n = base + (1 if i < extra else 0)
+            if n > 0:
+                units.append((url, n))
+    # 样本数多的单元优先，减少长尾
+    units.sort(key=lambda u: -u[1])
+    return units
+
+
+def _visual_worker(worker_id, task_queue, driver_path):
+    random.seed()
+    profile_dir = tempfile.mkdtemp(prefix=f"vis_worker{worker_id}_")
+    injector = None
+    try:
+        injector = AutoInjector(
+            user_data_dir=profile_dir,
+            debugging_port=DEBUG_PORT_BASE + worker_id,
+            driver_path=driver_path,
+        )
+        while True:
+            unit = task_queue.get()
+            if unit is None:
+                break
+            url, samples = unit
+            print(f"[Worker {worker_id}] {url} ({samples} 对)")
+            injector.run_unit(url, samples)
+    except Exception as e:
+        print(f"[!] Worker {worker_id} 异常退出: {e}")
+    finally:
+        if injector is not None:
+            try: injector.driver.quit()
+            except: pass
+            # 子进程不执行 atexit，显式等待后台写入完成
+            injector.frame_writer.close()
+        shutil.rmtree(profile_dir, ignore_errors=True)
+
+
+def run_parallel(workers, urls=None, samples_per_url=SAMPLES_PER_URL):
+    """多进程模式：N 个独立的 AutoInjector 进程从共享队列拉取 (url, 样本数) 单元"""
+    print(f"=== 开始运行 | DEBUG_MODE: {DEBUG_MODE} | workers: {workers} ===")
+    # 父进程先解析 chromedriver，避免多个 worker 并发下载
+    driver_path = ChromeDriverManager().install()
+    ctx = mp.get_context("spawn")
+    task_queue = ctx.Queue()
+    units = split_work(urls or TARGET_URLS, samples_per_url, workers)
+    for unit in units:
+        task_queue.put(unit)
+    for _ in range(workers):
+        task_queue.put(None)
+
+    procs = [ctx.Process(target=_visual_worker, args=(i, task_queue, driver_path)) for i in range(workers)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    print("=== 完成 ===")
+
+
 if __name__ == "__main__":
-    injector = AutoInjector()
-    injector.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="视觉缺陷配对截图采集")
+    parser.add_argument("--workers", type=int, default=1, help="并行 Chrome worker 数量（默认 1）")
+    parser.add_argument("--samples", type=int, default=SAMPLES_PER_URL, help="每个网站生成的样本对数量")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        run_parallel(args.workers, samples_per_url=args.samples)
+    else:
+        injector = AutoInjector()
+        injector.run(samples_per_url=args.samples)
\ No newline at end of file
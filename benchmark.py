@@ -0,0 +1,216 @@
+"""
+benchmark.py - 图像对比等热点函数的微基准
+
+用法:
+  python benchmark.py diff [repeat]      # 原生 404 检测的像素变化百分比：逐像素循环 vs NumPy
+  python benchmark.py quality [repeat]   # 样本质量评分：各指标单独耗时 + score_pair / 级联整体耗时
+  python benchmark.py ssim [repeat]      # 积分图 / 盒滤波 SSIM：与 skimage 的数值误差与耗时
+  python benchmark.py textdiff [repeat]  # 页面文本相似度：SequenceMatcher vs 行哈希对比
+"""
+
+import sys
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageChops
+
+from interaction_engine.config import VIEWPORT_SIZE, NATIVE_404_DIFF_SCALE, QUALITY_PYRAMID_LEVEL
+from interaction_engine.imaging import decode_png, changed_pixel_pct
+from interaction_engine import quality, ssim
+from interaction_engine.textdiff import line_diff
+
+
+def _synthetic_screenshot_pair(width: int, height: int, seed: int = 0):
+    """生成一对视口大小的 PNG：页面主体相同，中间一块区域被“错误页”覆盖"""
+    rng = np.random.default_rng(seed)
+    base = np.full((height, width, 3), 245, dtype=np.uint8)
+    # 模拟文字行 / 卡片等纹理
+    for y in range(40, height - 40, 36):
+        x0 = int(rng.integers(20, 200))
+        base[y:y + 14, x0:x0 + int(rng.integers(200, width - x0 - 20))] = rng.integers(30, 120, size=3, dtype=np.uint8)
+    changed = base.copy()
+    changed[height // 4: height * 3 // 4, width // 4: width * 3 // 4] = (255, 255, 255)
+    changed[height // 2 - 40: height // 2 + 40, width // 2 - 300: width // 2 + 300] = (40, 40, 40)
+
+    def to_png(arr):
+        buf = BytesIO()
+        Image.fromarray(arr).save(buf, format="PNG")
+        return buf.getvalue()
+
+    return to_png(base), to_png(changed)
+
+
+def _timeit(fn, repeat: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def bench_diff(repeat: int = 3) -> None:
+    width, height = VIEWPORT_SIZE
+    png1, png2 = _synthetic_screenshot_pair(width, height)
+
+    def legacy():
+        img1 = Image.open(BytesIO(png1))
+        img2 = Image.open(BytesIO(png2))
+        diff = ImageChops.difference(img1, img2)
+        diff_pixels = sum(sum(p) > 0 for p in diff.getdata())
+        return diff_pixels / (img1.width * img1.height) * 100
+
+    def vectorized(scale):
+        return lambda: changed_pixel_pct(decode_png(png1), decode_png(png2), scale=scale)
+
+    arr1, arr2 = decode_png(png1), decode_png(png2)
+    rows = [
+        ("legacy getdata loop", legacy, 1),
+        ("numpy (decode + diff)", vectorized(1), repeat),
+        (f"numpy scale={NATIVE_404_DIFF_SCALE} (decode + diff)", vectorized(NATIVE_404_DIFF_SCALE), repeat),
+        ("numpy diff only (pre-decoded)", lambda: changed_pixel_pct(arr1, arr2), repeat),
+    ]
+    print(f"📊 Changed-pixel percentage, {width}x{height} screenshot")
+    baseline = None
+    for name, fn, n in rows:
+        seconds, pct = _timeit(fn, n)
+        baseline = baseline or seconds
+        print(f"  {name:<36} {seconds * 1000:9.1f} ms   {pct:6.2f}%   x{baseline / seconds:.0f}")
+
+
+def bench_quality(repeat: int = 3) -> None:
+    width, height = VIEWPORT_SIZE
+    png1, png2 = _synthetic_screenshot_pair(width, height)
+    img1, img2 = decode_png(png1, rgb=True), decode_png(png2, rgb=True)
+    pil1, pil2 = Image.fromarray(img1), Image.fromarray(img2)
+
+    def legacy_rms():
+        h = ImageChops.difference(pil1, pil2).histogram()
+        return (sum(v * ((i % 256) ** 2) for i, v in enumerate(h)) / float(width * height)) ** 0.5
+
+    # 注入类小变化：只改动一个 20x6 的元素（RMS < 2.0，生产模式下会被丢弃）
+    small_change = img1.copy()
+    small_change[500:506, 600:620] = 200
+    roi = {"x": 600, "y": 500, "width": 20, "height": 6}
+
+    delta = img1.astype(np.int16) - img2.astype(np.int16)
+    gray1, gray2 = quality.to_gray(img1), quality.to_gray(img2)
+    small1 = quality.pyramid_down(gray1, QUALITY_PYRAMID_LEVEL)
+    small2 = quality.pyramid_down(gray2, QUALITY_PYRAMID_LEVEL)
+    rows = [
+        ("legacy rms (PIL histogram)", legacy_rms),
+        ("delta (int16)", lambda: img1.astype(np.int16) - img2.astype(np.int16)),
+        ("rms", lambda: quality.rms_from_delta(delta)),
+        ("pixel_diff_pct", lambda: np.count_nonzero(delta) * 100.0 / delta.size),
+        ("gray x2", lambda: (quality.to_gray(img1), quality.to_gray(img2))),
+        ("hist_diff", lambda: quality.hist_diff(img1, img2)),
+        ("edge_diff level 0", lambda: quality.edge_diff(gray1, gray2)),
+        (f"edge_diff level {QUALITY_PYRAMID_LEVEL}", lambda: quality.edge_diff(small1, small2)),
+        ("ssim level 0", lambda: quality.ssim_gray(gray1, gray2)),
+        (f"ssim level {QUALITY_PYRAMID_LEVEL}", lambda: quality.ssim_gray(small1, small2)),
+        ("score_pair level 0", lambda: quality.score_pair(img1, img2, level=0)),
+        (f"score_pair level {QUALITY_PYRAMID_LEVEL}", lambda: quality.score_pair(img1, img2, level=QUALITY_PYRAMID_LEVEL)),
+        ("cascade: identical frames", lambda: quality.cascade_score(img1, img1)["rms"]),
+        ("cascade: ROI-only reject", lambda: quality.cascade_score(img1, small_change, roi=roi, rms_threshold=2.0)["rms"]),
+        ("score_pair on same reject", lambda: quality.score_pair(img1, small_change)["rms"]),
+    ]
+    print(f"📊 Quality metrics, {width}x{height} pair (pre-decoded RGB)")
+    for name, fn in rows:
+        seconds, value = _timeit(fn, repeat)
+        shown = f"{value:.4f}" if isinstance(value, float) else ""
+        print(f"  {name:<30} {seconds * 1000:9.1f} ms   {shown}")
+    print(f"  score_pair: {quality.score_pair(img1, img2, level=QUALITY_PYRAMID_LEVEL)}")
+
+
+def bench_ssim(repeat: int = 3) -> None:
+    try:
+        from skimage.metrics import structural_similarity as sk_ssim
+    except ImportError:
+        sk_ssim = None
+        print("[!] scikit-image not installed, skipping the reference comparison")
+
+    width, height = VIEWPORT_SIZE
+    png1, png2 = _synthetic_screenshot_pair(width, height)
+    gray1 = quality.to_gray(decode_png(png1, rgb=True))
+    gray2 = quality.to_gray(decode_png(png2, rgb=True))
+    rng = np.random.default_rng(1)
+    noise1 = rng.integers(0, 256, size=(height, width)).astype(np.float32)
+    noise2 = np.clip(noise1 + rng.normal(0, 20, size=noise1.shape), 0, 255).astype(np.float32)
+
+    variants = [
+        ("float64, whole frame", dict(dtype=np.float64, tile_rows=0)),
+        ("float32, whole frame", dict(dtype=np.float32, tile_rows=0)),
+        ("float32, tiled", dict(dtype=np.float32)),
+    ]
+    for label, (a, b) in (("screenshot pair", (gray1, gray2)), ("noise pair", (noise1, noise2))):
+        print(f"📊 SSIM, {width}x{height} {label}")
+        reference = None
+        if sk_ssim is not None:
+            seconds, reference = _timeit(lambda: sk_ssim(a, b, data_range=255.0), repeat)
+            print(f"  {'skimage':<30} {seconds * 1000:9.1f} ms   {reference:.6f}")
+        for name, kwargs in variants:
+            seconds, value = _timeit(lambda: ssim.structural_similarity(a, b, **kwargs), repeat)
+            error = f"   |err| {abs(value - reference):.1e}" if reference is not None else ""
+            print(f"  {name:<30} {seconds * 1000:9.1f} ms   {value:.6f}{error}")
+
+
+def _synthetic_page_text(seed: int = 0, limit: int = 5000) -> str:
+    """模拟 innerText：导航 / 商品卡片 / 页脚的短行，截断到 _dom_snapshot 的 5000 字符上限"""
+    rng = np.random.default_rng(seed)
+    words = ["Apple", "Juice", "Banana", "Basket", "Add", "to", "Login", "Email", "Password", "Search",
+             "Price", "1.99¤", "Only", "left", "Customer", "Feedback", "About", "Us", "Photo", "Wall",
+             "Score", "Board", "Language", "English", "Account", "Orders", "Payment", "Options"]
+    lines = []
+    while sum(len(line) + 1 for line in lines) < limit:
+        lines.append(" ".join(rng.choice(words, size=int(rng.integers(1, 9)))))
+    return "\n".join(lines)[:limit]
+
+
+def bench_textdiff(repeat: int = 3) -> None:
+    from difflib import SequenceMatcher
+
+    before = _synthetic_page_text()
+    lines = before.split("\n")
+    cases = [
+        ("identical", before),
+        ("one word edited", before.replace("Basket", "Basket (1)", 1)),
+        ("error toast added", "\n".join(lines[:10] + ["Error: Unexpected server response (500)"] + lines[10:])[:5000]),
+        ("validation messages", "\n".join(l + ("\nPlease provide a valid email address." if i % 40 == 0 else "")
+                                          for i, l in enumerate(lines))[:5000]),
+        ("navigated to 404", _synthetic_page_text(seed=1)),
+    ]
+    print(f"📊 Page text similarity, {len(before)} chars before / after")
+    for name, after in cases:
+        sm_seconds, sm_ratio = _timeit(lambda: SequenceMatcher(None, before, after).ratio(), repeat)
+        ld_seconds, result = _timeit(lambda: line_diff(before, after), repeat)
+        print(f"  {name:<22} SequenceMatcher {sm_seconds * 1000:8.2f} ms  {sm_ratio:.4f}   "
+              f"line_diff {ld_seconds * 1000:6.2f} ms  {result['ratio']:.4f}  "
+              f"(+{len(result['added'])} / -{len(result['removed'])} lines)")
+
+
+# ===================== 命令行接口 =====================
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("用法:")
+        print("  python benchmark.py diff [repeat]      # 像素变化百分比：逐像素循环 vs NumPy")
+        print("  python benchmark.py quality [repeat]   # 样本质量评分各指标耗时")
+        print("  python benchmark.py ssim [repeat]      # SSIM 与 skimage 对比")
+        print("  python benchmark.py textdiff [repeat]  # 页面文本相似度对比")
+        sys.exit(1)
+
+    command = sys.argv[1]
+
+    if command == "diff":
+        bench_diff(int(sys.argv[2]) if len(sys.argv) > 2 else 3)
+    elif command == "quality":
+        bench_quality(int(sys.argv[2]) if len(sys.argv) > 2 else 3)
+    elif command == "ssim":
+        bench_ssim(int(sys.argv[2]) if len(sys.argv) > 2 else 3)
+    elif command == "textdiff":
+        bench_textdiff(int(sys.argv[2]) if len(sys.argv) > 2 else 3)
+    else:
+        print(f"❌ 未知命令: {command}")
+        sys.exit(1)
@@ -0,0 +1,367 @@
+"""
+dataset_tools.py - 离线处理已生成的 dataset_injected 目录（无需浏览器）
+
+用法:
+  python dataset_tools.py rescore [--workers N] [--output PATH] [--full] [阈值参数...]
+      从已保存的帧重新计算全部质量指标，写出列式评分表
+      （装有 pyarrow 时为 dataset_injected/scores.parquet，否则为 scores.csv）。
+      表中记录每个样本的文件签名（大小 + mtime），再次运行时只重算有变化的样本；
+      阈值标记（passes 列）每次都按当前参数对全表重新计算。
+
+  python dataset_tools.py dedup [--workers N] [--max-distance D] [--rebuild]
+      基于采集时维护的感知哈希索引（dataset_injected/dedup_index.jsonl）做全量近重复分组，
+      索引中缺失的样本先补算指纹；结果写入 dataset_injected/duplicates.json。
+
+帧的对应关系：
+  视觉样本   images/visual/<id>_normal.png  vs  images/visual/<id>_buggy.png
+  交互样本   meta["images"]["start"]        vs  meta["images"]["end"]（仅 dedup 使用）
+
+交互样本的验证对比的是内存中的「点击前」帧与未叠加红标的「点击后」帧，这两帧不落盘
+（start 在预填表单、滚动之前截取，end 带红标），无法从磁盘重算。rescore 直接采用引擎写入
+meta["visual_diff"]["metrics"] 的指标（全分辨率）；旧样本没有该字段时指标留空，passes 为空（无法重新判定）。
+"""
+
+import os
+import csv
+import json
+import argparse
+import multiprocessing as mp
+from typing import Dict, Any, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+from interaction_engine.config import (
+    OUTPUT_DIR,
+    META_DIR,
+    QUALITY_PYRAMID_LEVEL,
+    CASCADE_ROI_MARGIN,
+    REGION_MAX_OUTSIDE_FRACTION,
+    DEDUP_INDEX_PATH,
+    DEDUP_MAX_DISTANCE,
+)
+from auto_injector import IMG_DIR as VISUAL_IMG_DIR, MIN_DIFF_RMS
+
+SCORE_SCHEMA = 2  # 指标定义变化时递增，旧签名全部失效
+
+INT_COLUMNS = ["change_x", "change_y", "change_w", "change_h", "changed_pixels"]
+METRIC_COLUMNS = ["rms", "pixel_diff_pct", "ssim", "hist_diff", "edge_diff", *INT_COLUMNS, "outside_label_fraction"]
+COLUMNS = ["id", "bug_category", "bug_type", "expected_behavior", "frame_a", "frame_b", "signature",
+           "metrics_source", *METRIC_COLUMNS, "error", "passes"]
+
+
+# ===================== 样本发现 =====================
+
+def _file_sig(path: str) -> str:
+    try:
+        st = os.stat(path)
+        return f"{st.st_size}:{st.st_mtime_ns}"
+    except OSError:
+        return "missing"
+
+
+def _resolve_frames(meta: Dict[str, Any]) -> Tuple[str, str]:
+    if meta.get("bug_category") == "interaction":
+        images = meta.get("images", {})
+        return (os.path.join(OUTPUT_DIR, images.get("start") or ""),
+                os.path.join(OUTPUT_DIR, images.get("end") or ""))
+    sample_id = meta.get("id", "")
+    return (os.path.join(VISUAL_IMG_DIR, f"{sample_id}_normal.png"),
+            os.path.join(VISUAL_IMG_DIR, f"{sample_id}_buggy.png"))
+
+
+def collect_tasks(meta_dir: str = META_DIR) -> List[Dict[str, Any]]:
+    """读取全部元数据，得到 (样本, 帧路径, 签名) 任务列表"""
+    tasks = []
+    for filename in sorted(os.listdir(meta_dir)):
+        if not filename.endswith(".json"):
+            continue
+        meta_path = os.path.join(meta_dir, filename)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[!] 跳过无法读取的元数据 {filename}: {e}")
+            continue
+        meta.setdefault("id", filename[:-5])
+        frame_a, frame_b = _resolve_frames(meta)
+        signature = ";".join([f"v{SCORE_SCHEMA}", f"l{QUALITY_PYRAMID_LEVEL}",
+                              _file_sig(meta_path), _file_sig(frame_a), _file_sig(frame_b)])
+        label = None
+        engine_diff = None
+        if meta.get("bug_category") != "interaction":
+            label = [meta.get("bbox_before"), meta.get("bbox_after")]
+        else:
+            engine_diff = meta.get("visual_diff") or {}
+        tasks.append({
+            "id": meta["id"],
+            "bug_category": meta.get("bug_category", "visual"),
+            "bug_type": meta.get("bug_type", ""),
+            "expected_behavior": (meta.get("visual_diff") or {}).get("expected_behavior", ""),
+            "frame_a": frame_a,
+            "frame_b": frame_b,
+            "signature": signature,
+            "label": label,
+            "engine_diff": engine_diff,
+        })
+    return tasks
+
+
+# ===================== 评分（子进程） =====================
+
+def _engine_row(row: Dict[str, Any], engine_diff: Dict[str, Any]) -> Dict[str, Any]:
+    """交互样本：采用引擎在采集时对干净帧计算的指标（级联早退时未计算的指标为空）"""
+    metrics = engine_diff.get("metrics")
+    if not metrics:
+        return row
+    row["metrics_source"] = "engine"
+    for k in ("rms", "pixel_diff_pct", "ssim", "hist_diff", "edge_diff"):
+        row[k] = metrics.get(k)
+    region = engine_diff.get("change_region") or {}
+    row["changed_pixels"] = region.get("changed_pixels", 0)
+    box = region.get("bbox")
+    if box:
+        row.update(change_x=box["x"], change_y=box["y"], change_w=box["width"], change_h=box["height"])
+    return row
+
+
+def _score_task(task: Dict[str, Any]) -> Dict[str, Any]:
+    # 图像处理模块在首次评分时才导入（spawn 子进程启动更快）
+    from interaction_engine.imaging import load_image
+    from interaction_engine.quality import score_pair
+    from interaction_engine.regions import extract_regions, outside_fraction, union_bbox
+
+    row = {k: task.get(k, "") for k in ("id", "bug_category", "bug_type", "expected_behavior",
+                                        "frame_a", "frame_b", "signature")}
+    row.update({k: None for k in METRIC_COLUMNS})
+    row["error"] = ""
+    row["metrics_source"] = ""
+    if task.get("engine_diff") is not None:
+        return _engine_row(row, task["engine_diff"])
+    row["metrics_source"] = "frames"
+    try:
+        img_a = load_image(task["frame_a"], rgb=True)
+        img_b = load_image(task["frame_b"], rgb=True)
+        metrics = score_pair(img_a, img_b, level=QUALITY_PYRAMID_LEVEL)
+        for k in ("rms", "pixel_diff_pct", "ssim", "hist_diff", "edge_diff"):
+            row[k] = metrics[k]
+        regions = extract_regions(img_a, img_b)
+        row["changed_pixels"] = regions["changed_pixels"]
+        if regions["bbox"]:
+            box = regions["bbox"]
+            row.update(change_x=box["x"], change_y=box["y"], change_w=box["width"], change_h=box["height"])
+        if task.get("label") and regions["mask"] is not None:
+            row["outside_label_fraction"] = round(
+                outside_fraction(regions["mask"], union_bbox(task["label"]), margin=CASCADE_ROI_MARGIN), 4)
+    except Exception as e:
+        row["error"] = str(e)[:200]
+    return row
+
+
+# ===================== 列式评分表 =====================
+
+def _to_number(key: str, value) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    return int(float(value)) if key in INT_COLUMNS else float(value)
+
+
+def load_table(path: str) -> Dict[str, Dict[str, Any]]:
+    """读取已有评分表 → {id: row}；文件不存在时为空"""
+    if not os.path.exists(path):
+        return {}
+    if path.endswith(".parquet"):
+        if not HAS_PYARROW:
+            print(f"[!] 读取 {path} 需要 pyarrow，本次全量重算")
+            return {}
+        columns = pq.read_table(path).to_pydict()
+        rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+    else:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+        for row in rows:
+            for k in METRIC_COLUMNS:
+                row[k] = _to_number(k, row.get(k))
+    return {row["id"]: row for row in rows}
+
+
+def write_table(path: str, rows: List[Dict[str, Any]]) -> None:
+    """按列写出（parquet 或 CSV，由扩展名决定），先写临时文件再原子替换"""
+    tmp = path + ".tmp"
+    if path.endswith(".parquet"):
+        columns = {k: [row.get(k) for row in rows] for k in COLUMNS}
+        pq.write_table(pa.table(columns), tmp)
+    else:
+        with open(tmp, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS, extrasaction="ignore")
+            writer.writeheader()
+            for row in rows:
+                writer.writerow({k: "" if row.get(k) is None else row.get(k) for k in COLUMNS})
+    os.replace(tmp, path)
+
+
+def apply_thresholds(row: Dict[str, Any], args) -> Optional[bool]:
+    """按当前阈值判定样本是否保留（与两个引擎采集时的判定规则一致）
+
+    交互样本没有引擎指标时返回 None（无法重新判定）
+    """
+    if row.get("bug_category") == "interaction" and row.get("metrics_source") != "engine":
+        return None
+    if row.get("error") or row.get("rms") is None:
+        return False
+    if row.get("bug_category") == "interaction":
+        if row.get("expected_behavior") == "no_change":
+            return row["pixel_diff_pct"] < args.max_frozen_pct
+        ssim_diff = 1.0 - (row["ssim"] if row.get("ssim") is not None else 1.0)
+        return ssim_diff > args.min_ssim_diff or row["pixel_diff_pct"] > args.min_diff_pct
+    outside = row.get("outside_label_fraction")
+    return row["rms"] >= args.min_rms and (outside is None or outside <= args.max_outside)
+
+
+def _map_pool(fn, tasks: List[Dict[str, Any]], workers: int):
+    """在 spawn 进程池中处理任务（workers == 1 时在当前进程内），结果按完成顺序产出"""
+    if not tasks:
+        return
+    workers = max(1, min(workers, len(tasks)))
+    if workers == 1:
+        results, pool = map(fn, tasks), None
+    else:
+        pool = mp.get_context("spawn").Pool(workers)
+        results = pool.imap_unordered(fn, tasks, chunksize=8)
+    try:
+        for i, result in enumerate(results, 1):
+            if i % 200 == 0:
+                print(f"  ... {i}/{len(tasks)}")
+            yield result
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+
+# ===================== rescore =====================
+
+def rescore(args) -> None:
+    if not os.path.isdir(META_DIR):
+        print(f"❌ 错误: {META_DIR} 目录不存在")
+        return
+    output = args.output or os.path.join(OUTPUT_DIR, "scores.parquet" if HAS_PYARROW else "scores.csv")
+    if output.endswith(".parquet") and not HAS_PYARROW:
+        print("❌ 错误: 写 parquet 需要安装 pyarrow（或使用 --output *.csv）")
+        return
+
+    tasks = collect_tasks()
+    previous = {} if args.full else load_table(output)
+    rows: List[Dict[str, Any]] = []
+    pending = []
+    for task in tasks:
+        old = previous.get(task["id"])
+        if old and old.get("signature") == task["signature"] and not old.get("error"):
+            rows.append(old)
+        else:
+            pending.append(task)
+    print(f"📊 {len(tasks)} 个样本：{len(rows)} 个未变化，{len(pending)} 个需要重新评分")
+
+    for row in _map_pool(_score_task, pending, args.workers):
+        rows.append(row)
+        if row["error"]:
+            print(f"[!] {row['id']}: {row['error']}")
+
+    for row in rows:
+        row["passes"] = apply_thresholds(row, args)
+    rows.sort(key=lambda r: r["id"])
+    write_table(output, rows)
+    kept = sum(1 for r in rows if r["passes"])
+    undecided = sum(1 for r in rows if r["passes"] is None)
+    print(f"✅ 评分表已写入 {output}：{kept}/{len(rows)} 个样本满足当前阈值"
+          + (f"，{undecided} 个交互样本缺少引擎指标、无法判定" if undecided else ""))
+
+
+# ===================== dedup =====================
+
+def _hash_task(task: Dict[str, Any]) -> Dict[str, Any]:
+    from interaction_engine.capture import mask_label_tag
+    from interaction_engine.dedup import pair_hash
+    from interaction_engine.imaging import load_image
+
+    try:
+        img_b = load_image(task["frame_b"], rgb=True)
+        if task["bug_category"] == "interaction":
+            img_b = mask_label_tag(img_b)  # 与采集时一致：end 帧的红标区域不参与指纹
+        h = pair_hash(load_image(task["frame_a"], rgb=True), img_b)
+        return {"id": task["id"], "kind": task["bug_category"], "hash": h, "error": ""}
+    except Exception as e:
+        return {"id": task["id"], "kind": task["bug_category"], "hash": None, "error": str(e)[:200]}
+
+
+def dedup(args) -> None:
+    from interaction_engine.dedup import PHashIndex
+
+    if not os.path.isdir(META_DIR):
+        print(f"❌ 错误: {META_DIR} 目录不存在")
+        return
+    if args.rebuild and os.path.exists(DEDUP_INDEX_PATH):
+        os.remove(DEDUP_INDEX_PATH)
+    index = PHashIndex(max_distance=args.max_distance)
+
+    # 采集时已登记的样本直接复用，只为索引之外的样本（旧数据 / DEDUP_MODE=off 时生成的）计算指纹
+    tasks = collect_tasks()
+    pending = [t for t in tasks if t["id"] not in index.hashes]
+    print(f"📊 {len(tasks)} 个样本：{len(tasks) - len(pending)} 个已在索引中，{len(pending)} 个需要计算指纹")
+    for result in _map_pool(_hash_task, pending, args.workers):
+        if result["error"]:
+            print(f"[!] {result['id']}: {result['error']}")
+            continue
+        index.add(result["kind"], result["id"], result["hash"])
+
+    present = {t["id"] for t in tasks}
+    groups = []
+    for group in index.duplicate_groups(max_distance=args.max_distance):
+        group = [i for i in group if i in present]  # 索引中可能有已被删除的样本
+        if len(group) > 1:
+            groups.append(group)
+    report = {"max_distance": args.max_distance, "groups": groups,
+              "duplicates": sorted(i for g in groups for i in g[1:])}
+    output = args.output or os.path.join(OUTPUT_DIR, "duplicates.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ {len(groups)} 组近重复，共 {len(report['duplicates'])} 个冗余样本 → {output}")
+
+
+# ===================== 命令行接口 =====================
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="dataset_injected 离线工具")
+    sub = parser.add_subparsers(dest="command")
+
+    p = sub.add_parser("rescore", help="从已保存的帧重新计算质量指标，写出列式评分表")
+    p.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1), help="评分进程数")
+    p.add_argument("--output", default=None, help="输出路径（.parquet 或 .csv）")
+    p.add_argument("--full", action="store_true", help="忽略已有评分表，全部重算")
+    p.add_argument("--min-rms", type=float, default=MIN_DIFF_RMS, help="视觉样本最小 RMS")
+    p.add_argument("--max-outside", type=float, default=REGION_MAX_OUTSIDE_FRACTION,
+                   help="视觉样本变化像素落在标注框外的最大比例")
+    p.add_argument("--min-ssim-diff", type=float, default=0.05, help="交互样本：1 - SSIM 超过该值视为有变化")
+    p.add_argument("--min-diff-pct", type=float, default=2.0, help="交互样本：像素差异百分比超过该值视为有变化")
+    p.add_argument("--max-frozen-pct", type=float, default=1.0, help="Operation_No_Response：像素差异低于该值视为冻结")
+
+    p = sub.add_parser("dedup", help="感知哈希近重复检测，输出重复分组")
+    p.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1), help="计算指纹的进程数")
+    p.add_argument("--max-distance", type=int, default=DEDUP_MAX_DISTANCE, help="视为近重复的最大汉明距离")
+    p.add_argument("--rebuild", action="store_true", help="丢弃现有索引，从已保存的帧重建")
+    p.add_argument("--output", default=None, help="报告路径（默认 dataset_injected/duplicates.json）")
+    return parser
+
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    if args.command == "rescore":
+        rescore(args)
+    elif args.command == "dedup":
+        dedup(args)
+    else:
+        build_parser().print_help()
@@ -2,3 +2,4 @@ from .config import *
 from .capture import *
 from .selector import *
 from .injectors import *
+from .parallel import *
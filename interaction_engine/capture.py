@@ -1,14 +1,57 @@
 import os
 import time
+import base64
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 from typing import Tuple
 
 from .config import OUTPUT_DIR, IMG_INTERACTION_DIR
 
+LABEL_TAG_SIZE = (140, 32)  # red bug-type tag drawn in the top-right corner of action / end frames
+LABEL_TAG_PAD = (16, 12)
 
-def visualize_action(img_path: str, x: int, y: int, output_path: str | None = None, label: str | None = None) -> str:
-    """Overlay a pointer on a screenshot to mark the intended click. Optional label."""
-    img = Image.open(img_path).convert("RGBA")
+
+def visualize_action(img_path, x: int, y: int, output_path: str | None = None, label: str | None = None,
+                     writer=None) -> str:
+    """Overlay a pointer on a screenshot to mark the intended click. Optional label.
+
+    img_path may also be an in-memory frame (RGB numpy array or PIL Image); output_path is then required.
+    With a FrameWriter the overlay is rendered and saved on its background threads.
+    """
+    if output_path is None:
+        output_path = img_path.replace(".png", "_action.png")
+    if writer is not None:
+        writer.submit_task(_render_action, img_path, x, y, output_path, label)
+        return output_path
+    return _render_action(img_path, x, y, output_path, label)
+
+
+def label_tag_bounds(width: int) -> Tuple[int, int, int, int]:
+    """(x0, y0, x1, y1) of the red label tag in a frame of the given width (inclusive rectangle corners)."""
+    tag_w, tag_h = LABEL_TAG_SIZE
+    tx = width - tag_w - LABEL_TAG_PAD[0]
+    ty = LABEL_TAG_PAD[1]
+    return tx, ty, tx + tag_w, ty + tag_h
+
+
+def mask_label_tag(frame: np.ndarray) -> np.ndarray:
+    """Copy of an RGB frame with the label-tag area zeroed.
+
+    Tagged end frames on disk and the clean in-memory end frame become identical, so both hash the same.
+    """
+    x0, y0, x1, y1 = label_tag_bounds(frame.shape[1])
+    out = frame.copy()
+    out[max(0, y0):y1 + 1, max(0, x0):x1 + 1] = 0
+    return out
+
+
+def _render_action(img_path, x: int, y: int, output_path: str, label: str | None) -> str:
+    if isinstance(img_path, np.ndarray):
+        img = Image.fromarray(img_path).convert("RGBA")
+    elif isinstance(img_path, Image.Image):
+        img = img_path.convert("RGBA")
+    else:
+        img = Image.open(img_path).convert("RGBA")
     overlay = Image.new("RGBA", img.size, (0, 0, 0, 0))
     draw = ImageDraw.Draw(overlay)
 
@@ -31,15 +74,11 @@ def visualize_action(img_path: str, x: int, y: int, output_path: str | None = No
     # Draw Label (Simulated Overlay) - Red tag in top-right corner
     if label:
         try:
-            # Red tag dimensions and positioning
-            tag_w = 140
-            tag_h = 32
-            pad_x, pad_y = 16, 12
-            tx = img.width - tag_w - pad_x  # Right-aligned
-            ty = pad_y                       # Top position
+            # Red tag: right-aligned at the top (see label_tag_bounds)
+            tx, ty, tx_end, ty_end = label_tag_bounds(img.width)
             
             # Draw red background rectangle with border
-            draw.rectangle([tx, ty, tx+tag_w, ty+tag_h], 
+            draw.rectangle([tx, ty, tx_end, ty_end], 
                           fill=(239, 68, 68, 240),      # Bright red with slight transparency
                           outline=(220, 53, 53, 255))   # Darker red border
             
@@ -51,12 +90,41 @@ def visualize_action(img_path: str, x: int, y: int, output_path: str | None = No
             pass
 
     out = Image.alpha_composite(img, overlay)
-    if output_path is None:
-        output_path = img_path.replace(".png", "_action.png")
     out.save(output_path)
     return output_path
 
 
+def capture_frame(driver, fmt: str = "png", quality: int | None = None, clip: dict | None = None,
+                  scale: float = 1.0, optimize_for_speed: bool = False) -> bytes:
+    """Capture the viewport through CDP Page.captureScreenshot and return the encoded bytes.
+
+    fmt: "png" (lossless, for frames that ship in the dataset) | "jpeg" | "webp" (diff-only frames).
+    clip: optional viewport-relative rect {x, y, width, height}; scale < 1 downsamples in the browser.
+    optimize_for_speed: faster, larger encoding (still lossless for PNG).
+    Falls back to driver.get_screenshot_as_png() when the CDP command is unavailable.
+    """
+    params = {"format": fmt, "captureBeyondViewport": False}
+    if fmt != "png" and quality is not None:
+        params["quality"] = int(quality)
+    if optimize_for_speed:
+        params["optimizeForSpeed"] = True
+    try:
+        if clip is not None or scale != 1.0:
+            # CDP clip 以文档坐标表示，需要加上当前滚动偏移
+            sx, sy, vw, vh = driver.execute_script(
+                "return [window.scrollX, window.scrollY, window.innerWidth, window.innerHeight];"
+            )
+            rect = clip or {"x": 0, "y": 0, "width": vw, "height": vh}
+            params["clip"] = {
+                "x": sx + rect["x"], "y": sy + rect["y"],
+                "width": rect["width"], "height": rect["height"], "scale": scale,
+            }
+        data = driver.execute_cdp_cmd("Page.captureScreenshot", params)["data"]
+        return base64.b64decode(data)
+    except Exception:
+        return driver.get_screenshot_as_png()
+
+
 def ensure_dirs() -> None:
     os.makedirs(IMG_INTERACTION_DIR, exist_ok=True)
     os.makedirs(os.path.join(OUTPUT_DIR, "raw_metadata"), exist_ok=True)
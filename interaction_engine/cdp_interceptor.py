@@ -0,0 +1,339 @@
+"""
+CDP 网络故障注入 - JSNetworkInterceptor 的 Fetch 域版本
+
+JSNetworkInterceptor 在页面 JS 中改写 window.fetch / XMLHttpRequest，
+覆盖不到 <form> 提交、图片等非脚本请求，且每个请求都要在页面内逐条匹配规则。
+本后端在网络层通过 Chrome DevTools Fetch 域拦截：
+    Fetch.enable(patterns) → Fetch.requestPaused → fulfillRequest / failRequest / continueRequest
+
+Fetch.requestPaused 是事件，selenium 的 execute_cdp_cmd 只能发命令收不到事件，
+因此这里经由 debuggerAddress 另开一条 DevTools websocket 会话（websocket-client），
+在后台线程中处理事件。规则在 Python 侧预编译；没有规则时关闭 Fetch 域，不产生任何开销。
+
+页面会话的 Fetch 域只暂停该页面自己发出的请求。Service Worker / Worker 中的 fetch()
+属于各自的 target，因此会话开启 Target.setAutoAttach(flatten)：子 target 在启动时暂停，
+与页面使用同一套 Fetch 设置后再放行，其暂停的请求按 sessionId 回复。
+
+已知限制：Fetch 域不拦截 WebSocket（握手与帧都不会出现在 requestPaused 中），
+WebSocket 通信不受任何规则影响。
+"""
+import re
+import json
+import time
+import base64
+import threading
+from typing import Dict, List, Any
+
+import requests
+
+try:
+    import websocket  # websocket-client
+    HAS_WEBSOCKET = True
+except ImportError:
+    HAS_WEBSOCKET = False
+
+from .config import CDP_FAULT_RESOURCE_TYPES, CDP_TIMEOUT_HANG_MS
+from .readiness import READINESS_TRACKER_JS
+
+# 子 target 启动即暂停，等 Fetch 设置同步后再放行（flatten：子会话复用同一条 websocket）
+AUTO_ATTACH_PARAMS = {"autoAttach": True, "waitForDebuggerOnStart": True, "flatten": True}
+
+
+class CDPNetworkInterceptor:
+    """与 JSNetworkInterceptor 相同的 API，规则作用于网络层
+
+    规则跨导航保持（persistent_rules = True），调用方需在样本结束后 reset_interceptor()。
+    """
+
+    persistent_rules = True
+
+    def __init__(self, driver, resource_types: List[str] | None = None, timeout_hang_ms: int = CDP_TIMEOUT_HANG_MS):
+        self.driver = driver
+        self.resource_types = list(resource_types or CDP_FAULT_RESOURCE_TYPES)
+        self.timeout_hang_ms = timeout_hang_ms
+        self.document_start = False
+        self.injection_state = {}
+
+        self._ws = None
+        self._reader = None
+        self._send_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._msg_id = 0
+        self._fetch_enabled = False
+        self._sessions: Dict[str, str] = {}  # 自动附加的子 target：sessionId → type
+        self._timers: Dict[str, threading.Timer] = {}
+        self._logs: List[Dict[str, Any]] = []
+        self._regex: Dict[str, Any] = {}
+        self._timeout_urls: List[Any] = []
+        self._error_urls: List[tuple] = []
+        self._delay_ms = 0
+        self._silent_mode = False
+
+    # ------------------------------------------------------------------ #
+    # DevTools 会话
+    # ------------------------------------------------------------------ #
+    def _page_ws_url(self) -> str | None:
+        address = (self.driver.capabilities.get("goog:chromeOptions") or {}).get("debuggerAddress")
+        if not address:
+            return None
+        targets = requests.get(f"http://{address}/json/list", timeout=5).json()
+        pages = [t for t in targets if t.get("type") == "page" and t.get("webSocketDebuggerUrl")]
+        if not pages:
+            return None
+        current = self.driver.current_url
+        for t in pages:
+            if t.get("url") == current:
+                return t["webSocketDebuggerUrl"]
+        return pages[0]["webSocketDebuggerUrl"]
+
+    def start(self) -> bool:
+        """连接当前标签页的 DevTools websocket 并启动事件线程"""
+        if self._ws is not None:
+            return True
+        if not HAS_WEBSOCKET:
+            print("[!] CDP interceptor requires websocket-client (pip install websocket-client)")
+            return False
+        try:
+            ws_url = self._page_ws_url()
+            if not ws_url:
+                print("[!] CDP interceptor: no debuggable page target")
+                return False
+            self._ws = websocket.create_connection(ws_url, timeout=10, suppress_origin=True)
+            self._ws.settimeout(None)
+        except Exception as e:
+            print(f"[!] CDP interceptor: failed to connect DevTools session: {e}")
+            self._ws = None
+            return False
+        self._reader = threading.Thread(target=self._read_loop, name="cdp-interceptor", daemon=True)
+        self._reader.start()
+        self._send("Target.setAutoAttach", AUTO_ATTACH_PARAMS)
+        self.injection_state["cdp_session"] = True
+        return True
+
+    def stop(self) -> None:
+        with self._lock:
+            timers = list(self._timers.values())
+            self._timers.clear()
+        for t in timers:
+            t.cancel()
+        ws, self._ws = self._ws, None
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+        self._fetch_enabled = False
+        self._sessions.clear()
+
+    def _send(self, method: str, params: Dict[str, Any] | None = None, session_id: str | None = None) -> bool:
+        ws = self._ws
+        if ws is None:
+            return False
+        with self._send_lock:
+            self._msg_id += 1
+            message = {"id": self._msg_id, "method": method, "params": params or {}}
+            if session_id:
+                message["sessionId"] = session_id
+            payload = json.dumps(message)
+            try:
+                ws.send(payload)
+                return True
+            except Exception:
+                return False
+
+    def _read_loop(self) -> None:
+        while self._ws is not None:
+            try:
+                message = json.loads(self._ws.recv())
+            except Exception:
+                break
+            event = message.get("method")
+            try:
+                if event == "Fetch.requestPaused":
+                    self._on_request_paused(message.get("params", {}), message.get("sessionId"))
+                elif event == "Target.attachedToTarget":
+                    self._on_attached(message.get("params", {}))
+                elif event == "Target.detachedFromTarget":
+                    self._sessions.pop(message.get("params", {}).get("sessionId"), None)
+            except Exception as e:
+                print(f"[!] CDP interceptor: failed to handle {event}: {e}")
+
+    def _on_attached(self, params: Dict[str, Any]) -> None:
+        """子 target（Service Worker / Worker / 跨进程 iframe）启动时暂停在这里：同步 Fetch 设置后放行"""
+        session_id = params.get("sessionId")
+        if not session_id:
+            return
+        self._sessions[session_id] = params.get("targetInfo", {}).get("type", "other")
+        self._send("Target.setAutoAttach", AUTO_ATTACH_PARAMS, session_id)
+        if self._fetch_enabled:
+            self._send("Fetch.enable", {"patterns": self._fetch_patterns()}, session_id)
+        if params.get("waitingForDebugger"):
+            self._send("Runtime.runIfWaitingForDebugger", None, session_id)
+
+    # ------------------------------------------------------------------ #
+    # 规则匹配（Python 侧预编译）
+    # ------------------------------------------------------------------ #
+    def _compile(self, pattern: str):
+        if pattern not in self._regex:
+            try:
+                self._regex[pattern] = re.compile(pattern)
+            except re.error:
+                self._regex[pattern] = None
+        return self._regex[pattern]
+
+    def _has_rules(self) -> bool:
+        return bool(self._timeout_urls or self._error_urls or self._delay_ms > 0 or self._silent_mode)
+
+    def _fetch_patterns(self) -> List[Dict[str, str]]:
+        return [{"urlPattern": "*", "resourceType": t, "requestStage": "Request"}
+                for t in self.resource_types + ["Document"]]
+
+    def _sync_fetch_domain(self) -> bool:
+        """有规则时在页面及所有已附加的子 target 上开启 Fetch 域（只暂停目标资源类型），无规则时关闭"""
+        if self._has_rules() and not self._fetch_enabled:
+            patterns = self._fetch_patterns()
+            self._fetch_enabled = self._send("Fetch.enable", {"patterns": patterns})
+            for session_id in list(self._sessions):
+                self._send("Fetch.enable", {"patterns": patterns}, session_id)
+            return self._fetch_enabled
+        if not self._has_rules() and self._fetch_enabled:
+            self._send("Fetch.disable")
+            for session_id in list(self._sessions):
+                self._send("Fetch.disable", None, session_id)
+            self._fetch_enabled = False
+        return True
+
+    def _log(self, entry: Dict[str, Any]) -> None:
+        entry["timestamp"] = int(time.time() * 1000)
+        with self._lock:
+            self._logs.append(entry)
+
+    def _on_request_paused(self, params: Dict[str, Any], session_id: str | None = None) -> None:
+        request_id = params.get("requestId")
+        request = params.get("request", {})
+        url = request.get("url", "")
+        resource_type = params.get("resourceType", "Other")
+        http_method = request.get("method", "GET")
+        method = f"cdp-{resource_type.lower()}"
+
+        # 页面导航只对表单提交（非 GET）注入故障，普通链接跳转照常放行
+        if resource_type == "Document" and http_method == "GET":
+            self._send("Fetch.continueRequest", {"requestId": request_id}, session_id)
+            return
+
+        if any(rx.search(url) for rx in self._timeout_urls):
+            self._log({"type": "timeout", "url": url, "method": method})
+            self._schedule(request_id, self.timeout_hang_ms,
+                           "Fetch.failRequest", {"requestId": request_id, "errorReason": "TimedOut"}, session_id)
+            return
+
+        for rx, error_code in self._error_urls:
+            if rx.search(url):
+                self._log({"type": "error", "url": url, "code": error_code, "method": method})
+                body = json.dumps({"error": "Server Error", "code": error_code}).encode("utf-8")
+                self._send("Fetch.fulfillRequest", {
+                    "requestId": request_id,
+                    "responseCode": error_code,
+                    "responseHeaders": [{"name": "Content-Type", "value": "application/json"}],
+                    "body": base64.b64encode(body).decode("ascii"),
+                }, session_id)
+                return
+
+        if self._silent_mode:
+            self._log({"type": "silent", "url": url, "method": method})
+            self._send("Fetch.fulfillRequest", {
+                "requestId": request_id,
+                "responseCode": 200,
+                "responseHeaders": [{"name": "Content-Type", "value": "application/json"}],
+                "body": "",
+            }, session_id)
+            return
+
+        if self._delay_ms > 0:
+            self._log({"type": "delay", "url": url, "delay_ms": self._delay_ms, "method": method})
+            self._schedule(request_id, self._delay_ms, "Fetch.continueRequest", {"requestId": request_id}, session_id)
+            return
+
+        self._send("Fetch.continueRequest", {"requestId": request_id}, session_id)
+
+    def _schedule(self, request_id: str, delay_ms: int, method: str, params: Dict[str, Any],
+                  session_id: str | None = None) -> None:
+        def fire():
+            with self._lock:
+                self._timers.pop(request_id, None)
+            self._send(method, params, session_id)
+
+        timer = threading.Timer(delay_ms / 1000, fire)
+        timer.daemon = True
+        with self._lock:
+            self._timers[request_id] = timer
+        timer.start()
+
+    # ------------------------------------------------------------------ #
+    # 与 JSNetworkInterceptor 相同的 API
+    # ------------------------------------------------------------------ #
+    def install_on_new_document(self, with_readiness_tracker: bool = True) -> bool:
+        if not self.start():
+            return False
+        self.document_start = True
+        if with_readiness_tracker:
+            try:
+                self.driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": READINESS_TRACKER_JS})
+            except Exception:
+                pass
+        return True
+
+    def inject_fetch_interceptor(self) -> bool:
+        return self.start()
+
+    def configure(self, timeout_urls: List[str] | None = None, error_urls: Dict[str, int] | None = None,
+                  delay_ms: int = 0, silent_mode: bool = False, clear_logs: bool = True) -> bool:
+        """一次调用替换全部拦截规则"""
+        if not self.start():
+            return False
+        self._timeout_urls = [rx for rx in (self._compile(p) for p in (timeout_urls or [])) if rx]
+        self._error_urls = [(rx, int(code)) for rx, code in
+                            ((self._compile(p), c) for p, c in (error_urls or {}).items()) if rx]
+        self._delay_ms = int(delay_ms)
+        self._silent_mode = bool(silent_mode)
+        if clear_logs:
+            self.clear_logs()
+        return self._sync_fetch_domain()
+
+    def intercept_request_timeout(self, url_pattern: str) -> bool:
+        rx = self._compile(url_pattern)
+        if rx is None or not self.start():
+            return False
+        self._timeout_urls = self._timeout_urls + [rx]
+        return self._sync_fetch_domain()
+
+    def intercept_request_error(self, url_pattern: str, error_code: int = 500) -> bool:
+        rx = self._compile(url_pattern)
+        if rx is None or not self.start():
+            return False
+        self._error_urls = [(r, c) for r, c in self._error_urls if r is not rx] + [(rx, int(error_code))]
+        return self._sync_fetch_domain()
+
+    def set_global_delay(self, delay_ms: int) -> bool:
+        if not self.start():
+            return False
+        self._delay_ms = int(delay_ms)
+        return self._sync_fetch_domain()
+
+    def get_logs(self) -> List[Dict]:
+        with self._lock:
+            return list(self._logs)
+
+    def clear_logs(self) -> bool:
+        """清空拦截日志"""
+        with self._lock:
+            self._logs = []
+        return True
+
+    def reset_interceptor(self) -> bool:
+        """重置所有拦截配置（但保留日志），并关闭 Fetch 域"""
+        self._timeout_urls = []
+        self._error_urls = []
+        self._delay_ms = 0
+        self._silent_mode = False
+        return self._sync_fetch_domain()
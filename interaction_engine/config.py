@@ -16,6 +16,71 @@ LINK_SAMPLES_PER_PAGE = 3
 DEFAULT_SAMPLES_PER_SITE = 6
 DEFAULT_LINK_SAMPLES = LINK_SAMPLES_PER_PAGE
 
+# Page readiness (in-page quiescence detector, see readiness.py)
+SETTLE_QUIET_MS = 300      # 无 DOM 变更 / 无进行中请求需持续的时间
+SETTLE_MAX_MS = 10000      # 硬上限
+SETTLE_ROUTE_FACTOR = 2.0  # 路由有历史 settle_ms（站点档案）时，等待上限 = 历史值 x 此系数
+SETTLE_ROUTE_MIN_MS = 1500 # 按历史值收紧后的最小上限
+SETTLE_ROUTE_REWRITE = 0.5 # 新测得的 settle_ms 与档案相差超过此比例（或超时状态变化）时才回写
+
+# Network interceptor: register once per driver via CDP Page.addScriptToEvaluateOnNewDocument
+# (present in every document / frame from the first byte); False = inject after readyState
+INTERCEPTOR_AT_DOCUMENT_START = True
+
+# Network fault backend: "js" = JSNetworkInterceptor (patches fetch / XHR in page JS),
+# "cdp" = CDPNetworkInterceptor (Chrome DevTools Fetch domain, needs websocket-client)
+NETWORK_BACKEND = "js"
+CDP_FAULT_RESOURCE_TYPES = ["XHR", "Fetch", "EventSource", "Image", "Ping", "Other"]  # Document: only non-GET
+CDP_TIMEOUT_HANG_MS = 15000  # 与 JS 拦截器的 15s 超时保持一致
+
+# Native 404 detection: screenshot diff sampling stride (1 = full resolution)
+NATIVE_404_DIFF_SCALE = 2
+NATIVE_404_PROBE_TIMEOUT = 3  # seconds per HTTP probe (all candidate paths are probed concurrently)
+
+# Site capability profiles (native 404 / loading / toast, page types, settle times), one JSON per origin
+PROFILE_DIR = os.path.join(OUTPUT_DIR, "site_profiles")
+PROFILE_TTL = 7 * 24 * 3600  # seconds
+
+# Screenshot capture (CDP Page.captureScreenshot, see capture.capture_frame)
+# Intermediate frames that are only diffed (never shipped) may use a lossy format;
+# dataset frames always stay lossless PNG.
+INTERMEDIATE_FRAME_FORMAT = "jpeg"   # "png" | "jpeg" | "webp"
+INTERMEDIATE_FRAME_QUALITY = 80
+DIFF_NOISE_TOLERANCE = 12            # per-channel delta ignored when diffing lossy frames
+
+# Sample quality scoring (interaction_engine/quality.py)
+QUALITY_PYRAMID_LEVEL = 1     # SSIM / edge metrics on a 2^level downscaled copy (0 = full resolution)
+QUALITY_EDGE_THRESHOLD = 40   # gradient magnitude (0-510) counted as an edge pixel
+SSIM_TILE_ROWS = 128          # SSIM rows per tile (bounds temporaries to one tile; <= 0 = whole frame)
+CASCADE_ROI_MARGIN = 24       # px around the injected bbox(es) covered by the ROI stage (debug overlay glow, marker)
+CLICK_ROI_RMS = 2.0           # interaction pre/post-click diff: below this, with changes confined to the clicked element, counts as no visual change
+
+# Change-region extraction (interaction_engine/regions.py)
+REGION_DIFF_TOLERANCE = 8         # per-channel delta below this is rendering noise, not change
+REGION_MIN_AREA = 16              # connected components smaller than this (px) are dropped
+REGION_MASK_SCALE = 4             # stored RLE mask is downscaled by this factor
+REGION_MAX_COMPONENTS = 32        # largest components kept in the sample metadata
+REGION_MAX_OUTSIDE_FRACTION = 0.5 # reject visual samples with more changed pixels outside the label than this
+
+# Page-text similarity for interaction evidence (interaction_engine/textdiff.py)
+TEXT_DIFF_REFINE_LIMIT = 2000  # char-level refinement only when both unmatched remainders are this short
+TEXT_DIFF_MAX_LINES = 10       # added / removed lines kept in the evidence signals
+RECORDER_TEXT_LIMIT = 5000     # chars of added-node text kept by the in-page change recorder (recorder.py)
+
+# Near-duplicate index (interaction_engine/dedup.py)
+DEDUP_MODE = "flag"           # "flag" = mark near_duplicate_of in metadata | "skip" = drop the sample | "off"
+DEDUP_INDEX_PATH = os.path.join(OUTPUT_DIR, "dedup_index.jsonl")
+DEDUP_HASH_SIZE = 16          # dHash grid per frame (16 -> 256 bits; a sample hashes two frames)
+DEDUP_MAX_DISTANCE = 8        # Hamming distance (of 512 bits) treated as a near duplicate
+
+# Background frame writer (PNG encode + disk write off the Chrome-driving thread)
+FRAME_WRITER_THREADS = 2
+FRAME_WRITER_QUEUE = 8      # max pending frames before submit() blocks (backpressure)
+
+# Parallel workers (each worker owns one Chrome with its own profile dir / debugging port)
+DEFAULT_WORKERS = 1
+DEBUG_PORT_BASE = 9300
+
 # Target sites with routes (deep traversal)
 TARGETS = {
     "juice_shop": {
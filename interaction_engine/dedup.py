@@ -0,0 +1,176 @@
+"""
+近重复样本索引 - 感知哈希 (dHash) + BK-tree
+
+两个引擎会反复访问同几个路由（Juice Shop 登录 / 注册等），大量样本的帧几乎相同。
+每个样本由一对帧描述（视觉：normal + buggy；交互：start + end），
+两帧各取 16x16 dHash（256 bit）拼接成 512 bit 的样本指纹，汉明距离 <= 阈值即视为近重复。
+
+- 指纹按类别（visual / interaction）放入各自的 BK-tree，查询只访问距离可能满足的子树
+- 索引持久化为追加写入的 JSONL（dataset_injected/dedup_index.jsonl），每行一个样本；
+  多个 worker 并发追加时，每次查询前先读入其他进程新追加的行
+"""
+import os
+import json
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import cv2
+    HAS_CV2 = True
+except ImportError:
+    HAS_CV2 = False
+try:
+    from PIL import Image
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+from .config import DEDUP_INDEX_PATH, DEDUP_HASH_SIZE, DEDUP_MAX_DISTANCE
+from .quality import to_gray
+
+
+def dhash(img: np.ndarray, size: int = DEDUP_HASH_SIZE) -> int:
+    """差分哈希：缩到 (size + 1) x size 灰度图，比较水平相邻像素，得到 size * size bit 整数"""
+    # 先缩小再转灰度（区域平均与灰度加权都是线性的，顺序不影响结果，但只需转换 17x16 个像素）
+    if HAS_CV2:
+        small = cv2.resize(img, (size + 1, size), interpolation=cv2.INTER_AREA)
+    else:
+        small = np.asarray(Image.fromarray(img).resize((size + 1, size), Image.BOX))
+    small = to_gray(small)
+    bits = (small[:, 1:] > small[:, :-1]).reshape(-1)
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def pair_hash(img1: np.ndarray, img2: np.ndarray, size: int = DEDUP_HASH_SIZE) -> int:
+    """样本指纹：两帧 dHash 拼接"""
+    return (dhash(img1, size) << (size * size)) | dhash(img2, size)
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """汉明距离上的 BK-tree；节点为 [hash, [id, ...], {distance: child}]"""
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, h: int, item: str) -> None:
+        self.size += 1
+        if self.root is None:
+            self.root = [h, [item], {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(h, node[0])
+            if d == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [h, [item], {}]
+                return
+            node = child
+
+    def query(self, h: int, max_distance: int) -> List[Tuple[int, str]]:
+        """返回所有距离 <= max_distance 的 (distance, id)，按距离升序"""
+        found = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            d = hamming(h, node[0])
+            if d <= max_distance:
+                found.extend((d, item) for item in node[1])
+            for dist, child in node[2].items():
+                if d - max_distance <= dist <= d + max_distance:
+                    stack.append(child)
+        found.sort()
+        return found
+
+
+class PHashIndex:
+    def __init__(self, path: str = DEDUP_INDEX_PATH, max_distance: int = DEDUP_MAX_DISTANCE):
+        self.path = path
+        self.max_distance = max_distance
+        self.trees: Dict[str, BKTree] = {}
+        self.hashes: Dict[str, int] = {}  # id → 指纹
+        self.kinds: Dict[str, str] = {}   # id → 类别
+        self._offset = 0
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._sync()
+
+    def _insert(self, kind: str, sample_id: str, h: int) -> None:
+        if sample_id in self.hashes:
+            return
+        self.hashes[sample_id] = h
+        self.kinds[sample_id] = kind
+        self.trees.setdefault(kind, BKTree()).add(h, sample_id)
+
+    def _sync(self) -> None:
+        """读入索引文件中上次读取之后追加的行（包括其他 worker 写入的）"""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # 另一个进程写了一半的行，下次再读
+                    self._offset += len(line)
+                    try:
+                        entry = json.loads(line)
+                        self._insert(entry["kind"], entry["id"], int(entry["hash"], 16))
+                    except (ValueError, KeyError):
+                        continue
+        except FileNotFoundError:
+            pass
+
+    def query(self, kind: str, h: int, max_distance: int | None = None) -> List[Tuple[int, str]]:
+        self._sync()
+        tree = self.trees.get(kind)
+        if tree is None:
+            return []
+        return tree.query(h, self.max_distance if max_distance is None else max_distance)
+
+    def add(self, kind: str, sample_id: str, h: int) -> None:
+        """追加一个样本（单行 O_APPEND 写入，多进程并发安全）"""
+        line = json.dumps({"kind": kind, "id": sample_id, "hash": format(h, "x"), "ts": time.time()}) + "\n"
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line)
+        self._sync()
+
+    def check_and_add(self, kind: str, sample_id: str, img1: np.ndarray, img2: np.ndarray,
+                      skip: bool = False) -> Optional[Dict[str, Any]]:
+        """计算样本指纹并登记；与已有样本近重复时返回最近的那个 {'id', 'distance'}，否则 None
+
+        skip=True 时近重复样本不登记（调用方会丢弃它）
+        """
+        h = pair_hash(img1, img2)
+        matches = [m for m in self.query(kind, h) if m[1] != sample_id]
+        if not (matches and skip):
+            self.add(kind, sample_id, h)
+        if matches:
+            distance, other = matches[0]
+            return {"id": other, "distance": distance}
+        return None
+
+    def duplicate_groups(self, kind: str | None = None, max_distance: int | None = None) -> List[List[str]]:
+        """批量去重：按 id 顺序贪心分组，每组第一个为保留样本，其余为其近重复"""
+        self._sync()
+        radius = self.max_distance if max_distance is None else max_distance
+        groups = []
+        for k, tree in self.trees.items():
+            if kind is not None and k != kind:
+                continue
+            assigned = set()
+            for sample_id in sorted(i for i, kk in self.kinds.items() if kk == k):
+                if sample_id in assigned:
+                    continue
+                members = [i for _, i in tree.query(self.hashes[sample_id], radius) if i not in assigned]
+                assigned.update(members)
+                if len(members) > 1:
+                    members.remove(sample_id)
+                    groups.append([sample_id, *sorted(members)])
+        return groups
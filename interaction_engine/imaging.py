@@ -0,0 +1,78 @@
+"""
+截图像素对比工具 - 基于 NumPy 数组的向量化实现
+
+截图直接从 PNG 字节解码为 uint8 数组（HxWx3），避免逐像素的 Python 循环。
+所有 diff 站点（原生 404 检测、点击前后对比等）共用这里的函数。
+"""
+from io import BytesIO
+
+import numpy as np
+
+try:
+    import cv2
+    HAS_CV2 = True
+except ImportError:
+    HAS_CV2 = False
+try:
+    from PIL import Image
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+
+def decode_png(data: bytes, rgb: bool = False) -> np.ndarray:
+    """PNG（或 capture_frame 产生的 JPEG / WebP）字节 → uint8 数组 (H, W, 3)
+
+    rgb=False 时 cv2 可用则为 BGR 顺序（像素对比与通道顺序无关，省去一次转换）；
+    rgb=True 时保证 RGB 顺序（用于叠加绘制 / 灰度转换）。
+    """
+    if HAS_CV2:
+        img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if img is not None:
+            return cv2.cvtColor(img, cv2.COLOR_BGR2RGB) if rgb else img
+    if HAS_PIL:
+        return np.asarray(Image.open(BytesIO(data)).convert("RGB"))
+    raise RuntimeError("No image decoder available (install opencv-python or pillow)")
+
+
+def load_image(path: str, rgb: bool = False) -> np.ndarray:
+    """从文件读取截图为 uint8 数组 (H, W, 3)"""
+    with open(path, "rb") as f:
+        return decode_png(f.read(), rgb=rgb)
+
+
+def downscale(img: np.ndarray, factor: int) -> np.ndarray:
+    """按步长抽样缩小（不做插值，保持像素值不变，适合“是否变化”类统计）"""
+    if factor <= 1:
+        return img
+    return img[::factor, ::factor]
+
+
+def changed_pixel_mask(img1: np.ndarray, img2: np.ndarray, tolerance: int = 0) -> np.ndarray:
+    """逐像素变化掩码：任一通道差值 > tolerance 即视为变化"""
+    if tolerance <= 0:
+        changed = img1 != img2
+    else:
+        changed = np.abs(img1.astype(np.int16) - img2.astype(np.int16)) > tolerance
+    if changed.ndim == 3:
+        # 按通道逐个 OR 比 np.any(axis=-1) 快一个数量级（避免沿最内轴的归约）
+        merged = changed[..., 0].copy()
+        for c in range(1, changed.shape[-1]):
+            merged |= changed[..., c]
+        return merged
+    return changed
+
+
+def changed_pixel_pct(img1: np.ndarray, img2: np.ndarray, scale: int = 1, tolerance: int = 0) -> float:
+    """两张截图中发生变化的像素百分比 (0-100)
+
+    Args:
+        scale: 抽样步长（>1 时在缩小后的副本上统计，结果为近似值）
+        tolerance: 单通道差值容忍度（0 = 任何差异都算变化）
+    尺寸不一致时返回 100.0
+    """
+    if img1.shape != img2.shape:
+        return 100.0
+    img1, img2 = downscale(img1, scale), downscale(img2, scale)
+    mask = changed_pixel_mask(img1, img2, tolerance)
+    return float(np.count_nonzero(mask)) * 100.0 / max(1, mask.size)
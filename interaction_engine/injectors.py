@@ -4,7 +4,10 @@ import time
 import uuid
 import random
 import json
+import re
 import numpy as np
+import requests
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
 from datetime import datetime
 
@@ -18,12 +21,11 @@ if sys.platform == 'win32':
 
 try:
     import cv2
-    from skimage.metrics import structural_similarity as ssim
     HAS_CV2 = True
 except ImportError:
     HAS_CV2 = False
 try:
-    from PIL import Image, ImageChops
+    from PIL import Image
     HAS_PIL = True
 except ImportError:
     HAS_PIL = False
@@ -42,16 +44,42 @@ from .config import (
     VIEWPORT_SIZE,
     LINK_DISCOVERY_LIMIT,
     LINK_SAMPLES_PER_PAGE,
+    INTERCEPTOR_AT_DOCUMENT_START,
+    NETWORK_BACKEND,
+    NATIVE_404_DIFF_SCALE,
+    NATIVE_404_PROBE_TIMEOUT,
+    PROFILE_DIR,
+    INTERMEDIATE_FRAME_FORMAT,
+    INTERMEDIATE_FRAME_QUALITY,
+    DIFF_NOISE_TOLERANCE,
+    CLICK_ROI_RMS,
+    SETTLE_ROUTE_FACTOR,
+    SETTLE_ROUTE_MIN_MS,
+    SETTLE_ROUTE_REWRITE,
+    REGION_MAX_COMPONENTS,
+    DEDUP_MODE,
+    TEXT_DIFF_MAX_LINES,
 )
 from .capture import (
     visualize_action,
+    capture_frame,
     ensure_dirs,
     bug_class,
     expected_behavior,
+    mask_label_tag,
     show_overlay,
     three_frame_paths,
 )
-from .selector import get_candidates, get_network_triggering_candidates, discover_internal_links
+from .cdp_interceptor import CDPNetworkInterceptor
+from .dedup import PHashIndex
+from .imaging import decode_png, load_image, changed_pixel_pct
+from .profile_store import SiteProfileStore, split_url
+from .quality import cascade_score
+from .regions import extract_regions
+from .readiness import READINESS_TRACKER_JS, wait_for_page_quiescence
+from .recorder import ChangeRecorder, recorded_similarity
+from .selector import DOM_FINGERPRINT_FN, CandidateCache, discover_internal_links
+from .textdiff import line_diff
 from .visual_styles import (
     generate_404_page_js,
     generate_loading_overlay_js,
@@ -60,42 +88,85 @@ from .visual_styles import (
     get_random_loading_style,
     get_random_error_toast_style,
 )
+from .writer import FrameWriter
+
+
+# 页面特征扫描：一次 execute_script 返回计数、input 类型直方图、价格/购物车信号与 DOM 指纹
+# arguments = [known_fingerprint, price_selectors]；指纹未变时只返回 {fingerprint, unchanged: true}
+PAGE_FEATURE_SCAN_JS = DOM_FINGERPRINT_FN + r"""
+const [knownFingerprint, priceSelectors] = arguments;
+const fingerprint = __iceFingerprint();
+if (knownFingerprint && knownFingerprint === fingerprint) {
+    return { fingerprint: fingerprint, unchanged: true };
+}
+const inputs = document.getElementsByTagName('input');
+const inputTypes = {};
+for (let i = 0; i < inputs.length; i++) {
+    const t = (inputs[i].type || 'text').toLowerCase();
+    inputTypes[t] = (inputTypes[t] || 0) + 1;
+}
+let hasPrice = false;
+for (const sel of priceSelectors) {
+    try { if (document.querySelector(sel)) { hasPrice = true; break; } } catch (e) {}
+}
+return {
+    fingerprint: fingerprint,
+    unchanged: false,
+    input_count: inputs.length,
+    form_count: document.getElementsByTagName('form').length,
+    button_count: document.getElementsByTagName('button').length,
+    link_count: document.getElementsByTagName('a').length,
+    input_types: inputTypes,
+    has_price: hasPrice,
+};
+"""
 
 
 class PageFeatureDetector:
-    def __init__(self, driver: webdriver.Chrome, viewport_size: tuple[int, int] = VIEWPORT_SIZE):
+    PRICE_SELECTORS = ["[class*='price']", "[class*='cart']", "[class*='checkout']"]
+
+    def __init__(self, driver: webdriver.Chrome, viewport_size: tuple[int, int] = VIEWPORT_SIZE,
+                 profile_store: SiteProfileStore | None = None):
         self.driver = driver
         self.viewport_size = viewport_size
+        self.profile_store = profile_store
         self.features: Dict[str, Any] = {}
+        self._memo: Dict[str, Dict[str, Any]] = {}  # URL → 上次扫描结果（含 DOM 指纹）
 
     def scan_page(self) -> Dict[str, Any]:
-        features: Dict[str, Any] = {}
+        """单次页面内扫描；同一 URL 且 DOM 指纹未变时直接复用上次结果"""
+        url = self.driver.current_url
+        origin, route = split_url(url)
+        known = self._memo.get(url)
+        if known is None and self.profile_store:
+            known = self.profile_store.get(origin, "page_features", route)
         try:
-            inputs = self.driver.find_elements(By.TAG_NAME, "input")
-            forms = self.driver.find_elements(By.TAG_NAME, "form")
-            buttons = self.driver.find_elements(By.TAG_NAME, "button")
-            links = self.driver.find_elements(By.TAG_NAME, "a")
-
-            features["has_inputs"] = len(inputs) > 0
-            features["has_forms"] = len(forms) > 0
-            features["has_buttons"] = len(buttons) > 0
-            features["has_links"] = len(links) > 0
-            features["form_count"] = len(forms)
-            features["input_count"] = len(inputs)
-            features["button_count"] = len(buttons)
-            features["link_count"] = len(links)
-
-            input_types: Dict[str, int] = {}
-            for inp in inputs:
-                try:
-                    inp_type = (inp.get_attribute("type") or "text").lower()
-                    input_types[inp_type] = input_types.get(inp_type, 0) + 1
-                except Exception:
-                    continue
-            features["input_types"] = input_types
+            raw = self.driver.execute_script(
+                PAGE_FEATURE_SCAN_JS, (known or {}).get("fingerprint"), self.PRICE_SELECTORS
+            )
+            if known and raw.get("unchanged"):
+                self._memo[url] = known
+                self.features = known
+                return known
+
+            features: Dict[str, Any] = {}
+            features["has_inputs"] = raw["input_count"] > 0
+            features["has_forms"] = raw["form_count"] > 0
+            features["has_buttons"] = raw["button_count"] > 0
+            features["has_links"] = raw["link_count"] > 0
+            features["form_count"] = raw["form_count"]
+            features["input_count"] = raw["input_count"]
+            features["button_count"] = raw["button_count"]
+            features["link_count"] = raw["link_count"]
+            features["input_types"] = raw["input_types"]
+            features["has_price"] = raw["has_price"]
+            features["fingerprint"] = raw["fingerprint"]
 
             features["page_type"] = self._infer_page_type(features)
             self.features = features
+            self._memo[url] = features
+            if self.profile_store:
+                self.profile_store.put(origin, "page_features", route, features)
             return features
         except Exception as e:
             print(f"[!] Error scanning page: {e}")
@@ -104,7 +175,7 @@ class PageFeatureDetector:
     def _infer_page_type(self, features: Dict[str, Any]) -> str:
         form_count = features.get("form_count", 0)
         input_count = features.get("input_count", 0)
-        has_price = self._has_selector(["[class*='price']", "[class*='cart']", "[class*='checkout']"])
+        has_price = features.get("has_price", False)
         if has_price and form_count > 0:
             return "ecommerce"
         if form_count >= 3 or input_count >= 10:
@@ -113,16 +184,6 @@ class PageFeatureDetector:
             return "interactive"
         return "static"
 
-    def _has_selector(self, selectors: List[str]) -> bool:
-        try:
-            for selector in selectors:
-                elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                if len(elements) > 0:
-                    return True
-        except Exception:
-            pass
-        return False
-
     def get_allowed_bugs(self) -> List[str]:
         """Return allowed bug types based on Big Three taxonomy.
         
@@ -177,6 +238,87 @@ class PageFeatureDetector:
         print(f"{'='*60}\n")
 
 
+# 原生组件检测公共部分：arguments = [known_fingerprint, selectors]
+# 指纹未变时只返回 {fingerprint, unchanged: true}；否则先用组合选择器做一次查询，
+# 只有命中时才逐个确认具体是哪些选择器（常见情况下只需一次 querySelector）
+_NATIVE_SELECTOR_MATCH_JS = DOM_FINGERPRINT_FN + r"""
+const [knownFingerprint, selectors] = arguments;
+const fingerprint = __iceFingerprint();
+if (knownFingerprint && knownFingerprint === fingerprint) {
+    return { fingerprint: fingerprint, unchanged: true };
+}
+let matched = [];
+let anyHit = null;
+try { anyHit = document.querySelector(selectors.join(', ')); } catch (e) { anyHit = true; }
+if (anyHit) {
+    matched = selectors.filter(sel => { try { return !!document.querySelector(sel); } catch (e) { return false; } });
+}
+"""
+
+NATIVE_LOADING_DETECT_JS = _NATIVE_SELECTOR_MATCH_JS + r"""
+const probe = (() => {
+    // Angular Material
+    if (window.ng && document.querySelector('mat-progress-spinner, mat-progress-bar')) {
+        return { framework: 'angular-material', available: true };
+    }
+    // ngx-spinner
+    if (window.NgxSpinnerService || document.querySelector('ngx-spinner')) {
+        return { framework: 'ngx-spinner', available: true };
+    }
+    // Vue loading
+    if (window.Vue && document.querySelector('.v-progress-circular, .el-loading-mask')) {
+        return { framework: 'vue', available: true };
+    }
+    // 通用：检测隐藏的 loading overlay
+    const hiddenLoaders = document.querySelectorAll(
+        '[class*="loading"][style*="display: none"], ' +
+        '[class*="spinner"][style*="display: none"], ' +
+        '[class*="overlay"][style*="visibility: hidden"]'
+    );
+    if (hiddenLoaders.length > 0) {
+        return { framework: 'hidden-overlay', available: true, selector: hiddenLoaders[0].className };
+    }
+    return { available: false };
+})();
+return { fingerprint: fingerprint, unchanged: false, matched: matched, probe: probe };
+"""
+
+NATIVE_TOAST_DETECT_JS = _NATIVE_SELECTOR_MATCH_JS + r"""
+const probe = (() => {
+    // Angular Material Snackbar
+    if (window.ng) {
+        const injector = window.ng.getInjector && window.ng.getInjector(document.body);
+        if (injector) {
+            try {
+                // Angular 有 MatSnackBar 服务
+                return { framework: 'angular-material', available: true };
+            } catch(e) {}
+        }
+    }
+    // 检测 Toastr
+    if (window.toastr) {
+        return { framework: 'toastr', available: true };
+    }
+    // 检测 SweetAlert
+    if (window.Swal || window.swal) {
+        return { framework: 'sweetalert', available: true };
+    }
+    // 检测 Vue 的 Element UI / Vuetify
+    if (window.Vue) {
+        if (window.ELEMENT && window.ELEMENT.Message) {
+            return { framework: 'element-ui', available: true };
+        }
+    }
+    // 检测 React Toastify
+    if (window.ReactToastify) {
+        return { framework: 'react-toastify', available: true };
+    }
+    return { available: false };
+})();
+return { fingerprint: fingerprint, unchanged: false, matched: matched, probe: probe };
+"""
+
+
 class NativeErrorPageDetector:
     """检测网站是否有原生错误页面、加载动画和错误提示
     
@@ -222,9 +364,10 @@ class NativeErrorPageDetector:
         '[class*="error"]', '[class*="alert"]',
     ]
     
-    def __init__(self, driver: webdriver.Chrome):
+    def __init__(self, driver: webdriver.Chrome, profile_store: SiteProfileStore | None = None):
         self.driver = driver
-        self._cache: Dict[str, Dict[str, Any]] = {}  # 按域名缓存检测结果
+        self.profile_store = profile_store  # 持久化档案（跨运行 / 跨 worker 复用检测结果）
+        self._cache: Dict[str, Dict[str, Any]] = {}  # 按域名（404）/ URL（loading、toast）缓存检测结果
     
     def _get_domain(self, url: str) -> str:
         """提取域名用于缓存"""
@@ -235,15 +378,75 @@ class NativeErrorPageDetector:
         except:
             return url.split('/')[0:3]
     
-    def detect_native_404(self, base_url: str) -> Dict[str, Any]:
+    def _probe_404_candidates(self, domain: str) -> List[Dict[str, Any]]:
+        """并发 HTTP 探测 COMMON_404_PATHS，按状态码 + 正文关键词打分排序（不占用浏览器）
+
+        复用浏览器的 cookie / User-Agent，使探测结果与浏览器访问一致。
+        SPA 通常对所有路径返回同一个 index.html（200、无关键词），此时保持原有顺序。
+        """
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=len(self.COMMON_404_PATHS))
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        try:
+            session.headers["User-Agent"] = self.driver.execute_script("return navigator.userAgent;")
+        except Exception:
+            pass
+        try:
+            for c in self.driver.get_cookies():
+                session.cookies.set(c["name"], c["value"], domain=c.get("domain"), path=c.get("path", "/"))
+        except Exception:
+            pass
+        keywords = [kw.lower() for kw in self.ERROR_404_KEYWORDS]
+
+        def probe(order: int, path: str) -> Dict[str, Any]:
+            url = f"{domain}{path}"
+            entry = {"url": url, "order": order, "status": None, "keyword_hits": 0, "score": -1}
+            try:
+                resp = session.get(url, timeout=NATIVE_404_PROBE_TIMEOUT, allow_redirects=True)
+            except Exception as e:
+                entry["error"] = str(e)[:80]
+                return entry
+            text = re.sub(r"<(script|style)\b.*?</\1>", " ", resp.text, flags=re.S | re.I)
+            text = re.sub(r"<[^>]+>", " ", text).lower()
+            entry["status"] = resp.status_code
+            entry["keyword_hits"] = sum(1 for kw in keywords if kw in text)
+            if resp.status_code >= 500:
+                return entry
+            entry["score"] = entry["keyword_hits"] * 2 + (3 if resp.status_code == 404 else 1)
+            return entry
+
+        try:
+            with ThreadPoolExecutor(max_workers=len(self.COMMON_404_PATHS)) as pool:
+                results = list(pool.map(probe, range(len(self.COMMON_404_PATHS)), self.COMMON_404_PATHS))
+        finally:
+            session.close()
+        results.sort(key=lambda r: (-r["score"], r["order"]))
+        return results
+
+    def _capture_probe_frame(self) -> bytes:
+        """404 检测用的对比帧只参与 diff：浏览器内按 NATIVE_404_DIFF_SCALE 缩小，并使用有损格式"""
+        return capture_frame(self.driver, fmt=INTERMEDIATE_FRAME_FORMAT, quality=INTERMEDIATE_FRAME_QUALITY,
+                             scale=1.0 / max(1, NATIVE_404_DIFF_SCALE), optimize_for_speed=True)
+
+    def _probe_diff_tolerance(self) -> int:
+        return 0 if INTERMEDIATE_FRAME_FORMAT == "png" else DIFF_NOISE_TOLERANCE
+
+    def detect_native_404(self, base_url: str, restore: bool = True) -> Dict[str, Any]:
         """检测网站是否有原生 404 页面
-        
+
+        先用 HTTP 并发探测所有候选路径并排序，浏览器只访问排名第一的候选做视觉确认。
+
+        Args:
+            restore: 检测后是否导航回原页面（调用方随后会自行导航时可传 False）
+
         Returns:
             {
                 'has_native_404': bool,
                 'native_404_url': str or None,
                 'detection_method': str,
                 'visual_change_pct': float,
+                'http_probe': list,     # 各候选路径的状态码 / 关键词命中 / 得分
             }
         """
         domain = self._get_domain(base_url)
@@ -253,63 +456,70 @@ class NativeErrorPageDetector:
         if cache_key in self._cache:
             print(f"  [Cache] 使用缓存的 404 检测结果: {self._cache[cache_key]['has_native_404']}")
             return self._cache[cache_key]
+        if self.profile_store:
+            stored = self.profile_store.get(domain, "native_404")
+            if stored is not None:
+                print(f"  [Profile] 使用站点档案中的 404 检测结果: {stored['has_native_404']}")
+                self._cache[cache_key] = stored
+                return stored
         
         result = {
             'has_native_404': False,
             'native_404_url': None,
             'detection_method': 'none',
             'visual_change_pct': 0.0,
+            'http_probe': [],
         }
+        # 只有探测真正完成（站点有响应、视觉对比或关键词给出了结论）才写入站点档案；
+        # 站点暂时不可用 / 参照帧截取失败等中断的结果只在本进程内缓存，不持久化
+        completed = False
         
         try:
-            # 保存当前 URL 和页面状态
+            # 保存当前 URL，并以当前页面截图作为“正常页面”参照（无需再加载首页）
             original_url = self.driver.current_url
-            original_title = self.driver.title
-            
-            # 获取首页截图用于对比
             try:
-                self.driver.get(base_url)
-                time.sleep(1)
-                home_screenshot = self.driver.get_screenshot_as_png()
+                reference_screenshot = decode_png(self._capture_probe_frame())
             except:
-                home_screenshot = None
+                reference_screenshot = None
+            
+            probes = self._probe_404_candidates(domain)
+            result['http_probe'] = [
+                {k: p.get(k) for k in ('url', 'status', 'keyword_hits', 'score')} for p in probes
+            ]
+            best = probes[0] if probes and probes[0]['score'] >= 0 else None
+            if best:
+                print(f"  [Detect] HTTP 探测最佳候选: {best['url']} (status={best['status']}, hits={best['keyword_hits']})")
+            else:
+                print(f"  [Detect] HTTP 探测无可用候选")
+                # 站点有响应但没有可用候选是确定的结论；全部请求失败（站点不可用）则不是
+                completed = any(p.get('status') is not None for p in probes)
             
-            # 尝试访问不存在的页面
-            for test_path in self.COMMON_404_PATHS:
-                test_url = f"{domain}{test_path}"
+            if best:
+                test_url = best['url']
                 try:
                     self.driver.get(test_url)
-                    time.sleep(1.5)
+                    wait_for_page_quiescence(self.driver, max_wait_ms=3000)
                     
-                    # 检查页面内容
+                    # 检查页面内容（浏览器渲染后，SPA 的客户端 404 也能命中）
                     page_source = self.driver.page_source.lower()
                     body_text = ""
                     try:
                         body_text = self.driver.find_element(By.TAG_NAME, 'body').text.lower()
                     except:
                         pass
-                    
-                    # 方法1: 检查 HTTP 状态码 (通过 JavaScript)
-                    # 注意: SPA 通常不会返回真正的 404 状态码
-                    
-                    # 方法2: 检查页面内容是否包含 404 关键词
                     has_404_keyword = any(kw.lower() in body_text or kw.lower() in page_source 
                                           for kw in self.ERROR_404_KEYWORDS)
                     
-                    # 方法3: 检查页面视觉是否与首页不同
+                    # 检查页面视觉是否与参照页不同
                     visual_different = False
-                    if home_screenshot and HAS_PIL:
+                    if reference_screenshot is not None:
                         try:
-                            current_screenshot = self.driver.get_screenshot_as_png()
-                            from io import BytesIO
-                            img1 = Image.open(BytesIO(home_screenshot))
-                            img2 = Image.open(BytesIO(current_screenshot))
-                            diff = ImageChops.difference(img1, img2)
-                            diff_pixels = sum(sum(p) > 0 for p in diff.getdata())
-                            total_pixels = img1.width * img1.height
-                            change_pct = (diff_pixels / total_pixels) * 100
+                            current_screenshot = decode_png(self._capture_probe_frame())
+                            change_pct = changed_pixel_pct(reference_screenshot, current_screenshot,
+                                                           tolerance=self._probe_diff_tolerance())
                             result['visual_change_pct'] = change_pct
                             visual_different = change_pct > 30  # 超过30%变化
+                            completed = True
                         except:
                             pass
                     
@@ -319,50 +529,85 @@ class NativeErrorPageDetector:
                         result['native_404_url'] = test_url
                         result['detection_method'] = 'keyword+visual'
                         print(f"  [Detect] 发现原生 404 页面: {test_url}")
-                        break
                     elif has_404_keyword:
                         result['has_native_404'] = True
                         result['native_404_url'] = test_url
                         result['detection_method'] = 'keyword'
                         print(f"  [Detect] 发现原生 404 页面 (关键词匹配): {test_url}")
-                        break
                     elif visual_different and result['visual_change_pct'] > 50:
                         # 视觉变化很大，可能是错误页面
                         result['has_native_404'] = True
                         result['native_404_url'] = test_url
                         result['detection_method'] = 'visual'
                         print(f"  [Detect] 发现可能的 404 页面 (视觉变化 {result['visual_change_pct']:.1f}%): {test_url}")
-                        break
+                    elif best['status'] == 404 and best['keyword_hits'] > 0:
+                        # 浏览器渲染未确认，但服务端明确返回 404 页面
+                        result['has_native_404'] = True
+                        result['native_404_url'] = test_url
+                        result['detection_method'] = 'http'
+                        print(f"  [Detect] 发现原生 404 页面 (HTTP 404): {test_url}")
+                    completed = completed or result['has_native_404']
                         
                 except Exception as e:
                     # 如果访问出错 (真正的 404 HTTP 错误)，这可能是原生 404
                     print(f"  [Detect] 访问 {test_url} 出错: {e}")
-                    continue
-            
-            # 返回原页面
-            try:
-                self.driver.get(original_url)
-                time.sleep(0.5)
-            except:
-                pass
+                
+                # 返回原页面
+                if restore:
+                    try:
+                        self.driver.get(original_url)
+                        time.sleep(0.5)
+                    except:
+                        pass
                 
         except Exception as e:
             print(f"  [Detect] 404 检测失败: {e}")
         
         # 缓存结果
         self._cache[cache_key] = result
+        if self.profile_store and completed:
+            self.profile_store.put(domain, "native_404", "*", result)
+        elif self.profile_store:
+            print(f"  [Detect] 404 检测未完成，结果不写入站点档案")
         
         if not result['has_native_404']:
             print(f"  [Detect] 未发现原生 404 页面，将使用注入样式")
         
         return result
     
+    def _detect_with_memo(self, section: str, script: str, selectors: List[str]) -> Dict[str, Any] | None:
+        """执行单次页面内检测（组合选择器 + 框架探测），按 URL / 路由与 DOM 指纹缓存
+
+        Returns:
+            {'fingerprint', 'matched_selectors', 'probe'}；检测失败时返回 None
+        """
+        url = self.driver.current_url
+        origin, route = split_url(url)
+        memo_key = f"{section}:{url}"
+        known = self._cache.get(memo_key)
+        if known is None and self.profile_store:
+            known = self.profile_store.get(origin, section, route)
+        raw = self.driver.execute_script(script, (known or {}).get("fingerprint"), selectors)
+        if known and raw.get("unchanged"):
+            self._cache[memo_key] = known
+            return known
+        detected = {
+            "fingerprint": raw.get("fingerprint"),
+            "matched_selectors": raw.get("matched") or [],
+            "probe": raw.get("probe") or {"available": False},
+        }
+        self._cache[memo_key] = detected
+        if self.profile_store:
+            self.profile_store.put(origin, section, route, detected)
+        return detected
+
     def detect_native_loading(self) -> Dict[str, Any]:
         """检测页面是否有原生加载动画组件
         
-        策略：
+        策略（一次页面内查询完成）：
         1. 检测页面中是否存在 loading/spinner 相关的 CSS 类或元素
         2. 检测是否有隐藏的 loading overlay 可以被激活
+        同一路由且 DOM 指纹未变时直接复用上次结果
         """
         result = {
             'has_native_loading': False,
@@ -372,43 +617,10 @@ class NativeErrorPageDetector:
         }
         
         try:
-            # 方法1：检测现有的 loading 元素（可能是隐藏的）
-            for selector in self.LOADING_SELECTORS:
-                try:
-                    elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                    if elements:
-                        result['has_native_loading'] = True
-                        result['loading_selectors'].append(selector)
-                except:
-                    continue
-            
-            # 方法2：检测是否有可以触发的 loading 机制
-            # 检查是否有 Angular/React/Vue 的 loading 服务
-            native_loading_check = self.driver.execute_script("""
-                // Angular Material
-                if (window.ng && document.querySelector('mat-progress-spinner, mat-progress-bar')) {
-                    return { framework: 'angular-material', available: true };
-                }
-                // ngx-spinner
-                if (window.NgxSpinnerService || document.querySelector('ngx-spinner')) {
-                    return { framework: 'ngx-spinner', available: true };
-                }
-                // Vue loading
-                if (window.Vue && document.querySelector('.v-progress-circular, .el-loading-mask')) {
-                    return { framework: 'vue', available: true };
-                }
-                // 通用：检测隐藏的 loading overlay
-                const hiddenLoaders = document.querySelectorAll(
-                    '[class*="loading"][style*="display: none"], ' +
-                    '[class*="spinner"][style*="display: none"], ' +
-                    '[class*="overlay"][style*="visibility: hidden"]'
-                );
-                if (hiddenLoaders.length > 0) {
-                    return { framework: 'hidden-overlay', available: true, selector: hiddenLoaders[0].className };
-                }
-                return { available: false };
-            """)
-            
+            detected = self._detect_with_memo("native_loading", NATIVE_LOADING_DETECT_JS, self.LOADING_SELECTORS)
+            result['loading_selectors'] = list(detected['matched_selectors'])
+            result['has_native_loading'] = bool(result['loading_selectors'])
+            native_loading_check = detected['probe']
             if native_loading_check and native_loading_check.get('available'):
                 result['can_trigger_native'] = True
                 result['trigger_method'] = native_loading_check.get('framework')
@@ -422,9 +634,10 @@ class NativeErrorPageDetector:
     def detect_native_error_toast(self) -> Dict[str, Any]:
         """检测页面是否有原生错误提示组件
         
-        策略：
+        策略（一次页面内查询完成）：
         1. 检测是否有 toast/snackbar/notification 组件
         2. 检测是否有可以触发的错误提示机制
+        同一路由且 DOM 指纹未变时直接复用上次结果
         """
         result = {
             'has_native_toast': False,
@@ -434,49 +647,10 @@ class NativeErrorPageDetector:
         }
         
         try:
-            # 方法1：检测现有的 toast 元素
-            for selector in self.ERROR_TOAST_SELECTORS:
-                try:
-                    elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
-                    if elements:
-                        result['has_native_toast'] = True
-                        result['toast_selectors'].append(selector)
-                except:
-                    continue
-            
-            # 方法2：检测是否有可以触发的 toast 服务
-            native_toast_check = self.driver.execute_script("""
-                // Angular Material Snackbar
-                if (window.ng) {
-                    const injector = window.ng.getInjector && window.ng.getInjector(document.body);
-                    if (injector) {
-                        try {
-                            // Angular 有 MatSnackBar 服务
-                            return { framework: 'angular-material', available: true };
-                        } catch(e) {}
-                    }
-                }
-                // 检测 Toastr
-                if (window.toastr) {
-                    return { framework: 'toastr', available: true };
-                }
-                // 检测 SweetAlert
-                if (window.Swal || window.swal) {
-                    return { framework: 'sweetalert', available: true };
-                }
-                // 检测 Vue 的 Element UI / Vuetify
-                if (window.Vue) {
-                    if (window.ELEMENT && window.ELEMENT.Message) {
-                        return { framework: 'element-ui', available: true };
-                    }
-                }
-                // 检测 React Toastify
-                if (window.ReactToastify) {
-                    return { framework: 'react-toastify', available: true };
-                }
-                return { available: false };
-            """)
-            
+            detected = self._detect_with_memo("native_toast", NATIVE_TOAST_DETECT_JS, self.ERROR_TOAST_SELECTORS)
+            result['toast_selectors'] = list(detected['matched_selectors'])
+            result['has_native_toast'] = bool(result['toast_selectors'])
+            native_toast_check = detected['probe']
             if native_toast_check and native_toast_check.get('available'):
                 result['can_trigger_native'] = True
                 result['trigger_method'] = native_toast_check.get('framework')
@@ -591,193 +765,259 @@ class NativeErrorPageDetector:
         return False
     
 
-class JSNetworkInterceptor:
-    def __init__(self, driver: webdriver.Chrome):
-        self.driver = driver
-        self.injection_state = {}
+# 网络拦截器（幂等）：既可在页面加载后 execute_script 注入，
+# 也可通过 CDP Page.addScriptToEvaluateOnNewDocument 在每个文档 / frame 创建时最先执行
+NETWORK_INTERCEPTOR_JS = r"""
+(function() {
+    // 避免重复注入
+    if (window.__ICE_INTERCEPTOR__ && window.__ICE_INTERCEPTOR__.injected) {
+        return;
+    }
+
+    window.__ICE_INTERCEPTOR__ = {
+        enabled: true,
+        injected: true,
+        _regex: {},             // pattern → RegExp 缓存（避免每个请求重复编译）
+        timeout_urls: [],
+        error_urls: {},
+        delay_ms: 0,
+        block_urls: [],
+        silent_mode: false,  // 静默失败模式
+        logs: []
+    };
+
+    const matches = (pattern, url) => {
+        const cache = window.__ICE_INTERCEPTOR__._regex;
+        if (!(pattern in cache)) {
+            try { cache[pattern] = new RegExp(pattern); } catch(e) { cache[pattern] = null; }
+        }
+        return cache[pattern] ? cache[pattern].test(url) : false;
+    };
+
+    window.__ORIGINAL_FETCH__ = window.__ORIGINAL_FETCH__ || window.fetch;
+    window.__ORIGINAL_XHR_OPEN__ = window.__ORIGINAL_XHR_OPEN__ || XMLHttpRequest.prototype.open;
+    window.__ORIGINAL_XHR_SEND__ = window.__ORIGINAL_XHR_SEND__ || XMLHttpRequest.prototype.send;
+
+    window.fetch = async function(...args) {
+        const url = typeof args[0] === 'string' ? args[0] : (args[0].url || '');
+        const config = window.__ICE_INTERCEPTOR__;
+        if (!config.enabled) {
+            return window.__ORIGINAL_FETCH__.apply(this, args);
+        }
 
-    def inject_fetch_interceptor(self) -> bool:
-        script = """
-        (function() {
-            // 避免重复注入
-            if (window.__ICE_INTERCEPTOR__ && window.__ICE_INTERCEPTOR__.injected) {
-                return;
-            }
-            
-            window.__ICE_INTERCEPTOR__ = {
-                enabled: true,
-                injected: true,
-                timeout_urls: [],
-                error_urls: {},
-                delay_ms: 0,
-                block_urls: [],
-                silent_mode: false,  // 静默失败模式
-                logs: []
-            };
-
-            window.__ORIGINAL_FETCH__ = window.__ORIGINAL_FETCH__ || window.fetch;
-            window.__ORIGINAL_XHR_OPEN__ = window.__ORIGINAL_XHR_OPEN__ || XMLHttpRequest.prototype.open;
-            window.__ORIGINAL_XHR_SEND__ = window.__ORIGINAL_XHR_SEND__ || XMLHttpRequest.prototype.send;
-
-            window.fetch = async function(...args) {
-                const url = typeof args[0] === 'string' ? args[0] : (args[0].url || '');
-                const config = window.__ICE_INTERCEPTOR__;
-                if (!config.enabled) {
-                    return window.__ORIGINAL_FETCH__.apply(this, args);
-                }
-                
-                // 超时拦截
-                const isTimeout = config.timeout_urls.some(pattern => {
-                    try { return new RegExp(pattern).test(url); } catch(e) { return false; }
-                });
-                if (isTimeout) {
-                    config.logs.push({'type': 'timeout', 'url': url, 'method': 'fetch', 'timestamp': Date.now()});
-                    return new Promise((resolve, reject) => {
-                        setTimeout(() => { reject(new TypeError('Failed to fetch (timeout)')); }, 15000);
-                    });
-                }
-                
-                // 错误码拦截
-                for (const [pattern, errorCode] of Object.entries(config.error_urls)) {
-                    try {
-                        if (new RegExp(pattern).test(url)) {
-                            config.logs.push({'type': 'error', 'url': url, 'code': errorCode, 'method': 'fetch', 'timestamp': Date.now()});
-                            return new Response(
-                                JSON.stringify({'error': 'Server Error', 'code': errorCode}),
-                                { status: errorCode, statusText: 'Error ' + errorCode, headers: { 'Content-Type': 'application/json' } }
-                            );
-                        }
-                    } catch(e) {}
-                }
-                
-                // 延迟模式
-                if (config.delay_ms > 0) {
-                    config.logs.push({'type': 'delay', 'url': url, 'delay_ms': config.delay_ms, 'method': 'fetch', 'timestamp': Date.now()});
-                    await new Promise(resolve => setTimeout(resolve, config.delay_ms));
-                }
-                
-                // 静默失败模式：返回空响应
-                if (config.silent_mode) {
-                    config.logs.push({'type': 'silent', 'url': url, 'method': 'fetch', 'timestamp': Date.now()});
-                    return new Response('', { status: 200, statusText: 'OK', headers: { 'Content-Type': 'application/json' } });
-                }
-                
-                return window.__ORIGINAL_FETCH__.apply(this, args);
-            };
-
-            XMLHttpRequest.prototype.open = function(method, url, ...rest) {
-                this._ice_url = url;
-                this._ice_method = method;
-                return window.__ORIGINAL_XHR_OPEN__.apply(this, [method, url, ...rest]);
-            };
-
-            XMLHttpRequest.prototype.send = function(...args) {
-                const url = this._ice_url || '';
-                const method = this._ice_method || 'GET';
-                const config = window.__ICE_INTERCEPTOR__;
-                const xhr = this;
-                
-                if (!config.enabled) {
-                    return window.__ORIGINAL_XHR_SEND__.apply(this, args);
-                }
-                
-                // 超时拦截
-                const isTimeout = config.timeout_urls.some(pattern => {
-                    try { return new RegExp(pattern).test(url); } catch(e) { return false; }
-                });
-                if (isTimeout) {
-                    config.logs.push({'type': 'timeout', 'url': url, 'method': 'xhr-' + method, 'timestamp': Date.now()});
-                    this.addEventListener('loadstart', () => {
-                        setTimeout(() => xhr.abort(), 15000);
-                    });
-                    return window.__ORIGINAL_XHR_SEND__.apply(this, args);
-                }
-                
-                // 错误码拦截（通过修改 onreadystatechange）
-                for (const [pattern, errorCode] of Object.entries(config.error_urls)) {
-                    try {
-                        if (new RegExp(pattern).test(url)) {
-                            config.logs.push({'type': 'error', 'url': url, 'code': errorCode, 'method': 'xhr-' + method, 'timestamp': Date.now()});
-                            // 模拟错误响应
-                            setTimeout(() => {
-                                Object.defineProperty(xhr, 'status', { value: errorCode, writable: false });
-                                Object.defineProperty(xhr, 'responseText', { value: JSON.stringify({'error': 'Server Error'}), writable: false });
-                                Object.defineProperty(xhr, 'readyState', { value: 4, writable: false });
-                                if (xhr.onreadystatechange) xhr.onreadystatechange();
-                                if (xhr.onerror) xhr.onerror();
-                            }, 100);
-                            return;
-                        }
-                    } catch(e) {}
-                }
-                
-                // 延迟模式
-                if (config.delay_ms > 0) {
-                    config.logs.push({'type': 'delay', 'url': url, 'delay_ms': config.delay_ms, 'method': 'xhr-' + method, 'timestamp': Date.now()});
+        // 超时拦截
+        const isTimeout = config.timeout_urls.some(pattern => matches(pattern, url));
+        if (isTimeout) {
+            config.logs.push({'type': 'timeout', 'url': url, 'method': 'fetch', 'timestamp': Date.now()});
+            return new Promise((resolve, reject) => {
+                setTimeout(() => { reject(new TypeError('Failed to fetch (timeout)')); }, 15000);
+            });
+        }
+
+        // 错误码拦截
+        for (const [pattern, errorCode] of Object.entries(config.error_urls)) {
+            try {
+                if (matches(pattern, url)) {
+                    config.logs.push({'type': 'error', 'url': url, 'code': errorCode, 'method': 'fetch', 'timestamp': Date.now()});
+                    return new Response(
+                        JSON.stringify({'error': 'Server Error', 'code': errorCode}),
+                        { status: errorCode, statusText: 'Error ' + errorCode, headers: { 'Content-Type': 'application/json' } }
+                    );
                 }
-                
-                // 静默失败模式
-                if (config.silent_mode) {
-                    config.logs.push({'type': 'silent', 'url': url, 'method': 'xhr-' + method, 'timestamp': Date.now()});
+            } catch(e) {}
+        }
+
+        // 延迟模式
+        if (config.delay_ms > 0) {
+            config.logs.push({'type': 'delay', 'url': url, 'delay_ms': config.delay_ms, 'method': 'fetch', 'timestamp': Date.now()});
+            await new Promise(resolve => setTimeout(resolve, config.delay_ms));
+        }
+
+        // 静默失败模式：返回空响应
+        if (config.silent_mode) {
+            config.logs.push({'type': 'silent', 'url': url, 'method': 'fetch', 'timestamp': Date.now()});
+            return new Response('', { status: 200, statusText: 'OK', headers: { 'Content-Type': 'application/json' } });
+        }
+
+        return window.__ORIGINAL_FETCH__.apply(this, args);
+    };
+
+    XMLHttpRequest.prototype.open = function(method, url, ...rest) {
+        this._ice_url = url;
+        this._ice_method = method;
+        return window.__ORIGINAL_XHR_OPEN__.apply(this, [method, url, ...rest]);
+    };
+
+    XMLHttpRequest.prototype.send = function(...args) {
+        const url = this._ice_url || '';
+        const method = this._ice_method || 'GET';
+        const config = window.__ICE_INTERCEPTOR__;
+        const xhr = this;
+
+        if (!config.enabled) {
+            return window.__ORIGINAL_XHR_SEND__.apply(this, args);
+        }
+
+        // 超时拦截
+        const isTimeout = config.timeout_urls.some(pattern => matches(pattern, url));
+        if (isTimeout) {
+            config.logs.push({'type': 'timeout', 'url': url, 'method': 'xhr-' + method, 'timestamp': Date.now()});
+            this.addEventListener('loadstart', () => {
+                setTimeout(() => xhr.abort(), 15000);
+            });
+            return window.__ORIGINAL_XHR_SEND__.apply(this, args);
+        }
+
+        // 错误码拦截（通过修改 onreadystatechange）
+        for (const [pattern, errorCode] of Object.entries(config.error_urls)) {
+            try {
+                if (matches(pattern, url)) {
+                    config.logs.push({'type': 'error', 'url': url, 'code': errorCode, 'method': 'xhr-' + method, 'timestamp': Date.now()});
+                    // 模拟错误响应
                     setTimeout(() => {
-                        Object.defineProperty(xhr, 'status', { value: 200, writable: false });
-                        Object.defineProperty(xhr, 'responseText', { value: '', writable: false });
+                        Object.defineProperty(xhr, 'status', { value: errorCode, writable: false });
+                        Object.defineProperty(xhr, 'responseText', { value: JSON.stringify({'error': 'Server Error'}), writable: false });
                         Object.defineProperty(xhr, 'readyState', { value: 4, writable: false });
                         if (xhr.onreadystatechange) xhr.onreadystatechange();
-                        if (xhr.onload) xhr.onload();
+                        if (xhr.onerror) xhr.onerror();
+                        // 真实 send 未被调用：补发 loadend，让外层包装（就绪检测的请求计数）得以结算
+                        xhr.dispatchEvent(new Event('loadend'));
                     }, 100);
                     return;
                 }
-                
-                return window.__ORIGINAL_XHR_SEND__.apply(this, args);
-            };
-            console.log('[ICE] Network interceptor injected (v2)');
-        })();
+            } catch(e) {}
+        }
+
+        // 延迟模式
+        if (config.delay_ms > 0) {
+            config.logs.push({'type': 'delay', 'url': url, 'delay_ms': config.delay_ms, 'method': 'xhr-' + method, 'timestamp': Date.now()});
+        }
+
+        // 静默失败模式
+        if (config.silent_mode) {
+            config.logs.push({'type': 'silent', 'url': url, 'method': 'xhr-' + method, 'timestamp': Date.now()});
+            setTimeout(() => {
+                Object.defineProperty(xhr, 'status', { value: 200, writable: false });
+                Object.defineProperty(xhr, 'responseText', { value: '', writable: false });
+                Object.defineProperty(xhr, 'readyState', { value: 4, writable: false });
+                if (xhr.onreadystatechange) xhr.onreadystatechange();
+                if (xhr.onload) xhr.onload();
+                xhr.dispatchEvent(new Event('loadend'));
+            }, 100);
+            return;
+        }
+
+        return window.__ORIGINAL_XHR_SEND__.apply(this, args);
+    };
+    console.log('[ICE] Network interceptor injected (v3)');
+})();
+"""
+
+# 规则配置推送：一次调用替换全部规则（arguments[0] = rules）
+INTERCEPTOR_CONFIG_JS = r"""
+const config = window.__ICE_INTERCEPTOR__;
+if (!config) return false;
+const rules = arguments[0];
+config.timeout_urls = rules.timeout_urls;
+config.error_urls = rules.error_urls;
+config.delay_ms = rules.delay_ms;
+config.silent_mode = rules.silent_mode;
+if (rules.clear_logs) config.logs = [];
+return true;
+"""
+
+
+class JSNetworkInterceptor:
+    persistent_rules = False  # 规则保存在页面内，导航后自然失效
+
+    def __init__(self, driver: webdriver.Chrome, document_start: bool = False):
+        self.driver = driver
+        self.document_start = document_start
+        self.injection_state = {}
+
+    def install_on_new_document(self, with_readiness_tracker: bool = True) -> bool:
+        """通过 CDP 注册拦截器，使其在每个文档 / frame 的任何页面脚本之前执行
+
+        每个 driver 只需注册一次：真实导航后拦截器依然存在，页面启动阶段发出的请求也能被拦截。
+        当前已加载的文档会同时补注入一次。
         """
+        if self.injection_state.get("document_start_id"):
+            return True
+        # 就绪检测的计数器先安装、直接包装原生 fetch / send，拦截器再包装它：
+        # 被拦截器伪造的请求不会经过计数器，也就不会让 inflight 一直挂起
+        source = NETWORK_INTERCEPTOR_JS
+        if with_readiness_tracker:
+            source = READINESS_TRACKER_JS + source
         try:
-            self.driver.execute_script(script)
+            result = self.driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": source})
+            self.injection_state["document_start_id"] = (result or {}).get("identifier") or True
+        except Exception as e:
+            print(f"[!] Failed to register document-start interceptor: {e}")
+            self.document_start = False
+            return False
+        self.inject_fetch_interceptor()
+        return True
+
+    def inject_fetch_interceptor(self) -> bool:
+        try:
+            self.driver.execute_script(NETWORK_INTERCEPTOR_JS)
             self.injection_state["fetch_interceptor"] = True
             return True
         except Exception as e:
             print(f"[!] Failed to inject fetch interceptor: {e}")
             return False
 
+    def configure(self, timeout_urls: List[str] | None = None, error_urls: Dict[str, int] | None = None,
+                  delay_ms: int = 0, silent_mode: bool = False, clear_logs: bool = True) -> bool:
+        """一次调用替换全部拦截规则
+
+        已注册 document-start 时只推送规则；否则在同一次调用中先保证拦截器已注入。
+        """
+        rules = {
+            "timeout_urls": list(timeout_urls or []),
+            "error_urls": dict(error_urls or {}),
+            "delay_ms": int(delay_ms),
+            "silent_mode": bool(silent_mode),
+            "clear_logs": bool(clear_logs),
+        }
+        script = INTERCEPTOR_CONFIG_JS
+        if not self.injection_state.get("document_start_id"):
+            script = NETWORK_INTERCEPTOR_JS + script
+        try:
+            return bool(self.driver.execute_script(script, rules))
+        except Exception:
+            return False
+
     def intercept_request_timeout(self, url_pattern: str) -> bool:
-        script = f"""
-        (function() {{
-            if (!window.__ICE_INTERCEPTOR__) return false;
-            window.__ICE_INTERCEPTOR__.timeout_urls.push('{url_pattern}');
-            return true;
-        }})();
+        script = """
+        if (!window.__ICE_INTERCEPTOR__) return false;
+        window.__ICE_INTERCEPTOR__.timeout_urls.push(arguments[0]);
+        return true;
         """
         try:
-            return self.driver.execute_script(script)
+            return self.driver.execute_script(script, url_pattern)
         except Exception:
             return False
 
     def intercept_request_error(self, url_pattern: str, error_code: int = 500) -> bool:
-        script = f"""
-        (function() {{
-            if (!window.__ICE_INTERCEPTOR__) return false;
-            window.__ICE_INTERCEPTOR__.error_urls['{url_pattern}'] = {error_code};
-            return true;
-        }})();
+        script = """
+        if (!window.__ICE_INTERCEPTOR__) return false;
+        window.__ICE_INTERCEPTOR__.error_urls[arguments[0]] = arguments[1];
+        return true;
         """
         try:
-            return self.driver.execute_script(script)
+            return self.driver.execute_script(script, url_pattern, int(error_code))
         except Exception:
             return False
 
     def set_global_delay(self, delay_ms: int) -> bool:
-        script = f"""
-        (function() {{
-            if (!window.__ICE_INTERCEPTOR__) return false;
-            window.__ICE_INTERCEPTOR__.delay_ms = {delay_ms};
-            return true;
-        }})();
+        script = """
+        if (!window.__ICE_INTERCEPTOR__) return false;
+        window.__ICE_INTERCEPTOR__.delay_ms = arguments[0];
+        return true;
         """
         try:
-            return self.driver.execute_script(script)
+            return self.driver.execute_script(script, int(delay_ms))
         except Exception:
             return False
 
@@ -819,24 +1059,46 @@ class JSNetworkInterceptor:
             return self.driver.execute_script(script)
         except Exception:
             return False
-        except Exception:
-            return []
 
 
 class InteractionInjector:
     def __init__(self, headless: bool = True, max_wait: int = 15, use_js_interceptor: bool = True,
-                 show_overlay_flag: bool = True, debug_mode: bool = False):
+                 show_overlay_flag: bool = True, debug_mode: bool = False,
+                 user_data_dir: str | None = None, debugging_port: int | None = None,
+                 driver_path: str | None = None, interceptor_at_document_start: bool = INTERCEPTOR_AT_DOCUMENT_START,
+                 network_backend: str = NETWORK_BACKEND, profile_dir: str | None = PROFILE_DIR):
         self.headless = headless
         self.max_wait = max_wait if not debug_mode else min(max_wait, 8)
         self.use_js_interceptor = use_js_interceptor
         self.show_overlay_flag = show_overlay_flag
         self.debug_mode = debug_mode
+        # 多进程模式下每个 worker 使用独立的 Chrome profile 与调试端口
+        self.user_data_dir = user_data_dir
+        self.debugging_port = debugging_port
+        self.driver_path = driver_path
         self.driver = self._setup_driver()
         ensure_dirs()
-        self.feature_detector = PageFeatureDetector(self.driver)
-        self.js_interceptor = JSNetworkInterceptor(self.driver)
-        self.native_detector = NativeErrorPageDetector(self.driver)  # 🆕 原生错误页面检测器
-        self._native_404_cache: Dict[str, str | None] = {}  # 缓存每个域名的原生 404 URL
+        # 站点能力档案（profile_dir=None 时只在内存中缓存）
+        self.profile_store = SiteProfileStore(profile_dir) if profile_dir else None
+        self.feature_detector = PageFeatureDetector(self.driver, profile_store=self.profile_store)
+        self.js_interceptor = JSNetworkInterceptor(self.driver, document_start=interceptor_at_document_start)
+        if self.use_js_interceptor and network_backend == "cdp":
+            # 网络层故障注入（Fetch 域），API 与 JSNetworkInterceptor 相同
+            cdp_interceptor = CDPNetworkInterceptor(self.driver)
+            if cdp_interceptor.install_on_new_document():
+                self.js_interceptor = cdp_interceptor
+                print("  [✓] 网络拦截器已连接 (CDP Fetch)")
+            else:
+                print("  [!] CDP 拦截器不可用，回退到 JS 拦截器")
+        if self.use_js_interceptor and interceptor_at_document_start and not self.js_interceptor.persistent_rules:
+            # 每个 driver 注册一次，之后每个文档 / frame 从第一个字节起就带有拦截器与就绪计数器
+            if self.js_interceptor.install_on_new_document():
+                print("  [✓] 网络拦截器已注册 (document-start)")
+        self.native_detector = NativeErrorPageDetector(self.driver, profile_store=self.profile_store)  # 🆕 原生错误页面检测器
+        self.last_settle: Dict[str, Any] = {}  # 最近一次页面就绪检测结果（写入样本元数据）
+        self.candidate_cache = CandidateCache()  # 按路由缓存候选元素（重载后一次查询复验）
+        self.frame_writer = FrameWriter()  # 截图编码 / 落盘交给后台线程
+        self.dedup_index = PHashIndex() if DEDUP_MODE != "off" else None
 
     def _setup_driver(self):
         options = Options()
@@ -845,13 +1107,20 @@ class InteractionInjector:
         options.add_argument(f"--window-size={VIEWPORT_SIZE[0]},{VIEWPORT_SIZE[1]}")
         options.add_argument("--disable-blink-features=AutomationControlled")
         options.add_argument("--ignore-certificate-errors")
+        if self.user_data_dir:
+            options.add_argument(f"--user-data-dir={self.user_data_dir}")
+        if self.debugging_port:
+            options.add_argument(f"--remote-debugging-port={self.debugging_port}")
         options.page_load_strategy = "eager"
-        service = Service(ChromeDriverManager().install())
+        service = Service(self.driver_path or ChromeDriverManager().install())
         driver = webdriver.Chrome(service=service, options=options)
         driver.set_page_load_timeout(15 if self.debug_mode else 30)
         return driver
 
     def close(self):
+        self.frame_writer.close()
+        if isinstance(self.js_interceptor, CDPNetworkInterceptor):
+            self.js_interceptor.stop()
         try:
             self.driver.quit()
         except Exception:
@@ -865,21 +1134,42 @@ class InteractionInjector:
         except Exception:
             print("[!] 页面加载等待超时，继续执行")
         
-        # 🔥 关键：页面加载完成后立即注入网络拦截器
-        if self.use_js_interceptor:
+        # 🔥 关键：页面加载完成后立即注入网络拦截器（document-start 模式下已由 CDP 注入）
+        if self.use_js_interceptor and not self.js_interceptor.document_start:
             success = self.js_interceptor.inject_fetch_interceptor()
             if success:
                 print("  [✓] 网络拦截器已注入")
             else:
                 print("  [✗] 网络拦截器注入失败")
         
-        time.sleep(1 if self.debug_mode else 5)
+        # 页面内静默检测替代固定 sleep（无请求 / 无 DOM 变更 / 字体与图片就绪）
+        # 站点档案中有该路由的历史 settle_ms 时按历史值收紧上限（上次超时则用完整上限）
+        max_wait_ms = self.max_wait * 1000
+        route_settle = None
+        if self.profile_store:
+            origin, route = split_url(self.driver.current_url)
+            route_settle = self.profile_store.get(origin, "settle_ms", route)
+            if route_settle and not route_settle.get("timed_out") and route_settle.get("settle_ms") is not None:
+                max_wait_ms = min(max_wait_ms, max(SETTLE_ROUTE_MIN_MS,
+                                                   int(route_settle["settle_ms"] * SETTLE_ROUTE_FACTOR)))
+        self.last_settle = wait_for_page_quiescence(self.driver, max_wait_ms=max_wait_ms)
+        settle = dict(self.last_settle)  # 首次静默等待（不含懒加载），写入档案
         try:
             self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(0.2 if self.debug_mode else 0.5)
+            lazy = wait_for_page_quiescence(self.driver, max_wait_ms=2000 if self.debug_mode else 3000)
+            self.last_settle["settle_ms"] = self.last_settle.get("settle_ms", 0) + lazy.get("settle_ms", 0)
             self.driver.execute_script("window.scrollTo(0, 0);")
         except Exception:
             pass
+        if self.last_settle.get("timed_out"):
+            print(f"  [!] 页面静默等待未完成 ({self.last_settle.get('reason')})，继续执行")
+        if self.profile_store and settle.get("reason") != "error":
+            # 只在首次见到该路由或结果明显变化时回写（避免每次加载都做加锁的读-改-写）
+            measured = {"settle_ms": settle.get("settle_ms"), "timed_out": bool(settle.get("timed_out"))}
+            if (route_settle is None or route_settle.get("timed_out") != measured["timed_out"]
+                    or abs((measured["settle_ms"] or 0) - (route_settle.get("settle_ms") or 0))
+                    > SETTLE_ROUTE_REWRITE * max(1, route_settle.get("settle_ms") or 0)):
+                self.profile_store.put(origin, "settle_ms", route, measured)
 
     def _prefill_form_fields(self) -> None:
         """智能填充表单字段，使 disabled 按钮变为可用状态。"""
@@ -1023,10 +1313,7 @@ class InteractionInjector:
         
         # 网络拦截（作为额外保障）
         if self.use_js_interceptor:
-            self.js_interceptor.inject_fetch_interceptor()
-            self.js_interceptor.reset_interceptor()
-            self.js_interceptor.clear_logs()
-            self.js_interceptor.intercept_request_timeout(r'.*')
+            self.js_interceptor.configure(timeout_urls=[r'.*'])
         
         # Sub-variant 2: Timeout Hang - 显示 Loading Spinner
         if sub_variant == "timeout_hang":
@@ -1072,8 +1359,7 @@ class InteractionInjector:
         """
         # 清除之前的拦截配置
         if self.use_js_interceptor:
-            self.js_interceptor.reset_interceptor()
-            self.js_interceptor.clear_logs()
+            self.js_interceptor.configure()
         
         current_url = self.driver.current_url
         base_url = '/'.join(current_url.split('/')[:3])
@@ -1106,14 +1392,16 @@ class InteractionInjector:
         time.sleep(0.3)
         
         # 🆕 检测原生 404 页面（点击后检测，元素已不重要）
-        native_404_result = self.native_detector.detect_native_404(base_url)
+        native_404_result = self.native_detector.detect_native_404(base_url, restore=False)
         use_native = native_404_result['has_native_404']
         native_404_url = native_404_result.get('native_404_url')
         
         if use_native and native_404_url:
             # 🆕 使用网站原生 404 页面
             try:
-                self.driver.get(native_404_url)
+                # 首次检测时浏览器已停留在该候选页（restore=False），无需再次导航
+                if self.driver.current_url != native_404_url:
+                    self.driver.get(native_404_url)
                 print(f"  [Inject] Navigation_Error: → Using NATIVE 404: {native_404_url}")
                 time.sleep(0.5)
                 return "Navigation_Error", f"Navigation hijacked; native 404 page displayed ({native_404_url})."
@@ -1156,10 +1444,7 @@ class InteractionInjector:
         
         # 网络拦截返回 500
         if self.use_js_interceptor:
-            self.js_interceptor.inject_fetch_interceptor()
-            self.js_interceptor.reset_interceptor()
-            self.js_interceptor.clear_logs()
-            injection_success = self.js_interceptor.intercept_request_error(r'.*', error_code=500)
+            injection_success = self.js_interceptor.configure(error_urls={r'.*': 500})
         
         # 🆕 优先尝试原生 Error Toast
         native_toast = self.native_detector.detect_native_error_toast()
@@ -1239,20 +1524,39 @@ class InteractionInjector:
         after: Dict[str, Any], 
         interceptor_logs: List[Dict],
         console_logs_before: List[Dict] = None,
-        console_logs_after: List[Dict] = None
+        console_logs_after: List[Dict] = None,
+        recording: Dict[str, Any] = None
     ) -> Dict[str, Any]:
         """
         审慎的视觉验证：结合 DOM 变化、console_logs 差异和网络日志。
         只有当有明确证据时才判定为验证通过。
+        recording 为页面内变化记录器的读数（同一 document 内有效）；提供时取代前后快照对比，
+        元素信号只统计注入之后才出现的元素，文本关键字只在新增内容中查找。
+        before 中没有 text（记录器已布防、但整页跳转使记录丢失）时没有可比的点击前文本，
+        相似度记为 None，也不列出新增 / 消失的文本行。
         """
-        from difflib import SequenceMatcher
-        def sim(a: str, b: str) -> float:
-            try:
-                return SequenceMatcher(None, a or "", b or "").ratio()
-            except Exception:
-                return 0.0
-
-        similarity = sim(before.get("text", ""), after.get("text", ""))
+        if recording:
+            added_text = recording.get("added_text") or ""
+            text_delta = {
+                "ratio": recorded_similarity(recording),
+                "added": [line.strip() for line in added_text.split("\n") if line.strip()],
+                "removed": [],
+            }
+            after = {
+                "url": recording.get("url"),
+                "title": recording.get("title"),
+                "text": added_text,
+                "has_spinner": recording.get("spinner_shown", 0) > 0,
+                "has_error_ele": recording.get("error_shown", 0) > 0,
+                "has_validation_ele": recording.get("validation_shown", 0) > 0 or recording.get("invalid_flips", 0) > 0,
+                "invalid_input_count": recording.get("invalid_input_count", 0),
+            }
+        elif "text" in before:
+            # 行哈希对比（线性时间），同时得到新增 / 消失的文本行
+            text_delta = line_diff(before.get("text", ""), after.get("text", ""))
+        else:
+            text_delta = {"ratio": None, "added": [], "removed": []}
+        similarity = text_delta["ratio"]
         url_after = (after.get("url") or "").lower()
         title_after = (after.get("title") or "").lower()
         text_after = (after.get("text") or "").lower()
@@ -1291,7 +1595,9 @@ class InteractionInjector:
                 break
         
         signals = {
-            "similarity": round(similarity, 4),
+            "similarity": round(similarity, 4) if similarity is not None else None,
+            "text_added": [line[:120] for line in text_delta["added"][:TEXT_DIFF_MAX_LINES]],
+            "text_removed": [line[:120] for line in text_delta["removed"][:TEXT_DIFF_MAX_LINES]],
             "has_spinner": bool(after.get("has_spinner")),
             "has_error_ele": bool(after.get("has_error_ele")),
             "has_validation_ele": bool(after.get("has_validation_ele")),
@@ -1299,7 +1605,12 @@ class InteractionInjector:
             "has_network_logs": has_logs,
             "new_console_errors": new_console_errors,
             "has_injection_related_error": has_injection_related_error,
+            "evidence_source": "recorder" if recording else "snapshot",
         }
+        if not recording and before.get("url") and after.get("url"):
+            signals["url_changed"] = before["url"] != after["url"]
+        if recording:
+            signals["dom_changes"] = {k: v for k, v in recording.items() if k != "added_text"}
 
         visual_ok = False
         
@@ -1326,8 +1637,8 @@ class InteractionInjector:
             )
             
         elif bug_type == "Operation_No_Response":
-            # 严格：页面几乎没变化，且无错误显示
-            visual_ok = similarity > 0.985 and not signals["has_error_ele"] and not signals["has_spinner"]
+            # 严格：页面几乎没变化，且无错误显示（相似度未知时说明发生了整页跳转）
+            visual_ok = similarity is not None and similarity > 0.985 and not signals["has_error_ele"] and not signals["has_spinner"]
             
         elif bug_type == "Unexpected_Task_Result":
             # 主要信号：页面显示错误元素或错误文本
@@ -1341,13 +1652,16 @@ class InteractionInjector:
             
         elif bug_type == "Silent_Failure":
             # 静默失败本身难以视觉验证，保持原有逻辑
-            visual_ok = similarity > 0.985 and not signals["has_error_ele"] and not signals["has_spinner"]
+            visual_ok = similarity is not None and similarity > 0.985 and not signals["has_error_ele"] and not signals["has_spinner"]
 
         return {"visual_verified": bool(visual_ok), "signals": signals}
 
-    def _calculate_visual_diff(self, img_path1: str, img_path2: str) -> Dict[str, Any]:
+    def _calculate_visual_diff(self, img1, img2, roi: Dict[str, Any] | None = None) -> Dict[str, Any]:
         """
         计算两张截图的视觉差异。
+        img1 / img2 可以是文件路径，也可以是内存中的 RGB 数组（execute_injection 直接传帧）。
+        roi 为被点击元素的视口矩形：变化只落在元素（+ margin）内且 RMS < CLICK_ROI_RMS 时
+        在级联的 ROI 级返回（只有按钮自身的 hover / focus 变化），不做全帧评分。
         返回包含差异度量的字典。
         """
         result = {
@@ -1358,64 +1672,46 @@ class InteractionInjector:
             "error": None
         }
         
-        if not os.path.exists(img_path1) or not os.path.exists(img_path2):
-            result["error"] = "Image files not found"
-            return result
+        if isinstance(img1, str) or isinstance(img2, str):
+            if not os.path.exists(img1) or not os.path.exists(img2):
+                result["error"] = "Image files not found"
+                return result
         
         try:
-            # 优先使用 OpenCV（更精确）
-            if HAS_CV2:
-                img1 = cv2.imread(img_path1)
-                img2 = cv2.imread(img_path2)
-                
-                if img1 is None or img2 is None:
-                    result["error"] = "Failed to load images with cv2"
-                    return result
-                
-                # 确保尺寸一致
-                if img1.shape != img2.shape:
+            if isinstance(img1, str):
+                img1 = load_image(img1, rgb=True)
+            if isinstance(img2, str):
+                img2 = load_image(img2, rgb=True)
+            
+            # 确保尺寸一致
+            if img1.shape != img2.shape:
+                if HAS_CV2:
                     img2 = cv2.resize(img2, (img1.shape[1], img1.shape[0]))
-                
-                # 计算结构相似度 (SSIM)
-                gray1 = cv2.cvtColor(img1, cv2.COLOR_BGR2GRAY)
-                gray2 = cv2.cvtColor(img2, cv2.COLOR_BGR2GRAY)
-                ssim_score = ssim(gray1, gray2)
-                
-                # 计算像素差异百分比
-                diff = cv2.absdiff(img1, img2)
-                non_zero = np.count_nonzero(diff)
-                total_pixels = img1.shape[0] * img1.shape[1] * img1.shape[2]
-                diff_percentage = (non_zero / total_pixels) * 100
-                
-                result["method"] = "opencv_ssim"
-                result["diff_score"] = float(round(1.0 - ssim_score, 4))  # 转换为差异分数
-                result["diff_percentage"] = float(round(diff_percentage, 2))
-                # 如果 SSIM 差异 > 0.05 或像素差异 > 2%，认为有明显变化
-                result["has_diff"] = bool((1.0 - ssim_score) > 0.05 or diff_percentage > 2.0)
-                
-            # 回退到 PIL（更基础）
-            elif HAS_PIL:
-                img1 = Image.open(img_path1)
-                img2 = Image.open(img_path2)
-                
-                # 确保尺寸一致
-                if img1.size != img2.size:
-                    img2 = img2.resize(img1.size)
-                
-                # 计算像素差异
-                diff = ImageChops.difference(img1, img2)
-                diff_array = np.array(diff)
-                non_zero = np.count_nonzero(diff_array)
-                total_pixels = diff_array.size
-                diff_percentage = (non_zero / total_pixels) * 100
-                
-                result["method"] = "pil_pixel_diff"
-                result["diff_percentage"] = float(round(diff_percentage, 2))
-                # PIL 阈值：像素差异 > 5%
-                result["has_diff"] = bool(diff_percentage > 5.0)
-                
-            else:
-                result["error"] = "No image comparison library available (install opencv-python or pillow)"
+                else:
+                    img2 = np.asarray(Image.fromarray(img2).resize((img1.shape[1], img1.shape[0])))
+            
+            # 全分辨率评分（阈值按全分辨率 SSIM 标定）；两帧完全相同时在级联第一级即返回
+            metrics = cascade_score(img1, img2, roi=roi, rms_threshold=CLICK_ROI_RMS if roi else None, level=0)
+            diff_percentage = metrics["pixel_diff_pct"]
+            result["metrics"] = metrics
+            result["stage"] = metrics["stage"]
+            result["diff_percentage"] = float(round(diff_percentage, 2))
+            result["method"] = "numpy_ssim"
+            # ROI 级早退时没有 SSIM：变化局限在元素范围内，SSIM 差异按 0 计
+            ssim = metrics["ssim"] if metrics["ssim"] is not None else 1.0
+            result["diff_score"] = float(round(1.0 - ssim, 4))  # 转换为差异分数
+            # 如果 SSIM 差异 > 0.05 或像素差异 > 2%，认为有明显变化
+            result["has_diff"] = bool((1.0 - ssim) > 0.05 or diff_percentage > 2.0)
+            
+            # 像素实际变化的位置（两帧相同时无需计算）
+            if metrics["stage"] != "identical":
+                regions = extract_regions(img1, img2)
+                result["change_region"] = {
+                    "bbox": regions["bbox"],
+                    "components": regions["components"][:REGION_MAX_COMPONENTS],
+                    "changed_pixels": regions["changed_pixels"],
+                    "mask_rle": regions["mask_rle"],
+                }
                 
         except Exception as e:
             result["error"] = f"Diff calculation failed: {str(e)}"
@@ -1431,10 +1727,15 @@ class InteractionInjector:
         t0_clean_path = None
         before_dom: Dict[str, Any] = {}
         after_dom: Dict[str, Any] = {}
+        recording = None
         elem_info = {"tag": "unknown", "text": "", "id": "", "class": "", "aria_label": "", "bbox": {}}
         center_x, center_y = 0, 0
         normal_click_captured = False
         reference_path = ""
+        start_frame = None
+        click_rect = None       # 被点击元素的视口矩形（视觉 diff 的 ROI）
+        pre_click_frame = None  # 内存中的点击前 / 点击后帧（RGB 数组）
+        end_frame = None
 
         # Big Three Bug Taxonomy mapping
         bug_name_mapping = {
@@ -1454,10 +1755,20 @@ class InteractionInjector:
 
         try:
             t0_clean_path, t0_action_path, t1_path = three_frame_paths(uid)
-            # T0 clean screenshot
-            self.driver.save_screenshot(t0_clean_path)
-            # DOM snapshot before click for visual verification
-            before_dom = self._dom_snapshot()
+            # T0 clean screenshot：PNG 字节直接落盘（无需重新编码），同时解码一次供叠加层使用
+            start_png = capture_frame(self.driver)
+            self.frame_writer.submit(t0_clean_path, start_png)
+            start_frame = decode_png(start_png, rgb=True)
+            # 页面内变化记录器：在注入前布防，注入与点击引起的 DOM / URL 变化都计入；
+            # 布防失败时回退到点击前快照
+            recorder = ChangeRecorder(self.driver)
+            armed = recorder.arm()
+            if armed is None:
+                recorder = None
+                before_dom = self._dom_snapshot()
+            else:
+                # 只有点击前的 URL / 标题；整页跳转回退到快照时没有可比的点击前文本
+                before_dom = armed
             # Prefill to avoid empty submissions
             self._prefill_form_fields()
 
@@ -1492,20 +1803,17 @@ class InteractionInjector:
                 "width": rect.get("width", 0),
                 "height": rect.get("height", 0),
             }
+            click_rect = {k: rect.get(k, 0) for k in ("x", "y", "width", "height")}
             center_x = int(rect.get("x", 0) + rect.get("width", 0) / 2)
             center_y = int(rect.get("y", 0) + rect.get("height", 0) / 2)
             
             # 🆕 Visual Diff 策略：比较「点击前」vs「点击后」
             # - Navigation_Error/Unexpected_Task_Result：期望有视觉变化
             # - Operation_No_Response：期望没有视觉变化（页面冻结）或有 Loading Spinner
-            pre_click_screenshot_path = t1_path.replace("_end.png", "_pre_click.png")
-            pre_click_captured = False
-            
             print(f"  [Visual Diff] Capturing pre-click state...")
             try:
-                # 截取点击前的状态
-                self.driver.save_screenshot(pre_click_screenshot_path)
-                pre_click_captured = True
+                # 截取点击前的状态（仅保存在内存中）
+                pre_click_frame = decode_png(capture_frame(self.driver, optimize_for_speed=True), rgb=True)
                 print(f"  [✓] Pre-click screenshot captured")
             except Exception as e:
                 print(f"  [!] Failed to capture pre-click screenshot: {e}")
@@ -1513,7 +1821,8 @@ class InteractionInjector:
             # T0 action with pointer AND Label
             # Pass the intended bug type key as label (e.g. "Timeout_Hang" from key "timeout")
             visual_label = display_name_from_key.get(bug_type_key, "Interaction")
-            visualize_action(t0_clean_path, center_x, center_y, output_path=t0_action_path, label=visual_label)
+            visualize_action(start_frame, center_x, center_y, output_path=t0_action_path, label=visual_label,
+                             writer=self.frame_writer)
             print(f"  [Action] Overlay visualized: {visual_label}")
 
             print(f"  [Execute] Bug type: {bug_type_key} → {display_name_from_key.get(bug_type_key, bug_type_key)}")
@@ -1548,7 +1857,11 @@ class InteractionInjector:
                     print("[!] Click fallback failed, skip element")
                     return
             time.sleep(0.5 if self.debug_mode else 2)
-            after_dom = self._dom_snapshot()
+            if recorder is not None:
+                recording = recorder.read()
+            if recording is None:
+                # 整页跳转会替换 document（记录随之消失），回退到点击后快照
+                after_dom = self._dom_snapshot()
 
         except Exception as e:
             print(f"[!] Failed to inject on element: {e}")
@@ -1563,17 +1876,12 @@ class InteractionInjector:
                 pass
             
             # End screenshot (no longer need JS overlay, using static red tag instead)
+            # 同一帧既用于红标叠加，也作为视觉 diff 的“点击后”干净帧
             try:
-                t1_temp_path = t1_path.replace("_end.png", "_end_temp.png")
-                self.driver.save_screenshot(t1_temp_path)
+                end_frame = decode_png(capture_frame(self.driver, optimize_for_speed=True), rgb=True)
                 # Add red tag to end screenshot (same as action)
                 safe_bug_label = bug_type if bug_type != "Unknown" else display_name_from_key.get(bug_type_key, bug_choice or "Unknown")
-                visualize_action(t1_temp_path, 0, 0, output_path=t1_path, label=safe_bug_label)
-                # Clean up temp file
-                try:
-                    os.remove(t1_temp_path)
-                except:
-                    pass
+                visualize_action(end_frame, 0, 0, output_path=t1_path, label=safe_bug_label, writer=self.frame_writer)
                 print(f"  [Screenshot] End screenshot with red tag saved")
             except Exception as e:
                 print(f"  [Screenshot] Failed to save end screenshot: {e}")
@@ -1581,7 +1889,7 @@ class InteractionInjector:
 
             if t0_action_path and t1_path and bug_type != "Unknown":
                 # DOM snapshot after interaction (post overlay cleanup)
-                if not after_dom:
+                if not after_dom and recording is None:
                     after_dom = self._dom_snapshot()
 
                 console_logs_after = []
@@ -1598,15 +1906,11 @@ class InteractionInjector:
                 visual_diff_result = {}
                 visual_diff_verified = False
                 
-                if pre_click_captured and os.path.exists(pre_click_screenshot_path):
+                if pre_click_frame is not None and end_frame is not None:
                     print(f"  [Visual Diff] Comparing pre-click vs post-click state...")
                     try:
-                        # 计算两张截图的差异（点击前 vs 点击后）
-                        # 对于 end screenshot，需要使用没有红标的版本
-                        t1_clean_path = t1_path.replace("_end.png", "_end_clean.png")
-                        self.driver.save_screenshot(t1_clean_path)
-                        
-                        visual_diff_result = self._calculate_visual_diff(pre_click_screenshot_path, t1_clean_path)
+                        # 计算两张截图的差异（点击前 vs 点击后，均为内存中未叠加红标的帧）
+                        visual_diff_result = self._calculate_visual_diff(pre_click_frame, end_frame, roi=click_rect)
                         has_visual_change = visual_diff_result.get("has_diff", False)
                         diff_pct = visual_diff_result.get("diff_percentage", 0)
                         
@@ -1629,13 +1933,6 @@ class InteractionInjector:
                         
                         visual_diff_result["expected_behavior"] = "no_change" if bug_type == "Operation_No_Response" else "change"
                         visual_diff_result["verified"] = bool(visual_diff_verified)
-                        
-                        # 清理临时截图
-                        try:
-                            os.remove(pre_click_screenshot_path)
-                            os.remove(t1_clean_path)
-                        except:
-                            pass
                     except Exception as e:
                         print(f"  [!] Visual diff calculation failed: {e}")
                         visual_diff_result = {"error": str(e)}
@@ -1655,7 +1952,8 @@ class InteractionInjector:
                         after_safe, 
                         interceptor_logs,
                         console_logs_before=console_logs_before,
-                        console_logs_after=console_logs_after
+                        console_logs_after=console_logs_after,
+                        recording=recording
                     )
                     visual_verified = bool(visual_eval.get("visual_verified", False))
                 except Exception as e:
@@ -1712,15 +2010,37 @@ class InteractionInjector:
                     "visual_diff_verified": visual_diff_verified,  # 🆕 视觉 diff 是否验证通过
                     "visual_signals": visual_eval.get("signals", {}),
                     "has_network_logs": len(interceptor_logs) > 0,
+                    "page_settle_ms": self.last_settle.get("settle_ms"),
                 }
-                try:
-                    meta_path = os.path.join(META_DIR, f"{uid}.json")
-                    with open(meta_path, "w", encoding="utf-8") as f:
-                        json.dump(meta, f, ensure_ascii=False, indent=2)
-                    status = "✓" if meta.get("injection_verified") else "?"
-                    print(f"{status} [Stored] Interaction {uid} | Bug: {bug_type} | Logs: {len(interceptor_logs)}")
-                except Exception as e:
-                    print(f"[!] Failed to write metadata: {e}")
+                near_duplicate = None
+                if self.dedup_index is not None and start_frame is not None and end_frame is not None:
+                    # 与离线 dedup 对落盘的 end 帧（带红标）计算的指纹一致：红标区域置零后再计算
+                    near_duplicate = self.dedup_index.check_and_add(
+                        "interaction", uid, start_frame, mask_label_tag(end_frame), skip=DEDUP_MODE == "skip")
+                    meta["near_duplicate_of"] = near_duplicate
+                if near_duplicate and DEDUP_MODE == "skip":
+                    # 帧已交给后台写入：等写完后删除，不写元数据
+                    self.frame_writer.flush()
+                    for path in (t0_clean_path, t0_action_path, t1_path):
+                        try:
+                            os.remove(path)
+                        except OSError:
+                            pass
+                    print(f"[-] Interaction {uid} skipped: near duplicate of {near_duplicate['id']} "
+                          f"(distance {near_duplicate['distance']})")
+                else:
+                    try:
+                        meta_path = os.path.join(META_DIR, f"{uid}.json")
+                        with open(meta_path, "w", encoding="utf-8") as f:
+                            json.dump(meta, f, ensure_ascii=False, indent=2)
+                        status = "✓" if meta.get("injection_verified") else "?"
+                        print(f"{status} [Stored] Interaction {uid} | Bug: {bug_type} | Logs: {len(interceptor_logs)}")
+                    except Exception as e:
+                        print(f"[!] Failed to write metadata: {e}")
+
+            # 网络层规则跨导航保持，样本结束后清除，避免影响下一次页面加载
+            if self.use_js_interceptor and self.js_interceptor.persistent_rules:
+                self.js_interceptor.reset_interceptor()
 
     def run_on_url(self, url: str, samples_per_site: int = 8):
         print(f"[*] Loading: {url}")
@@ -1735,9 +2055,8 @@ class InteractionInjector:
             print("[-] No allowed bugs for this page type")
             return
 
-        # 获取两种候选元素
-        base_candidates = get_candidates(self.driver, prioritize_network=True)
-        network_candidates = get_network_triggering_candidates(self.driver)
+        # 获取两种候选元素（同一次页面内扫描）
+        base_candidates, network_candidates = self.candidate_cache.get_sets(self.driver, url, prioritize_network=True)
         
         print(f"[*] 找到 {len(base_candidates)} 个通用候选元素")
         print(f"[*] 找到 {len(network_candidates)} 个网络触发元素")
@@ -1770,9 +2089,8 @@ class InteractionInjector:
             try:
                 chosen_bug = bug_plan[i % len(bug_plan)]
                 
-                # 🔥 每次迭代重新获取元素（避免stale element reference）
-                current_base = get_candidates(self.driver, prioritize_network=True)
-                current_network = get_network_triggering_candidates(self.driver)
+                # 🔥 每次迭代重新获取元素（避免stale element reference）；同一路由优先走缓存复验
+                current_base, current_network = self.candidate_cache.get_sets(self.driver, url, prioritize_network=True)
                 
                 # 根据Bug类型选择合适的候选元素
                 if chosen_bug in network_bugs and current_network:
@@ -0,0 +1,126 @@
+"""
+多进程并行采集 - InteractionInjector.run_batch 的 worker pool 版本
+
+每个 worker 进程持有一个独立的 Chrome（独立 user-data-dir 与 remote-debugging-port），
+从共享队列中拉取 (site, url, samples) 工作单元。样本文件名基于 uuid，
+因此多个 worker 同时写入 dataset_injected/ 不会冲突，输出与串行模式一致。
+"""
+import os
+import random
+import shutil
+import tempfile
+import threading
+import multiprocessing as mp
+from typing import Dict, List, Tuple, Any
+
+from .config import LINK_DISCOVERY_LIMIT, LINK_SAMPLES_PER_PAGE, DEBUG_PORT_BASE
+
+# (kind, site, url, samples)
+#   kind = "page"     → run_on_url(url, samples)
+#   kind = "discover" → 打开 url 发现站内链接，并把每个链接作为新的 "page" 单元放回队列
+WorkUnit = Tuple[str, str, str, int]
+
+
+def build_work_units(targets: Dict[str, Dict], samples_per_site: int = 6, enable_discovery: bool = True,
+                     link_samples: int = LINK_SAMPLES_PER_PAGE) -> List[WorkUnit]:
+    """把 TARGETS 展开为工作单元列表（与 run_batch 的串行遍历顺序/采样数一致）"""
+    units: List[WorkUnit] = []
+    for name, cfg in targets.items():
+        base = cfg.get("base")
+        if not base:
+            continue
+        units.append(("page", name, base, samples_per_site))
+        for r in cfg.get("routes", []):
+            full = r if r.startswith("http") else base.rstrip("/") + r
+            units.append(("page", name, full, max(2, link_samples)))
+        if enable_discovery:
+            units.append(("discover", name, base, max(2, link_samples)))
+    # 发现单元会派生新任务，放在最前；其余按样本数从大到小排列，减少长尾
+    units.sort(key=lambda u: (u[0] != "discover", -u[3]))
+    return units
+
+
+def _worker_main(worker_id: int, task_queue, injector_kwargs: Dict[str, Any], link_limit: int) -> None:
+    # 导入放在子进程内，避免 spawn 时父进程提前初始化 selenium
+    from .injectors import InteractionInjector
+    from .selector import discover_internal_links
+
+    random.seed()
+    profile_dir = tempfile.mkdtemp(prefix=f"ice_worker{worker_id}_")
+    injector = None
+    try:
+        injector = InteractionInjector(
+            user_data_dir=profile_dir,
+            debugging_port=DEBUG_PORT_BASE + worker_id,
+            **injector_kwargs,
+        )
+        print(f"[Worker {worker_id}] Chrome ready (pid={os.getpid()})")
+        while True:
+            unit = task_queue.get()
+            try:
+                if unit is None:
+                    break
+                kind, name, url, samples = unit
+                if kind == "discover":
+                    try:
+                        injector.driver.get(url)
+                        injector._wait_page_ready()
+                    except Exception:
+                        pass
+                    for link in discover_internal_links(injector.driver, url, limit=link_limit):
+                        task_queue.put(("page", name, link, samples))
+                else:
+                    print(f"[Worker {worker_id}] {name}: {url} ({samples} samples)")
+                    injector.run_on_url(url, samples_per_site=samples)
+            except Exception as e:
+                print(f"[Worker {worker_id}] Failed on {unit}: {e}")
+            finally:
+                task_queue.task_done()
+    finally:
+        if injector is not None:
+            injector.close()
+        shutil.rmtree(profile_dir, ignore_errors=True)
+
+
+def run_batch_parallel(targets: Dict[str, Dict], workers: int, samples_per_site: int = 6,
+                       enable_discovery: bool = True, link_limit: int = LINK_DISCOVERY_LIMIT,
+                       link_samples: int = LINK_SAMPLES_PER_PAGE, **injector_kwargs) -> None:
+    """并行版 run_batch：N 个 worker 各自持有一个 Chrome，从共享队列拉取工作单元
+
+    Args:
+        targets: 站点配置（同 config.TARGETS）
+        workers: worker 进程数
+        injector_kwargs: 透传给每个 worker 的 InteractionInjector 构造参数
+    """
+    # 先在父进程中解析 chromedriver 路径，避免多个 worker 并发下载
+    if not injector_kwargs.get("driver_path"):
+        from webdriver_manager.chrome import ChromeDriverManager
+        injector_kwargs["driver_path"] = ChromeDriverManager().install()
+
+    ctx = mp.get_context("spawn")
+    task_queue = ctx.JoinableQueue()
+    units = build_work_units(targets, samples_per_site, enable_discovery, link_samples)
+    for unit in units:
+        task_queue.put(unit)
+    print(f"[*] Parallel mode: {workers} workers, {len(units)} initial work units")
+
+    procs = [
+        ctx.Process(target=_worker_main, args=(i, task_queue, injector_kwargs, link_limit), daemon=False)
+        for i in range(workers)
+    ]
+    for p in procs:
+        p.start()
+    # discover 单元会在 task_done 之前放入新任务，因此 join 返回时所有单元均已完成
+    all_done = threading.Event()
+    threading.Thread(target=lambda: (task_queue.join(), all_done.set()), daemon=True).start()
+    try:
+        while not all_done.wait(timeout=5):
+            if not any(p.is_alive() for p in procs):
+                print("[!] All workers exited before the queue was drained")
+                break
+    finally:
+        for p in procs:
+            if p.is_alive():
+                task_queue.put(None)
+        for p in procs:
+            p.join()
@@ -0,0 +1,158 @@
+"""
+站点能力档案 - 按 origin 持久化到磁盘的检测结果
+
+NativeErrorPageDetector / PageFeatureDetector 的检测很慢（导航、逐个选择器查询），
+结果只与站点有关。这里把它们按 origin 存成一个 JSON 文件，跨进程运行、跨 worker 复用：
+
+    dataset_injected/site_profiles/http_localhost_3000.json
+    {
+        "origin": "http://localhost:3000",
+        "sections": {
+            "native_404":     {"*": {"value": {...}, "ts": 1700000000.0}},
+            "native_loading": {"/#/login": {"value": {...}, "ts": ...}},
+            "native_toast":   {...},
+            "page_features":  {"/#/search": {...}},
+            "settle_ms":      {"/#/basket": {...}},
+        }
+    }
+
+每个条目带时间戳，超过 TTL 视为不存在。写入时通过 O_EXCL 锁文件串行化
+“读-改-写”，并用 os.replace 原子替换，多个 worker 并发写同一站点也不会损坏文件。
+"""
+import os
+import re
+import json
+import time
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, Any, Tuple
+from urllib.parse import urlparse
+
+from .config import PROFILE_DIR, PROFILE_TTL
+
+LOCK_STALE_SECONDS = 30  # 持锁进程崩溃后遗留的锁文件在此时间后可被清除
+
+
+def split_url(url: str) -> Tuple[str, str]:
+    """URL → (origin, route)。route 包含 path 与 hash 路由（SPA 路由在 fragment 中）"""
+    parsed = urlparse(url)
+    origin = f"{parsed.scheme}://{parsed.netloc}"
+    route = parsed.path or "/"
+    if parsed.fragment:
+        route += "#" + parsed.fragment
+    return origin, route
+
+
+class SiteProfileStore:
+    def __init__(self, root: str = PROFILE_DIR, ttl: float = PROFILE_TTL):
+        self.root = root
+        self.ttl = ttl
+        self._memo: Dict[str, Tuple[int, Dict[str, Any]]] = {}  # path → (mtime_ns, profile)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, origin: str) -> str:
+        name = re.sub(r"[^A-Za-z0-9.-]+", "_", origin).strip("_") or "default"
+        return os.path.join(self.root, f"{name}.json")
+
+    @contextmanager
+    def _lock(self, path: str):
+        lock_path = path + ".lock"
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > LOCK_STALE_SECONDS:
+                        os.remove(lock_path)
+                        continue
+                except OSError:
+                    continue
+                time.sleep(0.05)
+        try:
+            os.write(fd, str(os.getpid()).encode())
+            yield
+        finally:
+            os.close(fd)
+            try:
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+    def _read(self, origin: str) -> Dict[str, Any]:
+        path = self._path(origin)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return {"origin": origin, "sections": {}}
+        cached = self._memo.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                profile = json.load(f)
+        except (OSError, ValueError):
+            profile = {"origin": origin, "sections": {}}
+        self._memo[path] = (mtime, profile)
+        return profile
+
+    def _write(self, path: str, profile: Dict[str, Any]) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(profile, f, ensure_ascii=False, indent=2)
+            os.replace(tmp, path)
+        except Exception:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+
+    def get(self, origin: str, section: str, key: str = "*") -> Any:
+        """读取条目，不存在或已过期时返回 None"""
+        entry = self._read(origin).get("sections", {}).get(section, {}).get(key)
+        if not entry or time.time() - entry.get("ts", 0) > self.ttl:
+            return None
+        return entry.get("value")
+
+    def put(self, origin: str, section: str, key: str, value: Any) -> None:
+        """写入条目（加锁的读-改-写 + 原子替换，可在多个 worker 间安全并发）"""
+        path = self._path(origin)
+        try:
+            with self._lock(path):
+                self._memo.pop(path, None)
+                profile = self._read(origin)
+                profile["origin"] = origin
+                profile.setdefault("sections", {}).setdefault(section, {})[key] = {"value": value, "ts": time.time()}
+                self._write(path, profile)
+        except Exception as e:
+            print(f"[!] Failed to update site profile for {origin}: {e}")
+
+    def invalidate(self, origin: str | None = None, section: str | None = None) -> None:
+        """清除档案：不带参数清除全部；只给 origin 清除该站点；再给 section 只清除该部分"""
+        if origin is None:
+            for name in os.listdir(self.root):
+                if name.endswith(".json"):
+                    self._remove(os.path.join(self.root, name))
+            return
+        path = self._path(origin)
+        if section is None:
+            self._remove(path)
+            return
+        try:
+            with self._lock(path):
+                self._memo.pop(path, None)
+                profile = self._read(origin)
+                if profile.get("sections", {}).pop(section, None) is not None:
+                    self._write(path, profile)
+        except Exception as e:
+            print(f"[!] Failed to invalidate site profile for {origin}: {e}")
+
+    def _remove(self, path: str) -> None:
+        with self._lock(path):
+            self._memo.pop(path, None)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
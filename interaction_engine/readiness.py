@@ -0,0 +1,134 @@
+"""
+页面就绪检测 - 用页面内的真实静默状态替代固定 sleep
+
+判定条件（全部满足即就绪，否则到达硬上限后返回）：
+1. document.readyState == 'complete'
+2. 没有进行中的 fetch / XHR
+3. 连续 quiet_ms 毫秒没有 DOM 变更（MutationObserver）
+4. document.fonts.ready 已 resolve
+5. 视口内图片已加载并解码完成
+"""
+import time
+from typing import Dict, Any
+
+from .config import SETTLE_QUIET_MS, SETTLE_MAX_MS
+
+
+# 安装请求计数器与 MutationObserver（幂等）
+READINESS_TRACKER_JS = r"""
+(function() {
+    if (window.__ICE_READY__) return;
+    const st = window.__ICE_READY__ = { inflight: 0, lastMutation: performance.now() };
+    const settle = () => { st.inflight = Math.max(0, st.inflight - 1); st.lastMutation = performance.now(); };
+
+    const origFetch = window.fetch;
+    if (origFetch) {
+        window.fetch = function(...args) {
+            st.inflight++;
+            let p;
+            try { p = origFetch.apply(this, args); } catch (e) { settle(); throw e; }
+            return Promise.resolve(p).then(r => { settle(); return r; }, e => { settle(); throw e; });
+        };
+    }
+    const origSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function(...args) {
+        st.inflight++;
+        this.addEventListener('loadend', settle, { once: true });
+        try { return origSend.apply(this, args); } catch (e) { settle(); throw e; }
+    };
+
+    const observe = () => {
+        new MutationObserver(() => { st.lastMutation = performance.now(); })
+            .observe(document.documentElement, { childList: true, subtree: true, attributes: true, characterData: true });
+    };
+    if (document.documentElement) observe();
+    else document.addEventListener('readystatechange', observe, { once: true });
+})();
+"""
+
+# execute_async_script：arguments = [quiet_ms, max_ms, callback]
+PAGE_QUIESCENCE_JS = READINESS_TRACKER_JS + r"""
+const done = arguments[arguments.length - 1];
+const quietMs = arguments[0];
+const maxMs = arguments[1];
+const st = window.__ICE_READY__;
+const t0 = performance.now();
+
+let fontsReady = !document.fonts;
+if (document.fonts) document.fonts.ready.then(() => { fontsReady = true; });
+
+let imagesDecoded = false;
+let decoding = false;
+const checkImages = () => {
+    if (imagesDecoded || decoding) return;
+    const vh = window.innerHeight, vw = window.innerWidth;
+    const imgs = Array.from(document.images).filter(img => {
+        const r = img.getBoundingClientRect();
+        return r.width > 0 && r.height > 0 && r.bottom > 0 && r.right > 0 && r.top < vh && r.left < vw;
+    });
+    if (!imgs.every(img => img.complete)) return;
+    decoding = true;
+    Promise.allSettled(imgs.map(img => img.decode ? img.decode() : Promise.resolve()))
+        .then(() => { imagesDecoded = true; decoding = false; });
+};
+
+const finish = (reason) => done({
+    settle_ms: Math.round(performance.now() - t0),
+    reason: reason,
+    timed_out: reason === 'timeout',
+    inflight: st.inflight,
+});
+
+(function poll() {
+    const now = performance.now();
+    if (document.readyState === 'complete') checkImages();
+    if (document.readyState === 'complete' && st.inflight === 0 && fontsReady && imagesDecoded
+            && now - st.lastMutation >= quietMs) {
+        return finish('quiet');
+    }
+    if (now - t0 >= maxMs) return finish('timeout');
+    setTimeout(poll, 50);
+})();
+"""
+
+
+def install_readiness_tracker(driver) -> bool:
+    """通过 CDP 在每个新 document 开始时安装请求计数器 / MutationObserver
+
+    页面加载完成后再安装会漏掉已经发出的请求；document-start 安装从第一个请求起计数。
+    不支持 CDP 时返回 False（wait_for_page_quiescence 会在首次等待时补装）。
+    """
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": READINESS_TRACKER_JS})
+        return True
+    except Exception:
+        return False
+
+
+def wait_for_page_quiescence(driver, quiet_ms: int = SETTLE_QUIET_MS, max_wait_ms: int = SETTLE_MAX_MS) -> Dict[str, Any]:
+    """在页面内等待真实静默状态，返回实测 settle 时间
+
+    Returns:
+        {
+            'settle_ms': int,      # 页面内测得的等待时长
+            'reason': str,         # 'quiet' | 'timeout' | 'error'
+            'timed_out': bool,
+            'inflight': int,       # 返回时仍在进行中的请求数
+        }
+    """
+    t0 = time.time()
+    error = None
+    try:
+        driver.set_script_timeout(max_wait_ms / 1000 + 5)
+        result = driver.execute_async_script(PAGE_QUIESCENCE_JS, quiet_ms, max_wait_ms)
+        if isinstance(result, dict):
+            return result
+    except Exception as e:
+        error = str(e)[:120]
+    return {
+        "settle_ms": int((time.time() - t0) * 1000),
+        "reason": "error",
+        "timed_out": True,
+        "inflight": -1,
+        "error": error,
+    }
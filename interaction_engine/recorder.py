@@ -0,0 +1,253 @@
+"""
+点击前后的页面变化记录器 - MutationObserver 在页面内累计紧凑计数
+
+原先的证据来自点击前后两次 _dom_snapshot（整页 innerText + 三组选择器探测），
+再在 Python 中对比文本。记录器在注入前布防，页面内累计：
+
+    - 新增 / 删除的节点数（原始次数）
+    - 新出现的错误 / spinner / toast / 表单校验元素（新增节点或属性变化后才匹配的元素）
+    - aria-invalid 变为 "true" 的次数
+    - URL / 标题变化，history.pushState / replaceState、hashchange、popstate 次数
+
+文本按“净变化”计算（读回时汇总），与快照对比的含义一致：
+    - 同一窗口内先增后删的节点不计；新增节点只取读回时仍在页面上、可见的文本（innerText）
+    - characterData 只比较第一次的 oldValue 与最终值
+    - 删除与新增的文本按内容（去空白）相互抵消，框架重渲染出相同内容时净变化为 0
+    - 剩余的新增文本片段供关键字判断（只看“点击后出现的内容”）
+
+点击后一次 execute_script 读回并断开观察。整页跳转会替换 document，记录随之消失，
+read() 返回 None，调用方回退到点击后快照（此时没有点击前文本，相似度记为 None）。
+引擎自己的标注层（__ICE_BUG_OVERLAY__ / __debug_overlay__）不计入，
+注入的 loading 遮罩与错误 toast 属于缺陷本身，照常计入。
+"""
+from typing import Dict, Any, Optional
+
+from .config import RECORDER_TEXT_LIMIT
+
+# spinner / error / validation 与 _dom_snapshot 的选择器组一致
+EVIDENCE_SELECTORS = {
+    "spinner": ", ".join([
+        ".spinner", ".loading", ".loader", ".lds-ring", ".lds-dual-ring",
+        ".mat-progress-spinner", ".mat-mdc-progress-spinner", ".mat-progress-bar",
+        ".mdc-linear-progress", ".ngx-spinner", ".v-progress-circular"]),
+    "error": ", ".join([
+        ".error", ".mat-error", ".alert-danger", ".alert.alert-danger",
+        ".toast-error", ".snack-bar-error", '[role="alert"]', ".mdc-snackbar",
+        ".mat-snack-bar-container"]),
+    "toast": ", ".join([
+        ".toast", ".snackbar", ".mat-snack-bar-container", ".mdc-snackbar", ".notification",
+        '[role="status"]', "#__ICE_ERROR_TOAST__"]),
+    "validation": ", ".join([
+        'input[aria-invalid="true"]', ".mat-form-field-invalid", ".ng-invalid.ng-touched"]),
+}
+
+# arguments = [EVIDENCE_SELECTORS, textLimit]；返回布防时的 {url, title, text_chars}
+CHANGE_RECORDER_ARM_JS = r"""
+(function(sel, textLimit) {
+    const prev = window.__ICE_REC__;
+    if (prev && prev.observer) prev.observer.disconnect();
+    const squash = (t) => (t || '').replace(/\s+/g, '');
+    const rec = window.__ICE_REC__ = {
+        url: location.href, title: document.title || '', t0: performance.now(),
+        baselineChars: squash(document.body && document.body.innerText).length,
+        nodesAdded: 0, nodesRemoved: 0, attrChanges: 0,
+        errorShown: 0, spinnerShown: 0, toastShown: 0, validationShown: 0, invalidFlips: 0,
+        historyCalls: 0, hashChanges: 0, popstates: 0, titleChanges: 0,
+    };
+    const KINDS = ['error', 'spinner', 'toast', 'validation'];
+    const seen = Object.fromEntries(KINDS.map(k => [k, new WeakSet()]));
+    const SKIP_TAGS = new Set(['SCRIPT', 'STYLE', 'NOSCRIPT', 'TEMPLATE', 'LINK', 'META']);
+    const added = new Set();        // 窗口内新增、尚未被删除的节点
+    const removedText = [];         // 窗口开始前就存在、被删除的节点文本
+    const charOld = new Map();      // 文本节点 → 第一次变化前的值
+
+    const ours = (node) => {
+        const el = node.nodeType === 1 ? node : node.parentElement;
+        return !!(el && el.closest && el.closest('#__ICE_BUG_OVERLAY__, #__debug_overlay__'));
+    };
+    const inBody = (node) => !!(document.body && document.body.contains(node));
+    const visible = (el) => !!el && (el.checkVisibility ? el.checkVisibility() : el.getClientRects().length > 0);
+    // 节点本身或其祖先是窗口内新增的（文本已计入那个新增节点）
+    const withinAdded = (node) => {
+        for (let n = node; n; n = n.parentNode) if (added.has(n)) return true;
+        return false;
+    };
+    // 可见文本：元素取 innerText（不含隐藏后代），文本节点看父元素是否可见
+    const liveText = (node) => {
+        if (node.nodeType === 3) return visible(node.parentElement) ? node.data : '';
+        if (node.nodeType !== 1 || SKIP_TAGS.has(node.tagName) || !visible(node)) return '';
+        return node.innerText || '';
+    };
+    // deep=true：新增子树内的匹配也算（新增节点）；deep=false：只看元素本身（属性变化）
+    const classify = (el, deep) => {
+        if (el.nodeType !== 1) return;
+        for (const kind of KINDS) {
+            if (seen[kind].has(el)) continue;
+            if (el.matches(sel[kind]) || (deep && el.querySelector(sel[kind]))) {
+                seen[kind].add(el);
+                rec[kind + 'Shown']++;
+            }
+        }
+    };
+
+    const handle = (mutations) => {
+        for (const m of mutations) {
+            const owner = m.target.nodeType === 1 ? m.target : m.target.parentNode;
+            if (owner && owner.nodeName === 'TITLE') { rec.titleChanges++; continue; }
+            if (ours(m.target)) continue;
+            if (m.type === 'childList') {
+                const liveParent = inBody(m.target) && !withinAdded(m.target);
+                for (const node of m.removedNodes) {
+                    if (ours(node)) continue;
+                    rec.nodesRemoved++;
+                    // 先增后删（或从新增子树内删除）：不计
+                    if (added.delete(node) || !liveParent) continue;
+                    // 节点已脱离文档，无法再判断其自身可见性；父节点不可见时视为隐藏内容
+                    if (node.nodeType === 1 && SKIP_TAGS.has(node.tagName)) continue;
+                    if ((node.nodeType === 1 || node.nodeType === 3) && visible(m.target))
+                        removedText.push(node.textContent || '');
+                }
+                for (const node of m.addedNodes) {
+                    if (ours(node) || !inBody(node)) continue;
+                    rec.nodesAdded++;
+                    added.add(node);
+                    classify(node, true);
+                }
+            } else if (m.type === 'characterData') {
+                if (!charOld.has(m.target)) charOld.set(m.target, m.oldValue || '');
+            } else if (m.type === 'attributes') {
+                rec.attrChanges++;
+                if (m.attributeName === 'aria-invalid' && m.oldValue !== 'true'
+                        && m.target.getAttribute('aria-invalid') === 'true') rec.invalidFlips++;
+                classify(m.target, false);
+            }
+        }
+    };
+
+    // 读回时汇总净文本变化：删除 / 新增文本按内容抵消，剩余部分计入增删字符数
+    rec.summarize = () => {
+        const addedText = [];
+        for (const node of added) {
+            if (!node.isConnected || !inBody(node) || withinAdded(node.parentNode)) continue;
+            addedText.push(liveText(node));
+        }
+        const removed = removedText.slice();
+        for (const [node, old] of charOld) {
+            if (!node.isConnected || !inBody(node) || withinAdded(node)) continue;
+            if (squash(old) === squash(node.data) || !visible(node.parentElement)) continue;
+            removed.push(old);
+            addedText.push(node.data);
+        }
+        const pending = new Map();
+        for (const t of removed) {
+            const key = squash(t);
+            if (key) pending.set(key, (pending.get(key) || 0) + 1);
+        }
+        const net = [];
+        for (const t of addedText) {
+            const key = squash(t);
+            if (!key) continue;
+            const n = pending.get(key) || 0;
+            if (n > 0) { pending.set(key, n - 1); continue; }
+            net.push(t.trim());
+        }
+        let charsRemoved = 0;
+        for (const [key, n] of pending) charsRemoved += key.length * n;
+        const charsAdded = net.reduce((acc, t) => acc + squash(t).length, 0);
+        let kept = 0;
+        const pieces = [];
+        for (const t of net) {
+            if (kept >= textLimit) break;
+            const piece = t.slice(0, Math.min(300, textLimit - kept));
+            pieces.push(piece);
+            kept += piece.length;
+        }
+        return { charsAdded, charsRemoved, text: pieces.join('\n') };
+    };
+
+    rec.observer = new MutationObserver(handle);
+    rec.handle = handle;
+    rec.observer.observe(document.documentElement, {
+        childList: true, subtree: true, characterData: true, characterDataOldValue: true,
+        attributes: true, attributeOldValue: true,
+        attributeFilter: ['class', 'aria-invalid', 'aria-busy', 'hidden', 'style', 'disabled'],
+    });
+
+    if (!window.__ICE_REC_HOOKS__) {
+        window.__ICE_REC_HOOKS__ = true;
+        for (const name of ['pushState', 'replaceState']) {
+            const orig = history[name];
+            history[name] = function(...args) {
+                if (window.__ICE_REC__) window.__ICE_REC__.historyCalls++;
+                return orig.apply(this, args);
+            };
+        }
+        window.addEventListener('hashchange', () => { if (window.__ICE_REC__) window.__ICE_REC__.hashChanges++; });
+        window.addEventListener('popstate', () => { if (window.__ICE_REC__) window.__ICE_REC__.popstates++; });
+    }
+    return { url: rec.url, title: rec.title, text_chars: rec.baselineChars };
+})(arguments[0], arguments[1]);
+"""
+
+CHANGE_RECORDER_READ_JS = r"""
+const rec = window.__ICE_REC__;
+if (!rec || !rec.observer) return null;
+rec.handle(rec.observer.takeRecords());
+rec.observer.disconnect();
+rec.observer = null;
+const sel = arguments[0];
+const anySel = (s) => !!document.querySelector(s);
+const text = rec.summarize();
+return {
+    elapsed_ms: Math.round(performance.now() - rec.t0),
+    url_before: rec.url, url: location.href, url_changed: location.href !== rec.url,
+    title_before: rec.title, title: document.title || '', title_changed: (document.title || '') !== rec.title,
+    title_mutations: rec.titleChanges,
+    history_calls: rec.historyCalls, hash_changes: rec.hashChanges, popstates: rec.popstates,
+    baseline_chars: rec.baselineChars,
+    nodes_added: rec.nodesAdded, nodes_removed: rec.nodesRemoved, attr_changes: rec.attrChanges,
+    chars_added: text.charsAdded, chars_removed: text.charsRemoved,
+    error_shown: rec.errorShown, spinner_shown: rec.spinnerShown, toast_shown: rec.toastShown,
+    validation_shown: rec.validationShown,
+    invalid_flips: rec.invalidFlips,
+    invalid_input_count: document.querySelectorAll('input[aria-invalid="true"]').length,
+    present: { spinner: anySel(sel.spinner), error: anySel(sel.error), validation: anySel(sel.validation) },
+    added_text: text.text,
+};
+"""
+
+
+def recorded_similarity(rec: Dict[str, Any]) -> float:
+    """由记录的净增删字符数（不含空白）估算点击前后文本相似度
+
+    与 SequenceMatcher.ratio 的量纲一致：新增 / 删除 k 个字符时 ratio ≈ 1 - k / (2 * n)
+    """
+    baseline = max(1, rec.get("baseline_chars", 0))
+    changed = rec.get("chars_added", 0) + rec.get("chars_removed", 0)
+    return max(0.0, 1.0 - changed / (2.0 * baseline))
+
+
+class ChangeRecorder:
+    def __init__(self, driver, text_limit: int = RECORDER_TEXT_LIMIT):
+        self.driver = driver
+        self.text_limit = text_limit
+
+    def arm(self) -> Optional[Dict[str, Any]]:
+        """在当前 document 上布防（重复调用会替换上一次的记录）
+
+        Returns:
+            布防时的 {'url', 'title', 'text_chars'}（整页跳转后回退路径仍需要点击前的 URL / 标题）；失败时 None
+        """
+        try:
+            return self.driver.execute_script(CHANGE_RECORDER_ARM_JS, EVIDENCE_SELECTORS, self.text_limit) or None
+        except Exception as e:
+            print(f"[!] Change recorder arm failed: {e}")
+            return None
+
+    def read(self) -> Optional[Dict[str, Any]]:
+        """读回记录并断开观察；document 已被替换（整页跳转）或未布防时返回 None"""
+        try:
+            return self.driver.execute_script(CHANGE_RECORDER_READ_JS, EVIDENCE_SELECTORS)
+        except Exception as e:
+            print(f"[!] Change recorder read failed: {e}")
+            return None
@@ -0,0 +1,170 @@
+"""
+变化区域提取 - 从前后两帧得到“像素实际变化的位置”
+
+inject_bug 返回的 bbox 是元素矩形，不一定是像素变化的位置（Layout_Overlap 会移动内容，
+Text_Overflow 会溢出元素边界）。这里在内存中的两帧上直接计算：
+
+    mask        阈值化的变化掩码（任一通道差值 > tolerance）
+    components  连通域（去掉面积过小的噪点），每个带 bbox 与面积
+    bbox        所有保留连通域的紧致并集 bbox
+    mask_rle    下采样后掩码的行优先游程编码，随样本元数据保存：
+                {"size": [h, w], "scale": s, "counts": [0 的个数, 1 的个数, 0 的个数, ...]}
+
+outside_fraction 给出变化像素落在标注区域之外的比例，用于拒绝“标注框与实际变化不符”的样本。
+"""
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+try:
+    import cv2
+    HAS_CV2 = True
+except ImportError:
+    HAS_CV2 = False
+
+from .config import REGION_DIFF_TOLERANCE, REGION_MIN_AREA, REGION_MASK_SCALE
+from .imaging import changed_pixel_mask
+
+_FALLBACK_CELL = 8  # 无 OpenCV 时在 8x8 网格上做连通域标记
+
+
+def change_mask(img1: np.ndarray, img2: np.ndarray, tolerance: int = REGION_DIFF_TOLERANCE) -> np.ndarray:
+    """任一通道差值 > tolerance 的像素"""
+    if HAS_CV2 and img1.ndim == 3 and img1.dtype == np.uint8:
+        # absdiff 饱和运算无需转 int16；逐通道 max 后一次比较
+        d = cv2.absdiff(img1, img2)
+        peak = d[..., 0]
+        for c in range(1, d.shape[-1]):
+            peak = cv2.max(peak, d[..., c])
+        return peak > tolerance
+    return changed_pixel_mask(img1, img2, tolerance)
+
+
+def _block_any(mask: np.ndarray, cell: int) -> np.ndarray:
+    """按 cell x cell 块取“任一为真”，不足一块的边缘补零"""
+    if HAS_CV2:
+        # 锚点在左上角的膨胀使每个像素取其右下 cell x cell 块的最大值，再按步长取块左上角
+        grown = cv2.dilate(mask.view(np.uint8), np.ones((cell, cell), np.uint8), anchor=(0, 0))
+        return grown[::cell, ::cell].astype(bool)
+    h, w = mask.shape
+    ph, pw = -h % cell, -w % cell
+    if ph or pw:
+        mask = np.pad(mask, ((0, ph), (0, pw)))
+    return mask.reshape(mask.shape[0] // cell, cell, mask.shape[1] // cell, cell).any(axis=(1, 3))
+
+
+def _tight_bbox(mask: np.ndarray) -> Optional[Dict[str, int]]:
+    rows = np.flatnonzero(mask.any(axis=1))
+    if rows.size == 0:
+        return None
+    cols = np.flatnonzero(mask.any(axis=0))
+    return {"x": int(cols[0]), "y": int(rows[0]),
+            "width": int(cols[-1] - cols[0] + 1), "height": int(rows[-1] - rows[0] + 1)}
+
+
+def _components_grid(mask: np.ndarray) -> List[Dict[str, int]]:
+    """回退实现：在粗网格上做 8 邻域标记，再回到原掩码收紧每个连通域的 bbox"""
+    grid = _block_any(mask, _FALLBACK_CELL)
+    seen = np.zeros_like(grid)
+    components = []
+    for start in zip(*np.nonzero(grid)):
+        if seen[start]:
+            continue
+        seen[start] = True
+        stack, cells = [start], []
+        while stack:
+            r, c = stack.pop()
+            cells.append((r, c))
+            for dr in (-1, 0, 1):
+                for dc in (-1, 0, 1):
+                    nr, nc = r + dr, c + dc
+                    if 0 <= nr < grid.shape[0] and 0 <= nc < grid.shape[1] and grid[nr, nc] and not seen[nr, nc]:
+                        seen[nr, nc] = True
+                        stack.append((nr, nc))
+        rs = [r for r, _ in cells]
+        cs = [c for _, c in cells]
+        y0, x0 = int(min(rs)) * _FALLBACK_CELL, int(min(cs)) * _FALLBACK_CELL
+        sub = mask[y0:(max(rs) + 1) * _FALLBACK_CELL, x0:(max(cs) + 1) * _FALLBACK_CELL]
+        box = _tight_bbox(sub)
+        if box:
+            box["x"] += x0
+            box["y"] += y0
+            box["area"] = int(np.count_nonzero(sub))
+            components.append(box)
+    return components
+
+
+def connected_components(mask: np.ndarray, min_area: int = REGION_MIN_AREA) -> List[Dict[str, int]]:
+    """8 邻域连通域，按面积降序；面积 < min_area 的视为噪点丢弃"""
+    if HAS_CV2:
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask.view(np.uint8), connectivity=8)
+        components = [
+            {"x": int(x), "y": int(y), "width": int(w), "height": int(h), "area": int(area)}
+            for x, y, w, h, area in stats[1:count]
+        ]
+    else:
+        components = _components_grid(mask)
+    components = [c for c in components if c["area"] >= min_area]
+    components.sort(key=lambda c: c["area"], reverse=True)
+    return components
+
+
+def union_bbox(boxes: List[Dict[str, Any]]) -> Optional[Dict[str, int]]:
+    boxes = [b for b in boxes if b and b.get("width", 0) > 0 and b.get("height", 0) > 0]
+    if not boxes:
+        return None
+    x0 = min(b["x"] for b in boxes)
+    y0 = min(b["y"] for b in boxes)
+    x1 = max(b["x"] + b["width"] for b in boxes)
+    y1 = max(b["y"] + b["height"] for b in boxes)
+    return {"x": int(x0), "y": int(y0), "width": int(np.ceil(x1 - x0)), "height": int(np.ceil(y1 - y0))}
+
+
+def rle_encode(mask: np.ndarray, scale: int = REGION_MASK_SCALE) -> Dict[str, Any]:
+    """下采样（块内任一变化即为 1）后按行优先做游程编码，counts 从 0 的游程开始"""
+    small = _block_any(mask, scale) if scale > 1 else mask
+    flat = small.reshape(-1).view(np.uint8)
+    edges = np.flatnonzero(np.diff(flat)) + 1
+    bounds = np.concatenate(([0], edges, [flat.size]))
+    counts = np.diff(bounds).tolist()
+    if flat.size and flat[0]:
+        counts.insert(0, 0)
+    return {"size": [int(small.shape[0]), int(small.shape[1])], "scale": int(scale), "counts": counts}
+
+
+def rle_decode(rle: Dict[str, Any]) -> np.ndarray:
+    """rle_encode 的逆过程，返回下采样分辨率的布尔掩码"""
+    h, w = rle["size"]
+    values = np.arange(len(rle["counts"])) % 2 == 1
+    return np.repeat(values, rle["counts"]).reshape(h, w)
+
+
+def outside_fraction(mask: np.ndarray, region: Optional[Dict[str, Any]], margin: int = 0) -> float:
+    """变化像素中落在 region（+ margin）之外的比例；没有变化时为 0，没有 region 时为 1"""
+    total = np.count_nonzero(mask)
+    if total == 0:
+        return 0.0
+    if not region:
+        return 1.0
+    y0 = max(0, int(region["y"]) - margin)
+    x0 = max(0, int(region["x"]) - margin)
+    y1 = max(0, int(np.ceil(region["y"] + region["height"])) + margin)
+    x1 = max(0, int(np.ceil(region["x"] + region["width"])) + margin)
+    inside = np.count_nonzero(mask[y0:y1, x0:x1])
+    return float(total - inside) / total
+
+
+def extract_regions(img1: np.ndarray, img2: np.ndarray, tolerance: int = REGION_DIFF_TOLERANCE,
+                    min_area: int = REGION_MIN_AREA, scale: int = REGION_MASK_SCALE) -> Dict[str, Any]:
+    """两帧 → 变化掩码 / 连通域 / 并集 bbox / RLE；结果中的 'mask' 仅供调用方继续计算，不可 JSON 序列化"""
+    if img1.shape != img2.shape:
+        return {"mask": None, "components": [], "bbox": None, "changed_pixels": 0, "mask_rle": None}
+    mask = change_mask(img1, img2, tolerance)
+    components = connected_components(mask, min_area)
+    return {
+        "mask": mask,
+        "components": components,
+        "bbox": union_bbox(components),
+        "changed_pixels": int(np.count_nonzero(mask)),
+        "mask_rle": rle_encode(mask, scale),
+    }
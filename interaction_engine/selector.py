@@ -1,429 +1,475 @@
 import random
 import re
 from urllib.parse import urlparse
-from typing import List, Set
+from typing import Any, Dict, List, Set, Tuple
 from selenium.webdriver.common.by import By
 
 from .config import LINK_DISCOVERY_LIMIT
 
 
+# 高优先级：通常会触发网络请求的元素（权重3）
+HIGH_PRIORITY_SELECTORS = [
+    # 表单提交
+    "button[type='submit']",
+    "input[type='submit']",
+    "form button",
+    "button[class*='submit']",
+    # Angular Material 表单按钮
+    "[mat-raised-button]",
+    "[mat-flat-button]",
+    "button[mat-button]",
+    # 功能按钮
+    "button[class*='search']",
+    "button[class*='login']",
+    "button[class*='register']",
+    "button[class*='add']",
+    "button[class*='save']",
+    "button[class*='delete']",
+    "button[class*='confirm']",
+    "button[class*='buy']",
+    "button[class*='checkout']",
+    "button[class*='order']",
+    "button[class*='send']",
+    "button[class*='post']",
+    # 导航到表单的链接
+    "a[href*='login']",
+    "a[href*='register']",
+    "a[href*='checkout']",
+    "a[href*='cart']",
+    # 有data属性的交互元素
+    "[data-action]",
+    "[onclick*='fetch']",
+    "[onclick*='ajax']",
+    "[onclick*='submit']",
+]
+
+# 中优先级：可能触发请求的元素（权重2）
+MEDIUM_PRIORITY_SELECTORS = [
+    "button:not([type='button'])",  # 默认type="submit"
+    "[role='button']",
+    "button[class*='btn']",
+    "a[class*='btn']",
+    # Angular Material 图标按钮
+    "[mat-icon-button]",
+]
+
+# 低优先级：可点击链接
+LOW_PRIORITY_SELECTORS = [
+    "a[href]:not([href='#']):not([href='javascript:void(0)']):not([href^='mailto'])",
+]
+
+# 最可能触发网络请求的选择器（网络类 Bug 注入）
+NETWORK_SELECTORS = [
+    # 表单提交
+    "button[type='submit']",
+    "input[type='submit']",
+    "form button:not([type='button'])",
+    # Angular Material 表单按钮
+    "[mat-raised-button]",
+    "[mat-flat-button]",
+    "button[mat-button]",
+    # 登录/注册
+    "button[class*='login']",
+    "button[class*='sign']",
+    "button[class*='register']",
+    # 购物/交易
+    "button[class*='add-to-cart']",
+    "button[class*='buy']",
+    "button[class*='checkout']",
+    "button[class*='order']",
+    "button[class*='purchase']",
+    # 搜索
+    "button[class*='search']",
+    "input[type='search'] ~ button",
+    # 数据操作
+    "button[class*='save']",
+    "button[class*='delete']",
+    "button[class*='update']",
+    "button[class*='send']",
+    "button[class*='post']",
+    "button[class*='submit']",
+    # API触发
+    "[data-action]",
+    "[onclick*='fetch']",
+    "[onclick*='ajax']",
+    "[onclick*='http']",
+    "[onclick*='api']",
+    # 有明确文本暗示的按钮
+    "button",  # 会在后面过滤
+]
+
+# 网络候选额外过滤：排除切换、显示/隐藏、菜单等UI交互，以及外部OAuth登录（会跳转到外部网站）
+NETWORK_SKIP_KEYWORDS = [
+    "toggle", "show", "hide", "display", "password",
+    "menu", "dropdown", "collapse", "expand", "close",
+    "dismiss", "cancel", "back", "previous", "next",
+    "language", "theme", "dark", "light",
+    "google", "facebook", "twitter", "github", "oauth",
+    "sign in with", "log in with", "continue with",
+]
+
+# 有明确网络操作暗示的文本（优先）
+NETWORK_ACTION_KEYWORDS = [
+    "submit", "login", "sign", "register", "send",
+    "save", "add", "buy", "order", "checkout", "pay",
+    "search", "delete", "update", "post", "confirm",
+]
+
+
+# DOM 结构指纹：只看元素标签序列与数量（忽略文本/属性），用于判断同一路由重载后结构是否一致
+DOM_FINGERPRINT_FN = r"""
+function __iceFingerprint() {
+    let h = 0x811c9dc5;
+    const all = document.body ? document.body.getElementsByTagName('*') : [];
+    for (let i = 0; i < all.length; i++) {
+        const t = all[i].tagName;
+        for (let j = 0; j < t.length; j++) { h ^= t.charCodeAt(j); h = Math.imul(h, 0x01000193); }
+        h ^= 0x2f; h = Math.imul(h, 0x01000193);
+    }
+    return all.length + ':' + (h >>> 0).toString(16);
+}
+"""
+
+# 稳定元素标识：生成 CSS path，并以 path 的哈希作为 data-ice-id 写回页面（重载后同一元素得到同一 id）
+ELEMENT_IDENTITY_FN = r"""
+function __iceCssPath(el) {
+    const parts = [];
+    while (el && el.nodeType === 1 && el !== document.body && el !== document.documentElement) {
+        if (el.id && document.querySelectorAll('#' + CSS.escape(el.id)).length === 1) {
+            parts.unshift('#' + CSS.escape(el.id));
+            return parts.join(' > ');
+        }
+        let idx = 1;
+        for (let s = el.previousElementSibling; s; s = s.previousElementSibling) {
+            if (s.tagName === el.tagName) idx++;
+        }
+        parts.unshift(el.tagName.toLowerCase() + ':nth-of-type(' + idx + ')');
+        el = el.parentElement;
+    }
+    parts.unshift('body');
+    return parts.join(' > ');
+}
+function __iceStamp(el) {
+    const path = __iceCssPath(el);
+    let h = 0x811c9dc5;
+    for (let i = 0; i < path.length; i++) { h ^= path.charCodeAt(i); h = Math.imul(h, 0x01000193); }
+    const iceId = 'ice-' + (h >>> 0).toString(16);
+    el.setAttribute('data-ice-id', iceId);
+    return { ice_id: iceId, css_path: path };
+}
+"""
+
+# 单个元素的有效性规则（check(el) → 元信息或 null）：完整扫描与缓存复验共用
+CANDIDATE_CHECK_FN = r"""
+const submitKeywords = ['submit', 'login', 'log in', 'sign in', 'register',
+                        'send', 'save', 'confirm', 'checkout', 'buy', 'order'];
+// 纯前端交互按钮（不触发网络请求），不适合 Operation_No_Response
+const pureUiKeywords = [
+    'dismiss', 'close', 'cancel', 'back', 'previous', 'next',
+    'toggle', 'show', 'hide', 'expand', 'collapse',
+    'help', 'getting started', 'tutorial', 'tour', 'welcome',
+    'cookie', 'accept', 'decline', 'agree', 'privacy',
+    'notification', 'alert', 'modal', 'dialog', 'popup'];
+const skipLabels = ['language', 'theme', 'dark mode', 'accessibility',
+                    'open menu', 'close menu', 'toggle menu'];
+const oauthKeywords = ['google', 'facebook', 'twitter', 'github', 'oauth',
+                       'sign in with', 'log in with', 'continue with', 'linkedin'];
+const siteNameKeywords = ['owasp', 'juice shop', 'juice-shop'];
+const interactionAttrs = ['onclick', 'role', 'data-action', 'ng-click', '@click', 'v-on:click'];
+const checkoutKeywords = ['checkout', 'check out', 'proceed', 'place order', 'buy now'];
+const emptyIndicators = [
+    'your basket is empty', 'your cart is empty', 'no items in cart',
+    'total price: 0', 'total: $0', 'total: 0', '0 items', 'cart (0)',
+    'basket (0)', 'empty cart', 'nothing in your cart'];
+
+let pageText = null;
+const getPageText = () => {
+    if (pageText === null) pageText = ((document.body && document.body.innerText) || '').toLowerCase();
+    return pageText;
+};
+const has = (str, kws) => kws.some(kw => str.includes(kw));
+
+function describe(el) {
+    const r = el.getBoundingClientRect();
+    const rawType = (typeof el.type === 'string') ? el.type : (el.getAttribute('type') || '');
+    return {
+        tag: el.tagName.toLowerCase(),
+        text: (el.innerText || '').trim().toLowerCase(),
+        aria_label: (el.getAttribute('aria-label') || '').toLowerCase(),
+        cls: (el.getAttribute('class') || '').toLowerCase(),
+        id: (el.getAttribute('id') || '').toLowerCase(),
+        type: rawType.toLowerCase(),
+        rect: { x: r.x, y: r.y, width: r.width, height: r.height },
+    };
+}
+
+function inTopToolbar(el) {
+    let p = el.parentElement;
+    let depth = 0;
+    while (p && depth < 5) {
+        const tag = p.tagName.toLowerCase();
+        const cls = (p.getAttribute('class') || '').toLowerCase();
+        // 只检查顶部工具栏（mat-toolbar）
+        if (cls.includes('mat-toolbar') && !cls.includes('mat-toolbar-row')) return true;
+        // 如果遇到主内容区域，停止检查
+        if (cls.includes('mat-sidenav-content') || cls.includes('main-content') ||
+            tag === 'main' || cls.includes('page-content')) return false;
+        p = p.parentElement;
+        depth++;
+    }
+    return false;
+}
+
+// 空状态按钮（如空购物车的 Checkout 按钮）
+function isEmptyStateButton(el, m, style) {
+    const text = (el.textContent || '').toLowerCase();
+    if (!checkoutKeywords.some(kw => text.includes(kw) || m.aria_label.includes(kw))) return false;
+    if (emptyIndicators.some(ind => getPageText().includes(ind))) return true;
+    return parseFloat(style.opacity) < 0.6 || style.cursor === 'not-allowed';
+}
+
+// 允许 disabled 的提交按钮（我们可以先填充表单）
+function check(el) {
+    const m = describe(el);
+    const style = getComputedStyle(el);
+    // 基本可见性检查
+    if ((m.rect.width === 0 && m.rect.height === 0) || el.getClientRects().length === 0) return null;
+    if (style.display === 'none' || style.visibility === 'hidden') return null;
+
+    const isSubmit = has(m.aria_label, submitKeywords) || has(m.text, submitKeywords) || has(m.cls, submitKeywords)
+        || m.type === 'submit' || el.hasAttribute('mat-raised-button');
+    // disabled 元素只有提交按钮才允许
+    if (el.matches(':disabled') && !isSubmit) return null;
+
+    // 1. 排除图片元素
+    if (m.tag === 'img') return null;
+    // 2. 排除纯展示性的span/div
+    if ((m.tag === 'span' || m.tag === 'div') && !interactionAttrs.some(a => el.getAttribute(a))) return null;
+    // 2.5 排除纯前端交互按钮
+    if (has(`${m.text} ${m.aria_label} ${m.cls} ${m.id}`, pureUiKeywords)) return null;
+    // 3. 排除导航logo/品牌链接
+    if (has(m.cls, ['logo', 'brand', 'navbar-brand'])) return null;
+    // 4. 排除语言切换器、菜单按钮等辅助功能
+    if (has(m.aria_label, skipLabels) || m.text === 'menu') return null;
+    // 5. 排除外部OAuth登录按钮
+    const combinedText = `${m.text} ${m.aria_label} ${m.cls}`;
+    if (has(combinedText, oauthKeywords)) return null;
+    // 6. 排除网站 Logo/标题按钮
+    if (has(m.text, siteNameKeywords)) return null;
+    // 7. 顶部工具栏内的 Account/菜单/语言按钮
+    if (inTopToolbar(el) && has(combinedText, ['account', 'menu', 'language'])) return null;
+    // 8. 空状态按钮
+    if (isEmptyStateButton(el, m, style)) return null;
+    // 9. CSS可见性检查（提交按钮放宽 pointer-events 限制）
+    if (style.pointerEvents === 'none' && !isSubmit) return null;
+    if (parseFloat(style.opacity || '1') < 0.2) return null;
+    if ((el.getAttribute('aria-hidden') || '').toLowerCase() === 'true') return null;
+    // 10. 尺寸检查
+    if (m.rect.width < 24 || m.rect.height < 24) return null;
+    return m;
+}
+"""
+
+# 单次页面内扫描：执行所有选择器、按 DOM 节点去重、应用全部有效性规则，
+# 一次性返回元素句柄 + 优先级 + 元信息（替代逐选择器 find_elements + 逐元素 get_attribute）
+CANDIDATE_SCAN_JS = DOM_FINGERPRINT_FN + ELEMENT_IDENTITY_FN + r"""
+const [tiers, networkSelectors, skipKeywords, actionKeywords] = arguments;
+""" + CANDIDATE_CHECK_FN + r"""
+
+const verdicts = new Map();
+const validate = (el) => {
+    if (!verdicts.has(el)) {
+        let m = null;
+        try { m = check(el); } catch (e) {}
+        verdicts.set(el, m);
+    }
+    return verdicts.get(el);
+};
+const query = (sel) => { try { return document.querySelectorAll(sel); } catch (e) { return []; } };
+const identities = new Map();
+const identify = (el) => {
+    if (!identities.has(el)) identities.set(el, __iceStamp(el));
+    return identities.get(el);
+};
+const pack = (el, m, extra) => Object.assign({
+    element: el, tag: m.tag, text: m.text.slice(0, 100), aria_label: m.aria_label.slice(0, 120),
+    class: m.cls.slice(0, 120), id: m.id.slice(0, 120), rect: m.rect }, identify(el), extra);
+
+// 通用候选：高 → 中 → 低，先出现的优先级生效
+const seen = new Set();
+const base = [];
+tiers.forEach((sels, tier) => {
+    for (const sel of sels) {
+        for (const el of query(sel)) {
+            if (seen.has(el)) continue;
+            seen.add(el);
+            const m = validate(el);
+            if (m) base.push(pack(el, m, { tier: tier }));
+        }
+    }
+});
+
+// 网络触发候选：共享同一份有效性判定
+const seenNet = new Set();
+const network = [];
+for (const sel of networkSelectors) {
+    for (const el of query(sel)) {
+        if (seenNet.has(el)) continue;
+        seenNet.add(el);
+        const m = validate(el);
+        if (!m) continue;
+        if (skipKeywords.some(kw => m.text.includes(kw) || m.aria_label.includes(kw) || m.cls.includes(kw))) continue;
+        const hinted = actionKeywords.some(kw => m.text.includes(kw) || m.aria_label.includes(kw) || m.cls.includes(kw));
+        const item = pack(el, m, { hinted: hinted });
+        if (hinted) network.unshift(item);  // 高优先级放前面
+        else network.push(item);
+    }
+}
+return { base: base, network: network, fingerprint: __iceFingerprint() };
+"""
+
+# 缓存复验：指纹一致时按 data-ice-id / CSS path 一次性重新定位全部缓存元素，
+# 并对每个元素重新应用完整扫描的有效性规则（指纹只看标签序列，disabled / hidden 等属性切换不会改变它）
+# arguments = [expected_fingerprint, [[ice_id, css_path, is_network], ...], skip_keywords]
+CANDIDATE_REVALIDATE_JS = DOM_FINGERPRINT_FN + r"""
+const [expected, entries, skipKeywords] = arguments;
+const fingerprint = __iceFingerprint();
+if (fingerprint !== expected) return { ok: false, fingerprint: fingerprint };
+""" + CANDIDATE_CHECK_FN + r"""
+const elements = [];
+for (const [iceId, path, isNetwork] of entries) {
+    let el = document.querySelector('[data-ice-id="' + iceId + '"]');
+    if (!el) {
+        try { el = document.querySelector(path); } catch (e) { el = null; }
+    }
+    if (!el) return { ok: false, fingerprint: fingerprint, missing: path };
+    let m = null;
+    try { m = check(el); } catch (e) {}
+    if (m && isNetwork && skipKeywords.some(kw => m.text.includes(kw) || m.aria_label.includes(kw) || m.cls.includes(kw))) m = null;
+    if (!m) return { ok: false, fingerprint: fingerprint, rejected: path };
+    el.setAttribute('data-ice-id', iceId);
+    elements.push(el);
+}
+return { ok: true, fingerprint: fingerprint, elements: elements };
+"""
+
+
+def scan_candidates(driver) -> Dict[str, List[Dict[str, Any]]]:
+    """一次页面内扫描同时得到通用候选与网络触发候选
+
+    Returns:
+        {
+            'base':    [{'element', 'tier', 'ice_id', 'css_path', 'tag', 'text', 'aria_label', 'class', 'id', 'rect'}, ...],
+            'network': [{'element', 'hinted', ...}, ...],
+            'fingerprint': str,   # DOM 结构指纹
+        }
+        tier: 0=高优先级 / 1=中 / 2=低
+    """
+    try:
+        result = driver.execute_script(
+            CANDIDATE_SCAN_JS,
+            [HIGH_PRIORITY_SELECTORS, MEDIUM_PRIORITY_SELECTORS, LOW_PRIORITY_SELECTORS],
+            NETWORK_SELECTORS,
+            NETWORK_SKIP_KEYWORDS,
+            NETWORK_ACTION_KEYWORDS,
+        ) or {}
+        return {
+            "base": result.get("base") or [],
+            "network": result.get("network") or [],
+            "fingerprint": result.get("fingerprint"),
+        }
+    except Exception as e:
+        print(f"[!] Candidate scan failed: {e}")
+        return {"base": [], "network": [], "fingerprint": None}
+
+
+def _order_base(elements: List, prioritize_network: bool) -> List:
+    # 打乱时保持优先级分组：前50%保持原顺序（高优先级），后50%打乱
+    if prioritize_network and len(elements) > 10:
+        mid = len(elements) // 2
+        tail = elements[mid:]
+        random.shuffle(tail)
+        elements = elements[:mid] + tail
+    return elements
+
+
+def get_candidate_sets(driver, prioritize_network=True) -> Tuple[List, List]:
+    """同一次扫描返回 (通用候选, 网络触发候选)"""
+    scan = scan_candidates(driver)
+    base = _order_base([c["element"] for c in scan["base"]], prioritize_network)
+    network = [c["element"] for c in scan["network"]]
+    return base, network
+
+
 def get_candidates(driver, prioritize_network=True) -> List:
     """获取可交互元素，优先选择会触发网络请求的元素"""
-    # 高优先级：通常会触发网络请求的元素（权重3）
-    high_priority_selectors = [
-        # 表单提交
-        "button[type='submit']",
-        "input[type='submit']",
-        "form button",
-        "button[class*='submit']",
-        # Angular Material 表单按钮
-        "[mat-raised-button]",
-        "[mat-flat-button]",
-        "button[mat-button]",
-        # 功能按钮
-        "button[class*='search']",
-        "button[class*='login']",
-        "button[class*='register']",
-        "button[class*='add']",
-        "button[class*='save']",
-        "button[class*='delete']",
-        "button[class*='confirm']",
-        "button[class*='buy']",
-        "button[class*='checkout']",
-        "button[class*='order']",
-        "button[class*='send']",
-        "button[class*='post']",
-        # 导航到表单的链接
-        "a[href*='login']",
-        "a[href*='register']",
-        "a[href*='checkout']",
-        "a[href*='cart']",
-        # 有data属性的交互元素
-        "[data-action]",
-        "[onclick*='fetch']",
-        "[onclick*='ajax']",
-        "[onclick*='submit']",
-    ]
-    
-    # 中优先级：可能触发请求的元素（权重2）
-    medium_priority_selectors = [
-        "button:not([type='button'])",  # 默认type="submit"
-        "[role='button']",
-        "button[class*='btn']",
-        "a[class*='btn']",
-        # Angular Material 图标按钮
-        "[mat-icon-button]",
-    ]
-    
-    # 低优先级：可点击链接
-    low_priority_selectors = [
-        "a[href]:not([href='#']):not([href='javascript:void(0)']):not([href^='mailto'])",
-    ]
-    
-    # 收集元素并标记优先级
-    high_elems = []
-    medium_elems = []
-    low_elems = []
-    seen_ids = set()  # 去重
-    
-    def add_unique(elem, target_list):
-        """去重添加元素"""
-        try:
-            elem_id = id(elem)
-            if elem_id not in seen_ids:
-                seen_ids.add(elem_id)
-                target_list.append(elem)
-        except:
-            pass
-    
-    for sel in high_priority_selectors:
-        try:
-            for el in driver.find_elements(By.CSS_SELECTOR, sel):
-                add_unique(el, high_elems)
-        except Exception:
-            continue
-    
-    for sel in medium_priority_selectors:
-        try:
-            for el in driver.find_elements(By.CSS_SELECTOR, sel):
-                add_unique(el, medium_elems)
-        except Exception:
-            continue
-    
-    for sel in low_priority_selectors:
-        try:
-            for el in driver.find_elements(By.CSS_SELECTOR, sel):
-                add_unique(el, low_elems)
-        except Exception:
-            continue
-    
-    # 合并（高优先级在前）
-    all_elems = high_elems + medium_elems + low_elems
-    
-    candidates = []
-    for el in all_elems:
-        # 允许 disabled 的提交按钮（我们可以先填充表单）
-        if not _is_valid_candidate(driver, el, allow_disabled_submit=True):
-            continue
-        candidates.append(el)
-    
-    # 如果优先选择网络元素，将高优先级元素放前面（已经是了）
-    # 打乱时保持优先级分组
-    if prioritize_network and len(candidates) > 10:
-        # 前50%保持原顺序（高优先级），后50%打乱
-        mid = len(candidates) // 2
-        tail = candidates[mid:]
-        random.shuffle(tail)
-        candidates = candidates[:mid] + tail
-    
-    return candidates
+    return get_candidate_sets(driver, prioritize_network)[0]
 
 
 def get_network_triggering_candidates(driver) -> List:
     """专门获取会触发网络请求的元素，用于网络类Bug注入"""
-    # 最可能触发网络请求的选择器
-    network_selectors = [
-        # 表单提交
-        "button[type='submit']",
-        "input[type='submit']",
-        "form button:not([type='button'])",
-        # Angular Material 表单按钮
-        "[mat-raised-button]",
-        "[mat-flat-button]",
-        "button[mat-button]",
-        # 登录/注册
-        "button[class*='login']",
-        "button[class*='sign']",
-        "button[class*='register']",
-        # 购物/交易
-        "button[class*='add-to-cart']",
-        "button[class*='buy']",
-        "button[class*='checkout']",
-        "button[class*='order']",
-        "button[class*='purchase']",
-        # 搜索
-        "button[class*='search']",
-        "input[type='search'] ~ button",
-        # 数据操作
-        "button[class*='save']",
-        "button[class*='delete']",
-        "button[class*='update']",
-        "button[class*='send']",
-        "button[class*='post']",
-        "button[class*='submit']",
-        # API触发
-        "[data-action]",
-        "[onclick*='fetch']",
-        "[onclick*='ajax']",
-        "[onclick*='http']",
-        "[onclick*='api']",
-        # 有明确文本暗示的按钮
-        "button",  # 会在后面过滤
-    ]
-    
-    seen_ids = set()
-    candidates = []
-    
-    for sel in network_selectors:
-        try:
-            for el in driver.find_elements(By.CSS_SELECTOR, sel):
-                elem_id = id(el)
-                if elem_id in seen_ids:
-                    continue
-                seen_ids.add(elem_id)
-                
-                # 允许 disabled 的提交按钮
-                if not _is_valid_candidate(driver, el, allow_disabled_submit=True):
-                    continue
-                
-                # 额外过滤：排除明显不触发网络的按钮
-                text = (el.text or "").strip().lower()
-                aria_label = (el.get_attribute("aria-label") or "").lower()
-                elem_class = (el.get_attribute("class") or "").lower()
-                
-                # 排除：切换、显示/隐藏、菜单等UI交互
-                skip_keywords = [
-                    "toggle", "show", "hide", "display", "password",
-                    "menu", "dropdown", "collapse", "expand", "close",
-                    "dismiss", "cancel", "back", "previous", "next",
-                    "language", "theme", "dark", "light",
-                    # 新增：排除外部OAuth登录（会跳转到外部网站）
-                    "google", "facebook", "twitter", "github", "oauth",
-                    "sign in with", "log in with", "continue with"
-                ]
-                
-                should_skip = False
-                for kw in skip_keywords:
-                    if kw in text or kw in aria_label or kw in elem_class:
-                        should_skip = True
-                        break
-                
-                if should_skip:
-                    continue
-                
-                # 优先：有明确网络操作暗示的文本
-                action_keywords = [
-                    "submit", "login", "sign", "register", "send",
-                    "save", "add", "buy", "order", "checkout", "pay",
-                    "search", "delete", "update", "post", "confirm"
-                ]
-                
-                has_action_hint = any(
-                    kw in text or kw in aria_label or kw in elem_class
-                    for kw in action_keywords
-                )
-                
-                if has_action_hint:
-                    candidates.insert(0, el)  # 高优先级放前面
-                else:
-                    candidates.append(el)
-        except Exception:
-            continue
-    
-    return candidates
-
-
-def _is_valid_candidate(driver, el, allow_disabled_submit=False) -> bool:
-    """检查元素是否是有效的候选
-    
-    Args:
-        driver: Selenium WebDriver
-        el: 要检查的元素
-        allow_disabled_submit: 是否允许 disabled 的提交按钮（用于表单场景）
+    return get_candidate_sets(driver)[1]
+
+
+class CandidateCache:
+    """按路由缓存候选元素
+
+    首次扫描后记录每个候选的稳定标识（CSS path + data-ice-id）与 DOM 结构指纹；
+    同一路由重载后只需一次复验查询即可重新拿到元素句柄，指纹变化或元素缺失时回退到完整扫描。
     """
-    try:
-        # 基本可见性检查
-        if not el.is_displayed():
-            return False
-        
-        # 检查是否是提交按钮
-        is_submit_button = False
-        aria_label = (el.get_attribute("aria-label") or "").lower()
-        elem_text = (el.text or "").strip().lower()
-        elem_class = (el.get_attribute("class") or "").lower()
-        elem_type = (el.get_attribute("type") or "").lower()
-        
-        submit_keywords = ["submit", "login", "log in", "sign in", "register", 
-                          "send", "save", "confirm", "checkout", "buy", "order"]
-        if any(kw in aria_label or kw in elem_text or kw in elem_class for kw in submit_keywords):
-            is_submit_button = True
-        if elem_type == "submit":
-            is_submit_button = True
-        if el.get_attribute("mat-raised-button") is not None:
-            # mat-raised-button 通常是主要操作按钮
-            is_submit_button = True
-        
-        # 如果是 disabled 元素
-        if not el.is_enabled():
-            # 只有当 allow_disabled_submit=True 且是提交按钮时才允许
-            if not (allow_disabled_submit and is_submit_button):
-                return False
-        
-        tag = el.tag_name.lower()
-        
-        # 1. 排除图片元素
-        if tag == "img":
-            return False
-        
-        # 2. 排除纯展示性的span/div
-        if tag in ("span", "div"):
-            has_interaction = False
-            for attr in ["onclick", "role", "data-action", "ng-click", "@click", "v-on:click"]:
-                if el.get_attribute(attr):
-                    has_interaction = True
-                    break
-            if not has_interaction:
-                return False
-        
-        # 获取元素属性
-        elem_id = (el.get_attribute("id") or "").lower()
-        
-        # 🆕 2.5 排除纯前端交互按钮（不触发网络请求）
-        # 这些按钮只是关闭弹窗、切换UI状态，不适合 Operation_No_Response
-        pure_ui_keywords = [
-            "dismiss", "close", "cancel", "back", "previous", "next",
-            "toggle", "show", "hide", "expand", "collapse",
-            "help", "getting started", "tutorial", "tour", "welcome",
-            "cookie", "accept", "decline", "agree", "privacy",
-            "notification", "alert", "modal", "dialog", "popup"
-        ]
-        combined = f"{elem_text} {aria_label} {elem_class} {elem_id}"
-        if any(kw in combined for kw in pure_ui_keywords):
-            return False
-        
-        # 3. 排除导航logo/品牌链接
-        if any(kw in elem_class for kw in ["logo", "brand", "navbar-brand"]):
-            return False
-        
-        # 4. 排除语言切换器、菜单按钮等辅助功能
-        skip_labels = ["language", "theme", "dark mode", "accessibility", 
-                       "open menu", "close menu", "toggle menu"]
-        if any(kw in aria_label for kw in skip_labels):
-            return False
-        # 排除只显示"menu"文本的按钮
-        if elem_text == "menu":
-            return False
-        
-        # 5. 排除外部OAuth登录按钮（会跳转到外部网站）
-        oauth_keywords = ["google", "facebook", "twitter", "github", "oauth",
-                          "sign in with", "log in with", "continue with", "linkedin"]
-        combined_text = f"{elem_text} {aria_label} {elem_class}"
-        if any(kw in combined_text for kw in oauth_keywords):
-            return False
-        
-        # 6. 排除网站 Logo/标题按钮 (通常只会导航回主页)
-        site_name_keywords = ["owasp", "juice shop", "juice-shop"]
-        if any(kw in elem_text for kw in site_name_keywords):
-            return False
-        
-        # 7. 排除导航栏内的纯导航按钮
-        # 检查是否是 mat-toolbar 内的按钮（Angular Material顶部工具栏）
-        in_top_toolbar = driver.execute_script("""
-            const el = arguments[0];
-            let p = el.parentElement;
-            let depth = 0;
-            while (p && depth < 5) {
-                const tag = p.tagName.toLowerCase();
-                const cls = (p.className || '').toLowerCase();
-                // 只检查顶部工具栏（mat-toolbar）
-                if (cls.includes('mat-toolbar') && !cls.includes('mat-toolbar-row')) {
-                    return true;
-                }
-                // 如果遇到主内容区域，停止检查
-                if (cls.includes('mat-sidenav-content') || cls.includes('main-content') || 
-                    tag === 'main' || cls.includes('page-content')) {
-                    return false;
-                }
-                p = p.parentElement;
-                depth++;
-            }
-            return false;
-        """, el)
-        
-        if in_top_toolbar:
-            # 在顶部工具栏内，排除 Account 等打开菜单的按钮
-            skip_toolbar_keywords = ["account", "menu", "language"]
-            if any(kw in combined_text for kw in skip_toolbar_keywords):
-                return False
-        
-        # 8. 🆕 检测"空状态"按钮（如空购物车的 Checkout 按钮）
-        # 这些按钮虽然存在但实际上不会触发任何有意义的操作
-        is_empty_state_button = driver.execute_script("""
-            const el = arguments[0];
-            const text = (el.textContent || '').toLowerCase();
-            const ariaLabel = (el.getAttribute('aria-label') || '').toLowerCase();
-            
-            // 检查是否是购物车/结账相关按钮
-            const checkoutKeywords = ['checkout', 'check out', 'proceed', 'place order', 'buy now'];
-            const isCheckoutButton = checkoutKeywords.some(kw => text.includes(kw) || ariaLabel.includes(kw));
-            
-            if (isCheckoutButton) {
-                // 检查页面上是否有"空"状态指示
-                const pageText = document.body.innerText.toLowerCase();
-                const emptyIndicators = [
-                    'your basket is empty',
-                    'your cart is empty', 
-                    'no items in cart',
-                    'total price: 0',
-                    'total: $0',
-                    'total: 0',
-                    '0 items',
-                    'cart (0)',
-                    'basket (0)',
-                    'empty cart',
-                    'nothing in your cart'
-                ];
-                if (emptyIndicators.some(ind => pageText.includes(ind))) {
-                    return true;  // 是空状态按钮
-                }
-                
-                // 检查是否有 disabled 样式
-                const style = getComputedStyle(el);
-                if (style.opacity < 0.6 || style.cursor === 'not-allowed') {
-                    return true;
-                }
-            }
-            
-            return false;
-        """, el)
-        
-        if is_empty_state_button:
-            return False  # 排除空状态按钮
-        
-        # 9. CSS可见性检查
-        style = driver.execute_script(
-            """
-            const el = arguments[0];
-            const s = getComputedStyle(el);
-            return {
-              display: s.display,
-              visibility: s.visibility,
-              opacity: parseFloat(s.opacity || '1'),
-              pointerEvents: s.pointerEvents,
-              ariaHidden: el.getAttribute('aria-hidden') || ''
-            };
-            """,
-            el,
-        )
-        if style.get("display") == "none" or style.get("visibility") == "hidden":
-            return False
-        # 对于提交按钮，放宽 pointer-events 限制（disabled按钮通常有 pointer-events: none）
-        if style.get("pointerEvents") == "none":
-            if not (allow_disabled_submit and is_submit_button):
-                return False
-        if style.get("opacity", 1) is not None and style.get("opacity", 1) < 0.2:
-            return False
-        if style.get("ariaHidden", "").lower() == "true":
-            return False
-
-        # 9. 尺寸检查
-        rect = el.rect
-        if rect.get("width", 0) < 24 or rect.get("height", 0) < 24:
-            return False
-        
-        return True
-    except Exception:
-        return False
+
+    def __init__(self):
+        self._routes: Dict[str, Dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self, route: str | None = None) -> None:
+        if route is None:
+            self._routes.clear()
+        else:
+            self._routes.pop(route, None)
+
+    def get_sets(self, driver, route: str, prioritize_network=True) -> Tuple[List, List]:
+        """返回 (通用候选, 网络触发候选)，优先使用缓存"""
+        entry = self._routes.get(route)
+        if entry and entry.get("fingerprint"):
+            try:
+                res = driver.execute_script(CANDIDATE_REVALIDATE_JS, entry["fingerprint"], entry["identities"],
+                                            NETWORK_SKIP_KEYWORDS) or {}
+            except Exception:
+                res = {}
+            if res.get("ok"):
+                elements = res.get("elements") or []
+                if len(elements) == len(entry["identities"]):
+                    self.hits += 1
+                    base = _order_base([elements[i] for i in entry["base_idx"]], prioritize_network)
+                    network = [elements[i] for i in entry["network_idx"]]
+                    return base, network
+            self._routes.pop(route, None)
+
+        self.misses += 1
+        scan = scan_candidates(driver)
+        index: Dict[str, int] = {}
+        identities: List[List[str]] = []
+
+        def slot(c: Dict[str, Any], network: bool) -> int:
+            key = c.get("ice_id", "")
+            if key not in index:
+                index[key] = len(identities)
+                identities.append([key, c.get("css_path", ""), False])
+            if network:
+                identities[index[key]][2] = True  # 复验时额外应用网络候选的关键词过滤
+            return index[key]
+
+        self._routes[route] = {
+            "fingerprint": scan.get("fingerprint"),
+            "identities": identities,
+            "base_idx": [slot(c, False) for c in scan["base"]],
+            "network_idx": [slot(c, True) for c in scan["network"]],
+        }
+        base = _order_base([c["element"] for c in scan["base"]], prioritize_network)
+        network = [c["element"] for c in scan["network"]]
+        return base, network
 
 
 def discover_internal_links(driver, base_url: str, limit: int = LINK_DISCOVERY_LIMIT) -> List[str]:
@@ -0,0 +1,112 @@
+"""
+窗口化 SSIM - 盒滤波 / 积分图实现
+
+与 skimage.metrics.structural_similarity 的默认灰度参数数值一致：
+    win_size=7 的均匀窗口，K1=0.01，K2=0.03，样本协方差（N / (N - 1)），
+    结果为去掉边缘 (win_size - 1) / 2 像素后的 SSIM 图均值。
+
+边缘被裁掉意味着只需要“完整落在图像内”的窗口，这些窗口的和用积分图（或 cv2.boxFilter）
+一次算出，不需要任何边界填充。按行分块处理（块之间重叠 win_size - 1 行），
+中间数组只有一块大小；逐元素公式可在 float32 上计算（窗口求和始终用 float64 累加）。
+"""
+import numpy as np
+
+try:
+    import cv2
+    HAS_CV2 = True
+except ImportError:
+    HAS_CV2 = False
+
+from .config import SSIM_TILE_ROWS
+
+K1 = 0.01
+K2 = 0.03
+
+
+def _integral(a: np.ndarray) -> np.ndarray:
+    """积分图（首行 / 首列补零），float64 累加"""
+    out = np.zeros((a.shape[0] + 1, a.shape[1] + 1), dtype=np.float64)
+    np.cumsum(a, axis=0, dtype=np.float64, out=out[1:, 1:])
+    np.cumsum(out[1:, 1:], axis=1, out=out[1:, 1:])
+    return out
+
+
+def _window_means(a: np.ndarray, win: int, dtype) -> np.ndarray:
+    """所有完整 win x win 窗口的均值，输出尺寸 (H - win + 1, W - win + 1)"""
+    if HAS_CV2:
+        # 归一化盒滤波：浮点输入时 OpenCV 内部用 double 累加
+        pad = win // 2
+        m = cv2.boxFilter(a, cv2.CV_64F if dtype == np.float64 else cv2.CV_32F, (win, win),
+                          normalize=True, borderType=cv2.BORDER_REFLECT)
+        return m[pad:a.shape[0] - pad, pad:a.shape[1] - pad]
+    ii = _integral(a)
+    s = ii[win:, win:] - ii[:-win, win:] - ii[win:, :-win] + ii[:-win, :-win]
+    s /= win * win
+    return s.astype(dtype, copy=False)
+
+
+def _ssim_sum(x: np.ndarray, y: np.ndarray, win: int, c1: float, c2: float, dtype) -> float:
+    """一块输入上 SSIM 图（仅完整窗口）的总和
+
+    SSIM = (2·ux·uy + C1)(2·vxy + C2) / ((ux² + uy² + C1)(vx + vy + C2))，
+    vx + vy 合并计算，全部中间量原地更新以减少临时数组。
+    """
+    n = win * win
+    cov_norm = n / (n - 1.0)
+    ux = _window_means(x, win, dtype)
+    uy = _window_means(y, win, dtype)
+    uxx = _window_means(x * x, win, dtype)
+    uyy = _window_means(y * y, win, dtype)
+    uxy = _window_means(x * y, win, dtype)
+
+    num = ux * uy
+    uxy -= num
+    uxy *= 2 * cov_norm
+    uxy += c2                   # 2·vxy + C2
+    num *= 2
+    num += c1
+    num *= uxy
+
+    ux *= ux
+    uy *= uy
+    uxx += uyy
+    uxx -= ux
+    uxx -= uy
+    uxx *= cov_norm
+    uxx += c2                   # vx + vy + C2
+    ux += uy
+    ux += c1                    # ux² + uy² + C1
+    ux *= uxx
+    num /= ux
+    return float(np.sum(num, dtype=np.float64))
+
+
+def structural_similarity(img1: np.ndarray, img2: np.ndarray, win_size: int = 7, data_range: float = 255.0,
+                          dtype=np.float32, tile_rows: int = SSIM_TILE_ROWS) -> float:
+    """两张灰度图的平均 SSIM
+
+    Args:
+        img1, img2: 同尺寸二维数组（uint8 或浮点灰度）
+        win_size: 奇数窗口边长，图像两边都不能小于它
+        dtype: 逐元素计算使用的精度（np.float32 / np.float64）
+        tile_rows: 每块输出的行数（<= 0 表示整幅一次计算）
+    """
+    if img1.shape != img2.shape or img1.ndim != 2:
+        raise ValueError("SSIM expects two 2-D images of the same shape")
+    if win_size % 2 == 0 or min(img1.shape) < win_size:
+        raise ValueError("win_size must be odd and not larger than the image")
+
+    c1 = (K1 * data_range) ** 2
+    c2 = (K2 * data_range) ** 2
+    x = img1.astype(dtype, copy=False)
+    y = img2.astype(dtype, copy=False)
+    out_rows = x.shape[0] - win_size + 1
+    out_cols = x.shape[1] - win_size + 1
+    step = out_rows if tile_rows <= 0 else tile_rows
+
+    total = 0.0
+    for r0 in range(0, out_rows, step):
+        r1 = min(out_rows, r0 + step)
+        # 输出行 [r0, r1) 对应输入行 [r0, r1 + win_size - 1)
+        total += _ssim_sum(x[r0:r1 + win_size - 1], y[r0:r1 + win_size - 1], win_size, c1, c2, dtype)
+    return total / (out_rows * out_cols)
@@ -0,0 +1,63 @@
+"""
+页面文本相似度 - 行哈希对比（线性时间）
+
+_detect_visual_evidence 需要点击前后 innerText 的相似度。difflib.SequenceMatcher
+在 5000 字符上最坏是平方级，且只给出一个比值。这里按行切分、用行的哈希做多重集匹配：
+
+    1. 两边完全相同的行直接配对（Counter，O(n)）
+    2. 剩下的行就是新增 / 删除的行；两边剩余文本都不长时再做一次字符级匹配，
+       使“行内改了几个字”的情况与 SequenceMatcher 的比值保持接近
+    3. ratio = 2 * 匹配字符数 / 两边总字符数（与 SequenceMatcher.ratio 的定义一致）
+
+行的顺序不参与匹配（内容移动不算变化），对“页面是否变了、变了什么”的判断足够。
+"""
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Dict, Any, List
+
+from .config import TEXT_DIFF_REFINE_LIMIT
+
+
+def line_diff(a: str, b: str, refine_limit: int = TEXT_DIFF_REFINE_LIMIT) -> Dict[str, Any]:
+    """对比两段文本
+
+    Returns:
+        {'ratio': 0-1, 'added': [点击后新增的行], 'removed': [点击后消失的行]}
+        added / removed 保持原文顺序，不含空白行
+    """
+    a = a or ""
+    b = b or ""
+    if a == b:
+        return {"ratio": 1.0, "added": [], "removed": []}
+    lines_a = a.split("\n")
+    lines_b = b.split("\n")
+
+    # 每行权重 = 字符数 + 换行符，总权重 = len(text) + 1，两边相同时比值恰为 1
+    available = Counter(lines_b)
+    matched = 0
+    removed: List[str] = []
+    for line in lines_a:
+        if available[line] > 0:
+            available[line] -= 1
+            matched += len(line) + 1
+        else:
+            removed.append(line)
+    added: List[str] = []
+    for line in lines_b:
+        if available[line] > 0:
+            available[line] -= 1
+            added.append(line)
+
+    if removed and added:
+        rest_a = "\n".join(removed)
+        rest_b = "\n".join(added)
+        if len(rest_a) <= refine_limit and len(rest_b) <= refine_limit:
+            blocks = SequenceMatcher(None, rest_a, rest_b, autojunk=False).get_matching_blocks()
+            matched += sum(block.size for block in blocks)
+
+    total = len(a) + len(b) + 2
+    return {
+        "ratio": min(1.0, 2.0 * matched / total),
+        "added": [line.strip() for line in added if line.strip()],
+        "removed": [line.strip() for line in removed if line.strip()],
+    }
@@ -0,0 +1,91 @@
+"""
+后台帧写入 - 有界队列 + 写入线程池
+
+PNG 编码（1920x1080 一帧数十毫秒）和落盘原本在驱动 Chrome 的线程上同步执行，
+期间浏览器空闲。FrameWriter 把“编码 + 写文件”交给后台线程（Pillow / zlib 编码时释放 GIL），
+驱动线程只负责截图，下一个样本的采集与上一个样本的编码重叠进行。
+
+- 队列有界：写入跟不上时 submit 阻塞（背压），内存占用不会无限增长
+- flush() 等待已提交的帧全部落盘；close() 在 flush 后结束线程，并注册为 atexit
+  （multiprocessing 子进程不执行 atexit，worker 退出前需显式 close）
+"""
+import atexit
+import queue
+import threading
+from typing import Any, Callable, List
+
+import numpy as np
+from PIL import Image
+
+from .config import FRAME_WRITER_THREADS, FRAME_WRITER_QUEUE
+
+
+def write_frame(path: str, frame: Any) -> str:
+    """把一帧写入磁盘：PNG 字节原样写入，数组 / PIL 图像编码后写入"""
+    if isinstance(frame, (bytes, bytearray)):
+        with open(path, "wb") as f:
+            f.write(frame)
+    elif isinstance(frame, np.ndarray):
+        Image.fromarray(frame).save(path)
+    else:
+        frame.save(path)
+    return path
+
+
+class FrameWriter:
+    def __init__(self, workers: int = FRAME_WRITER_THREADS, max_pending: int = FRAME_WRITER_QUEUE):
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, max_pending))
+        self._closed = False
+        self._lock = threading.Lock()
+        self.written = 0
+        self.errors: List[str] = []
+        self._threads = [
+            threading.Thread(target=self._run, name=f"frame-writer-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for t in self._threads:
+            t.start()
+        atexit.register(self.close)
+
+    def _run(self) -> None:
+        while True:
+            task = self._queue.get()
+            try:
+                if task is None:
+                    return
+                fn, args, kwargs = task
+                fn(*args, **kwargs)
+                with self._lock:
+                    self.written += 1
+            except Exception as e:
+                with self._lock:
+                    self.errors.append(str(e)[:200])
+                print(f"[!] Frame writer failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    def submit(self, path: str, frame: Any) -> str:
+        """提交一帧（PNG 字节 / RGB 数组 / PIL 图像），队列满时阻塞；返回目标路径"""
+        self.submit_task(write_frame, path, frame)
+        return path
+
+    def submit_task(self, fn: Callable, *args, **kwargs) -> None:
+        """提交任意渲染 + 写入任务（如叠加层绘制后保存）"""
+        if self._closed:
+            fn(*args, **kwargs)
+            return
+        self._queue.put((fn, args, kwargs))
+
+    def flush(self) -> None:
+        """阻塞直到所有已提交的帧写入完成"""
+        self._queue.join()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self.flush()
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
@@ -1,23 +1,54 @@
 import os
+import argparse
 
 from interaction_engine.injectors import InteractionInjector
-from interaction_engine.config import TARGETS, LINK_DISCOVERY_LIMIT, LINK_SAMPLES_PER_PAGE
+from interaction_engine.parallel import run_batch_parallel
+from interaction_engine.profile_store import SiteProfileStore
+from interaction_engine.config import TARGETS, LINK_DISCOVERY_LIMIT, LINK_SAMPLES_PER_PAGE, DEFAULT_WORKERS, NETWORK_BACKEND
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Interaction bug data collection")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("ICE_WORKERS", DEFAULT_WORKERS)),
+                        help="number of parallel Chrome workers (default: ICE_WORKERS or 1)")
+    parser.add_argument("--late-interceptor", action="store_true",
+                        help="inject the network interceptor after readyState instead of at document start")
+    parser.add_argument("--network-backend", choices=["js", "cdp"], default=os.getenv("ICE_NETWORK_BACKEND", NETWORK_BACKEND),
+                        help="network fault backend: page-JS fetch/XHR patching or CDP Fetch domain")
+    parser.add_argument("--refresh-profiles", action="store_true",
+                        help="discard cached site capability profiles before collecting")
+    args = parser.parse_args()
+
     debug = os.getenv("ICE_DEBUG", "0") == "1"
     samples_per_site = 1 if debug else 6
     enable_discovery = False if debug else True
     link_limit = 0 if debug else LINK_DISCOVERY_LIMIT
     link_samples = 0 if debug else LINK_SAMPLES_PER_PAGE
-
-    injector = InteractionInjector(
+    injector_kwargs = dict(
         headless=True,
         max_wait=10 if debug else 15,
         use_js_interceptor=True,
         show_overlay_flag=True,
         debug_mode=debug,
+        interceptor_at_document_start=not args.late_interceptor,
+        network_backend=args.network_backend,
     )
+    if args.refresh_profiles:
+        SiteProfileStore().invalidate()
+
+    if args.workers > 1:
+        run_batch_parallel(
+            TARGETS,
+            workers=args.workers,
+            samples_per_site=samples_per_site,
+            enable_discovery=enable_discovery,
+            link_limit=link_limit,
+            link_samples=link_samples,
+            **injector_kwargs,
+        )
+        return
+
+    injector = InteractionInjector(**injector_kwargs)
     try:
         injector.run_batch(
             TARGETS,
@@ -0,0 +1,39 @@
+import json
+
+from interaction_engine.cdp_interceptor import CDPNetworkInterceptor
+
+
+class _FakeWS:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, payload):
+        self.sent.append(json.loads(payload))
+
+
+def _interceptor():
+    interceptor = CDPNetworkInterceptor(driver=None)
+    interceptor._ws = _FakeWS()
+    return interceptor
+
+
+def test_service_worker_gets_fetch_rules_before_it_runs():
+    interceptor = _interceptor()
+    interceptor._error_urls = [(interceptor._compile("/api/"), 500)]
+    interceptor._sync_fetch_domain()
+    interceptor._on_attached({"sessionId": "sw", "waitingForDebugger": True,
+                              "targetInfo": {"type": "service_worker"}})
+    sent = [(m["method"], m.get("sessionId")) for m in interceptor._ws.sent]
+    assert sent == [("Fetch.enable", None), ("Target.setAutoAttach", "sw"),
+                    ("Fetch.enable", "sw"), ("Runtime.runIfWaitingForDebugger", "sw")]
+
+    interceptor._ws.sent.clear()
+    interceptor._on_request_paused({"requestId": "r1", "resourceType": "Fetch",
+                                    "request": {"url": "http://x/api/items", "method": "GET"}}, "sw")
+    reply = interceptor._ws.sent[0]
+    assert (reply["method"], reply["sessionId"], reply["params"]["responseCode"]) == ("Fetch.fulfillRequest", "sw", 500)
+
+    interceptor._ws.sent.clear()
+    interceptor.reset_interceptor()
+    assert [(m["method"], m.get("sessionId")) for m in interceptor._ws.sent] == \
+        [("Fetch.disable", None), ("Fetch.disable", "sw")]
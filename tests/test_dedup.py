@@ -0,0 +1,64 @@
+import random
+
+import numpy as np
+
+from interaction_engine.dedup import BKTree, PHashIndex, hamming, pair_hash
+
+
+def _hashes(n, bits=64, seed=0):
+    rng = random.Random(seed)
+    return [rng.getrandbits(bits) for _ in range(n)]
+
+
+def test_bktree_radius_query_matches_brute_force():
+    hashes = _hashes(300)
+    tree = BKTree()
+    for i, h in enumerate(hashes):
+        tree.add(h, f"s{i}")
+    # 近邻：翻转少量 bit
+    hashes.append(hashes[0] ^ 0b101)
+    tree.add(hashes[-1], "near")
+    for probe in hashes[:20]:
+        for radius in (0, 3, 24):
+            expected = sorted((hamming(probe, h), f"s{i}" if i < 300 else "near")
+                              for i, h in enumerate(hashes) if hamming(probe, h) <= radius)
+            assert tree.query(probe, radius) == expected
+    assert tree.query(hashes[0], 2)[:2] == [(0, "s0"), (2, "near")]
+
+
+def test_bktree_identical_hashes_share_node():
+    tree = BKTree()
+    tree.add(7, "a")
+    tree.add(7, "b")
+    assert tree.query(7, 0) == [(0, "a"), (0, "b")]
+    assert tree.size == 2
+
+
+def test_index_reload_from_jsonl(tmp_path):
+    path = str(tmp_path / "dedup_index.jsonl")
+    index = PHashIndex(path, max_distance=4)
+    index.add("visual", "v1", 0b1111)
+    index.add("visual", "v2", 0b1110)
+    index.add("interaction", "i1", 0b1111)
+
+    reloaded = PHashIndex(path, max_distance=4)
+    assert reloaded.query("visual", 0b1111) == [(0, "v1"), (1, "v2")]
+    assert reloaded.query("interaction", 0b1111) == [(0, "i1")]
+    assert reloaded.duplicate_groups("visual") == [["v1", "v2"]]
+
+    # 另一个实例追加的行在下次查询时读入；写了一半的行跳过
+    index.add("visual", "v3", 0b0)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"kind": "visual", "id": "partial"')
+    assert [i for _, i in reloaded.query("visual", 0b0)] == ["v3", "v2", "v1"]
+
+
+def test_check_and_add_flags_near_duplicates(tmp_path):
+    index = PHashIndex(str(tmp_path / "idx.jsonl"), max_distance=8)
+    rng = np.random.default_rng(0)
+    a = rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)
+    b = rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)
+    assert index.check_and_add("visual", "first", a, b) is None
+    assert index.check_and_add("visual", "copy", a, b, skip=True) == {"id": "first", "distance": 0}
+    assert "copy" not in index.hashes
+    assert index.hashes["first"] == pair_hash(a, b)
@@ -0,0 +1,82 @@
+"""拦截器伪造的 XHR 不能让就绪检测的 inflight 计数挂起（node 中以最小 DOM 桩运行注入脚本）。"""
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from interaction_engine.injectors import NETWORK_INTERCEPTOR_JS
+from interaction_engine.readiness import READINESS_TRACKER_JS
+
+NODE = shutil.which("node")
+
+# 最小浏览器桩：XHR 的真实 send 在下一轮事件循环派发 loadend
+HARNESS = r"""
+globalThis.window = globalThis;
+globalThis.document = { documentElement: null, addEventListener() {} };
+globalThis.MutationObserver = class { observe() {} };
+globalThis.XMLHttpRequest = class extends EventTarget {
+    open(method, url) {}
+    send() { setTimeout(() => this.dispatchEvent(new Event('loadend')), 0); }
+    abort() {}
+};
+console.log = () => {};
+"""
+
+RUN = r"""
+const rules = JSON.parse(process.argv[1]);
+Object.assign(window.__ICE_INTERCEPTOR__, rules);
+const xhr = new XMLHttpRequest();
+xhr.open('GET', '/api/data');
+xhr.send();
+const peak = window.__ICE_READY__.inflight;
+setTimeout(() => {
+    process.stdout.write(JSON.stringify({ peak: peak, inflight: window.__ICE_READY__.inflight }));
+}, 300);
+"""
+
+
+def _run(scripts, rules):
+    source = HARNESS + "".join(scripts) + RUN
+    out = subprocess.run([NODE, "-e", source, json.dumps(rules)],
+                         capture_output=True, text=True, timeout=30, check=True)
+    return json.loads(out.stdout)
+
+
+@pytest.mark.skipif(NODE is None, reason="node not available")
+@pytest.mark.parametrize("rules", [
+    {"error_urls": {"/api/": 500}},
+    {"silent_mode": True},
+    {},
+])
+@pytest.mark.parametrize("tracker_first", [True, False], ids=["document_start", "late_tracker"])
+def test_inflight_returns_to_zero(rules, tracker_first):
+    scripts = [READINESS_TRACKER_JS, NETWORK_INTERCEPTOR_JS]
+    if not tracker_first:
+        scripts.reverse()
+    result = _run(scripts, rules)
+    assert result["inflight"] == 0
+    if not rules:
+        # 未被拦截的请求照常计数
+        assert result["peak"] == 1
+
+
+class _FakeDriver:
+    def __init__(self):
+        self.cdp = []
+
+    def execute_cdp_cmd(self, cmd, params):
+        self.cdp.append((cmd, params))
+        return {"identifier": "1"}
+
+    def execute_script(self, script, *args):
+        return None
+
+
+def test_document_start_installs_tracker_before_interceptor():
+    from interaction_engine.injectors import JSNetworkInterceptor
+
+    driver = _FakeDriver()
+    assert JSNetworkInterceptor(driver, document_start=True).install_on_new_document()
+    source = driver.cdp[0][1]["source"]
+    assert source.index(READINESS_TRACKER_JS) < source.index(NETWORK_INTERCEPTOR_JS)
@@ -0,0 +1,63 @@
+import os
+import time
+
+import pytest
+
+from interaction_engine import profile_store
+from interaction_engine.profile_store import SiteProfileStore, split_url
+
+ORIGIN = "http://localhost:3000"
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SiteProfileStore(str(tmp_path), ttl=60)
+
+
+def test_put_get_and_reload(store, tmp_path):
+    store.put(ORIGIN, "settle_ms", "/#/login", 420)
+    assert store.get(ORIGIN, "settle_ms", "/#/login") == 420
+    assert store.get(ORIGIN, "settle_ms", "/#/basket") is None
+    assert SiteProfileStore(str(tmp_path)).get(ORIGIN, "settle_ms", "/#/login") == 420
+    assert not any(name.endswith((".lock", ".tmp")) for name in os.listdir(tmp_path))
+
+
+def test_entries_expire_after_ttl(store, monkeypatch):
+    store.put(ORIGIN, "native_404", "*", {"has_404": True})
+    now = time.time()
+    monkeypatch.setattr(profile_store.time, "time", lambda: now + 61)
+    assert store.get(ORIGIN, "native_404") is None
+
+
+def test_invalidate(store):
+    store.put(ORIGIN, "native_404", "*", 1)
+    store.put(ORIGIN, "page_features", "/", 2)
+    store.invalidate(ORIGIN, "native_404")
+    assert store.get(ORIGIN, "native_404") is None
+    assert store.get(ORIGIN, "page_features", "/") == 2
+    store.invalidate()
+    assert store.get(ORIGIN, "page_features", "/") is None
+
+
+def test_lock_is_exclusive(store):
+    path = store._path(ORIGIN)
+    with store._lock(path):
+        with pytest.raises(FileExistsError):
+            os.open(path + ".lock", os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    assert not os.path.exists(path + ".lock")
+
+
+def test_stale_lock_is_recovered(store):
+    lock_path = store._path(ORIGIN) + ".lock"
+    with open(lock_path, "w") as f:
+        f.write("99999")
+    old = time.time() - profile_store.LOCK_STALE_SECONDS - 5
+    os.utime(lock_path, (old, old))
+    store.put(ORIGIN, "settle_ms", "/", 100)
+    assert store.get(ORIGIN, "settle_ms", "/") == 100
+    assert not os.path.exists(lock_path)
+
+
+def test_split_url_keeps_hash_route():
+    assert split_url("http://localhost:3000/#/login?x=1") == (ORIGIN, "/#/login?x=1")
+    assert split_url("https://example.com") == ("https://example.com", "/")
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from interaction_engine.regions import _block_any, rle_decode, rle_encode
+
+
+def _mask(seed, shape=(37, 53)):
+    return np.random.default_rng(seed).random(shape) > 0.7
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_rle_round_trip(seed):
+    mask = _mask(seed)
+    rle = rle_encode(mask, scale=1)
+    assert rle["size"] == list(mask.shape)
+    assert sum(rle["counts"]) == mask.size
+    np.testing.assert_array_equal(rle_decode(rle), mask)
+
+
+@pytest.mark.parametrize("scale", [2, 4, 8])
+def test_rle_round_trip_downscaled(scale):
+    mask = _mask(3)
+    decoded = rle_decode(rle_encode(mask, scale=scale))
+    np.testing.assert_array_equal(decoded, _block_any(mask, scale))
+    assert decoded.shape == (-(-mask.shape[0] // scale), -(-mask.shape[1] // scale))
+
+
+def test_rle_counts_start_with_zero_run():
+    mask = np.zeros((2, 3), dtype=bool)
+    mask[0, 0] = True
+    assert rle_encode(mask, scale=1)["counts"] == [0, 1, 5]
+    assert rle_encode(np.zeros((2, 2), dtype=bool), scale=1)["counts"] == [4]
@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from interaction_engine.ssim import structural_similarity
+
+skimage_metrics = pytest.importorskip("skimage.metrics")
+
+
+def _pair(seed, shape=(64, 80)):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 256, shape, dtype=np.uint8)
+    b = np.clip(a.astype(np.int16) + rng.integers(-40, 41, shape), 0, 255).astype(np.uint8)
+    return a, b
+
+
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+@pytest.mark.parametrize("tile_rows", [0, 5, 16])
+def test_matches_skimage(dtype, tile_rows):
+    a, b = _pair(0)
+    expected = skimage_metrics.structural_similarity(a, b, win_size=7, data_range=255)
+    got = structural_similarity(a, b, dtype=dtype, tile_rows=tile_rows)
+    assert got == pytest.approx(expected, abs=1e-4 if dtype == np.float32 else 1e-9)
+
+
+def test_identical_images():
+    a, _ = _pair(1)
+    assert structural_similarity(a, a) == pytest.approx(1.0)
+
+
+def test_rejects_bad_input():
+    a, b = _pair(2)
+    with pytest.raises(ValueError):
+        structural_similarity(a, b[:-1])
+    with pytest.raises(ValueError):
+        structural_similarity(a, b, win_size=6)
@@ -0,0 +1,31 @@
+from difflib import SequenceMatcher
+
+import pytest
+
+from interaction_engine.textdiff import line_diff
+
+BASE = "Welcome\nLogin\nEmail address\nPassword\nForgot your password?\nRemember me"
+
+
+@pytest.mark.parametrize("edited", [
+    BASE.replace("Login", "Log in"),
+    BASE.replace("Password", "Passwort"),
+    BASE + "\nInvalid email or password.",
+    BASE.replace("\nRemember me", ""),
+])
+def test_ratio_matches_sequence_matcher(edited):
+    expected = SequenceMatcher(None, BASE, edited, autojunk=False).ratio()
+    assert line_diff(BASE, edited)["ratio"] == pytest.approx(expected, abs=0.02)
+
+
+def test_added_and_removed_lines():
+    result = line_diff(BASE, BASE.replace("Remember me", "Stay signed in") + "\n  \nError!")
+    assert result["added"] == ["Stay signed in", "Error!"]
+    assert result["removed"] == ["Remember me"]
+
+
+def test_identical_and_moved_lines():
+    assert line_diff(BASE, BASE) == {"ratio": 1.0, "added": [], "removed": []}
+    moved = "\n".join(reversed(BASE.split("\n")))
+    result = line_diff(BASE, moved)
+    assert result["added"] == [] and result["removed"] == []